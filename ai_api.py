@@ -3,7 +3,7 @@ AI Trading Bot Backend API
 Flask-based API for AI model management and predictions
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -15,18 +15,57 @@ import sys
 # Add the parent directory to path to import ai_models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ai_models import model_manager, AIModelManager
+from ai_candle_buffer import candle_store
+from ai_feature_store import feature_store
+from ai_tuning import tuning_jobs
+from ai_trading_engine import trading_engine
+from ai_serialization import configure_responses, shape_arrays
+from ai_profiling import HEADER as PROFILE_HEADER, QUERY_PARAM as PROFILE_PARAM, SORT_KEYS, request_profiler
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+configure_responses(app)  # NumPy-aware JSON, gzip for large responses
+request_profiler.init_app(app, exclude=('list_profiles', 'get_profile'))  # Opt-in profiling (AI_PROFILING=1)
 
 # Global state
 app_state = {
     'models': {},
     'market_data': {},
-    'predictions': {},
-    'trading_sessions': {}
+    'predictions': {}
 }
 
+def buffered_market_data(data: dict, model):
+    """Frame and cached features of the candle buffer a request refers to by symbol/timeframe"""
+    buffer = candle_store.get(data['symbol'], data['timeframe'])
+    if buffer is None or buffer.size == 0:
+        return None, None
+    
+    # One cached value, so the frame and its features always come from the same buffer version
+    return buffer.cached('market_data', lambda frame: (frame, model.prepare_features(frame)))
+
+def store_closed_candles(symbol: str, timeframe: str, buffer, appended: int, closed: bool) -> int:
+    """Append the candles an upload closed to the feature store, so both hold the same history
+
+    The upload's last candle may still be forming and is kept back unless
+    ``closed`` is set; it is stored once a newer candle arrives.
+    """
+    if appended == 0:
+        return 0
+    # The candle before the upload was the forming one, and it may have just closed
+    frame = buffer.to_frame(limit=appended + 1)
+    if not closed:
+        frame = frame.iloc[:-1]
+    if frame.empty:
+        return 0
+    return feature_store.get_or_create(symbol, timeframe).append_frame(frame)
+
+def stored_market_data(symbol: str, timeframe: str):
+    """Candles and precomputed features from the on-disk feature store"""
+    feature_set = feature_store.get(symbol, timeframe)
+    if feature_set is None:
+        return None, None
+    return feature_set.training_data()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -43,7 +82,8 @@ def get_models():
         models = model_manager.get_model_list()
         return jsonify({
             'success': True,
-            'models': models
+            'models': models,
+            'memory': model_manager.memory_summary()
         })
     except Exception as e:
         return jsonify({
@@ -69,7 +109,8 @@ def create_model():
         success = model_manager.create_model(
             model_type, name, timeframe,
             lookback_period=data.get('lookback_period', 50),
-            n_estimators=data.get('n_estimators', 100)
+            n_estimators=data.get('n_estimators', 100),
+            **{key: data[key] for key in ('members', 'weights', 'horizons', 'model_params') if key in data}
         )
         
         if success:
@@ -86,6 +127,78 @@ def create_model():
             'error': str(e)
         }), 500
 
+@app.route('/api/models/tune', methods=['POST'])
+def tune_models():
+    """Start a search over hyperparameters and lookback lengths, optionally registering the best model
+
+    The search runs as a background job: the response (202) holds its
+    ``job_id``, and ``GET /api/models/tune/<job_id>`` returns the leaderboard
+    once it has finished.
+    """
+    try:
+        data = request.get_json()
+        model_type = data.get('model_type', 'random_forest')
+        name = data.get('name')
+        timeframe = data.get('timeframe')
+        market_data = data.get('market_data')
+        
+        if not all([name, timeframe]):
+            return jsonify({
+                'success': False,
+                'error': 'Missing required parameters'
+            }), 400
+        
+        features = None
+        if market_data:
+            df = pd.DataFrame(market_data)
+            df['datetime'] = pd.to_datetime(df['datetime'])
+        elif data.get('symbol'):
+            df, features = stored_market_data(data['symbol'], timeframe)
+            if df is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'No stored features for this symbol and timeframe'
+                }), 404
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'Market data or a stored symbol required for tuning'
+            }), 400
+        
+        options = {key: data[key] for key in (
+            'params', 'lookbacks', 'n_splits', 'horizons', 'scoring', 'max_candidates', 'max_workers'
+        ) if key in data}
+        job = tuning_jobs.submit(
+            model_manager, df, model_type, name, timeframe,
+            register=data.get('register', True), features=features, **options
+        )
+        return jsonify({'success': True, **job}), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/models/tune', methods=['GET'])
+def list_tuning_jobs():
+    """List queued, running and recently finished tuning jobs"""
+    return jsonify({
+        'success': True,
+        'jobs': tuning_jobs.list_jobs()
+    })
+
+@app.route('/api/models/tune/<job_id>', methods=['GET'])
+def get_tuning_job(job_id):
+    """Get the status of a tuning job, with its result once finished"""
+    job = tuning_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Tuning job not found'
+        }), 404
+    return jsonify({'success': True, **job})
+
 @app.route('/api/models/<model_id>/train', methods=['POST'])
 def train_model(model_id):
     """Train a specific AI model"""
@@ -93,10 +206,20 @@ def train_model(model_id):
         data = request.get_json()
         market_data = data.get('market_data')
         
+        # Train on the stored history of a symbol/timeframe without featurizing it again
+        if not market_data and data.get('symbol') and data.get('timeframe'):
+            df, features = stored_market_data(data['symbol'], data['timeframe'])
+            if df is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'No stored features for this symbol and timeframe'
+                }), 404
+            return jsonify(model_manager.train_model(model_id, df, features))
+        
         if not market_data:
             return jsonify({
                 'success': False,
-                'error': 'Market data required for training'
+                'error': 'Market data or a stored symbol/timeframe required for training'
             }), 400
         
         # Convert market data to DataFrame
@@ -120,9 +243,25 @@ def predict_with_model(model_id):
         data = request.get_json()
         market_data = data.get('market_data')
         
+        # Predict from a server-side candle buffer referenced by symbol/timeframe
+        if not market_data and data.get('symbol') and data.get('timeframe'):
+            model = model_manager.get_model(model_id)
+            if model is None:
+                return jsonify({
+                    'error': 'Model not found'
+                }), 404
+            
+            df, features = buffered_market_data(data, model)
+            if df is None:
+                return jsonify({
+                    'error': 'No candles buffered for this symbol and timeframe'
+                }), 404
+            
+            return jsonify(model.predict(df, features))
+        
         if not market_data:
             return jsonify({
-                'error': 'Market data required for prediction'
+                'error': 'Market data or a buffered symbol/timeframe required for prediction'
             }), 400
         
         # Convert market data to DataFrame
@@ -162,8 +301,12 @@ def compare_models():
         
         # Compare models
         results = model_manager.compare_models(model_ids, df)
-        return jsonify(results)
+        return jsonify(shape_arrays(results, request.args))
         
+    except ValueError as e:
+        return jsonify({
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'error': str(e)
@@ -175,27 +318,90 @@ def evaluate_model(model_id):
     try:
         data = request.get_json()
         market_data = data.get('market_data')
+        stored = not market_data and data.get('symbol') and data.get('timeframe')
         
-        if not market_data:
+        if not market_data and not stored:
             return jsonify({
-                'error': 'Market data required for evaluation'
+                'error': 'Market data or a stored symbol/timeframe required for evaluation'
             }), 400
         
+        # Get model and evaluate
+        model = model_manager.get_model(model_id)
+        if model is None:
+            return jsonify({
+                'error': 'Model not found'
+            }), 404
+        
+        # Evaluate on the stored closed candles of a symbol/timeframe, like /train
+        if stored:
+            df, features = stored_market_data(data['symbol'], data['timeframe'])
+            if df is None:
+                return jsonify({
+                    'error': 'No stored features for this symbol and timeframe'
+                }), 404
+            return jsonify(shape_arrays(model.evaluate(df, features), request.args))
+        
         # Convert market data to DataFrame
         df = pd.DataFrame(market_data)
         df['datetime'] = pd.to_datetime(df['datetime'])
         
-        # Get model and evaluate
-        if model_id not in model_manager.models:
+        evaluation = model.evaluate(df)
+        return jsonify(shape_arrays(evaluation, request.args))
+        
+    except ValueError as e:
+        return jsonify({
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+@app.route('/api/models/<model_id>/cross_validate', methods=['POST'])
+def cross_validate_model(model_id):
+    """Walk-forward cross-validation of a model's configuration on purged folds"""
+    try:
+        data = request.get_json()
+        market_data = data.get('market_data')
+        stored = not market_data and data.get('symbol') and data.get('timeframe')
+        
+        if not market_data and not stored:
             return jsonify({
+                'success': False,
+                'error': 'Market data or a stored symbol/timeframe required for cross-validation'
+            }), 400
+        
+        model = model_manager.get_model(model_id)
+        if model is None:
+            return jsonify({
+                'success': False,
                 'error': 'Model not found'
             }), 404
         
-        evaluation = model_manager.models[model_id].evaluate(df)
-        return jsonify(evaluation)
+        if stored:
+            df, features = stored_market_data(data['symbol'], data['timeframe'])
+        else:
+            df = pd.DataFrame(market_data)
+            df['datetime'] = pd.to_datetime(df['datetime'])
+            features = None
+        
+        if df is None:
+            return jsonify({
+                'success': False,
+                'error': 'No stored features for this symbol and timeframe'
+            }), 404
+        
+        result = model.cross_validate(
+            df, features,
+            n_splits=int(data.get('n_splits', 5)),
+            purge=data.get('purge'),
+            embargo=int(data.get('embargo', 0))
+        )
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({
+            'success': False,
             'error': str(e)
         }), 500
 
@@ -222,26 +428,240 @@ def get_market_data(symbol):
             'error': str(e)
         }), 500
 
-@app.route('/api/trading/session/start', methods=['POST'])
-def start_trading_session():
-    """Start a new trading session"""
+@app.route('/api/candles', methods=['GET'])
+def list_candle_buffers():
+    """List server-side candle buffers"""
+    return jsonify({
+        'success': True,
+        'buffers': candle_store.list_buffers()
+    })
+
+@app.route('/api/candles/<symbol>/<timeframe>', methods=['POST'])
+def append_candles(symbol, timeframe):
+    """Append new candles to a server-side buffer
+
+    Clients send only the candles since the buffer's ``last_timestamp``
+    (re-sending the last, possibly still forming, candle updates it). The
+    feature store and paper trading sessions treat the last candle as closed
+    once a newer one arrives, or right away when ``closed`` is set.
+    """
     try:
         data = request.get_json()
-        session_id = data.get('session_id', f"session_{datetime.now().timestamp()}")
+        candles = data.get('candles')
+        
+        if not candles:
+            return jsonify({
+                'success': False,
+                'error': 'Candles required'
+            }), 400
+        
+        buffer = candle_store.get_or_create(symbol, timeframe)
+        appended = buffer.append(candles)
+        stored = store_closed_candles(symbol, timeframe, buffer, appended, data.get('closed', False))
+        
+        # Paper trading sessions on this stream act on the newly closed candles
+        traded = 0
+        if trading_engine.has_sessions(symbol, timeframe):
+            traded = trading_engine.process(symbol, timeframe, buffer.to_frame(), closed=data.get('closed', False))
+        
+        return jsonify({
+            'success': True,
+            'appended': appended,
+            'candles_stored': stored,
+            'candles_traded': traded,
+            **buffer.state()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/candles/<symbol>/<timeframe>', methods=['GET'])
+def get_candle_buffer(symbol, timeframe):
+    """Get the state of a candle buffer, so clients know what to upload next"""
+    buffer = candle_store.get(symbol, timeframe)
+    if buffer is None:
+        return jsonify({
+            'success': False,
+            'error': 'Buffer not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'symbol': symbol.upper(),
+        'timeframe': timeframe,
+        **buffer.state()
+    })
+
+@app.route('/api/candles/<symbol>/<timeframe>', methods=['DELETE'])
+def delete_candle_buffer(symbol, timeframe):
+    """Drop a candle buffer"""
+    if candle_store.remove(symbol, timeframe):
+        return jsonify({'success': True})
+    return jsonify({
+        'success': False,
+        'error': 'Buffer not found'
+    }), 404
+
+@app.route('/api/features', methods=['GET'])
+def list_feature_sets():
+    """List the symbol/timeframe feature sets in the feature store"""
+    try:
+        return jsonify({
+            'success': True,
+            'feature_sets': feature_store.list_sets()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/features/<symbol>/<timeframe>', methods=['POST'])
+def append_feature_candles(symbol, timeframe):
+    """Featurize newly closed candles and append them to the feature store"""
+    try:
+        data = request.get_json()
+        candles = data.get('candles')
+        
+        if not candles:
+            return jsonify({
+                'success': False,
+                'error': 'Candles required'
+            }), 400
         
-        app_state['trading_sessions'][session_id] = {
-            'start_time': datetime.now().isoformat(),
-            'active': True,
-            'trades': [],
-            'balance': data.get('initial_balance', 10000),
-            'settings': data.get('settings', {})
-        }
+        feature_set = feature_store.get_or_create(symbol, timeframe)
+        appended = feature_set.append(candles)
         
         return jsonify({
             'success': True,
-            'session_id': session_id
+            'appended': appended,
+            **feature_set.state()
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/features/<symbol>/<timeframe>', methods=['GET'])
+def get_feature_set(symbol, timeframe):
+    """Get the state of a stored feature set"""
+    feature_set = feature_store.get(symbol, timeframe)
+    if feature_set is None:
+        return jsonify({
+            'success': False,
+            'error': 'Feature set not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'symbol': symbol.upper(),
+        'timeframe': timeframe,
+        **feature_set.state()
+    })
+
+@app.route('/api/features/<symbol>/<timeframe>', methods=['DELETE'])
+def delete_feature_set(symbol, timeframe):
+    """Delete a stored feature set"""
+    if feature_store.remove(symbol, timeframe):
+        return jsonify({'success': True})
+    return jsonify({
+        'success': False,
+        'error': 'Feature set not found'
+    }), 404
+
+@app.route('/api/features/<symbol>/train', methods=['POST'])
+def train_from_feature_store(symbol):
+    """Retrain models on the stored features of their timeframe
+
+    Trains every model (or the given ``model_ids``) whose timeframe has a
+    stored feature set for ``symbol``; each set is read once and shared.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        models = model_manager.models
+        model_ids = data.get('model_ids') or list(models)
+        
+        stored = {}
+        results = {}
+        for model_id in model_ids:
+            model = models.get(model_id)
+            if model is None:
+                results[model_id] = {'success': False, 'error': 'Model not found'}
+                continue
+            if model.timeframe not in stored:
+                stored[model.timeframe] = stored_market_data(symbol, model.timeframe)
+            df, features = stored[model.timeframe]
+            if df is None:
+                results[model_id] = {'success': False, 'error': 'No stored features for this timeframe'}
+                continue
+            results[model_id] = model_manager.train_model(model_id, df, features)
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/trading/sessions', methods=['GET'])
+def list_trading_sessions():
+    """List paper trading sessions with their current equity"""
+    return jsonify({
+        'success': True,
+        'sessions': trading_engine.list_sessions()
+    })
+
+@app.route('/api/trading/session/start', methods=['POST'])
+def start_trading_session():
+    """Start a server-side paper trading session
+
+    The session trades the closed candles uploaded to the candle buffer of
+    its symbol and timeframe, starting with the next one.
+    """
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id', f"session_{datetime.now().timestamp()}")
+        symbol = data.get('symbol')
+        timeframe = data.get('timeframe')
+        
+        if not all([symbol, timeframe]):
+            return jsonify({
+                'success': False,
+                'error': 'Missing required parameters'
+            }), 400
+        
+        # The last buffered candle may still be forming; the one before it is the last closed one
+        buffer = candle_store.get(symbol, timeframe)
+        frame = buffer.to_frame(limit=2) if buffer is not None else None
+        last_time = frame['datetime'].iloc[0] if frame is not None and len(frame) == 2 else None
+        
+        result = trading_engine.start_session(
+            session_id, symbol, timeframe,
+            initial_balance=float(data.get('initial_balance', 10000)),
+            settings=data.get('settings', {}),
+            last_time=last_time
+        )
+        return jsonify(result), 200 if result['success'] else 400
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -252,10 +672,7 @@ def start_trading_session():
 def stop_trading_session(session_id):
     """Stop a trading session"""
     try:
-        if session_id in app_state['trading_sessions']:
-            app_state['trading_sessions'][session_id]['active'] = False
-            app_state['trading_sessions'][session_id]['end_time'] = datetime.now().isoformat()
-            
+        if trading_engine.stop_session(session_id):
             return jsonify({'success': True})
         else:
             return jsonify({
@@ -271,12 +688,13 @@ def stop_trading_session(session_id):
 
 @app.route('/api/trading/session/<session_id>/status', methods=['GET'])
 def get_session_status(session_id):
-    """Get trading session status"""
+    """Get trading session status with live PnL"""
     try:
-        if session_id in app_state['trading_sessions']:
+        status = trading_engine.session_status(session_id)
+        if status is not None:
             return jsonify({
                 'success': True,
-                'session': app_state['trading_sessions'][session_id]
+                'session': status
             })
         else:
             return jsonify({
@@ -290,6 +708,47 @@ def get_session_status(session_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/trading/session/<session_id>/trades', methods=['GET'])
+def get_session_trades(session_id):
+    """Page through a session's closed trades, newest first
+
+    Pass the ``next_cursor`` of a response as ``cursor`` to get the next page.
+    """
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        cursor = request.args.get('cursor')
+        before = tuple(int(part) for part in cursor.split(':')) if cursor else None
+        valid = limit > 0 and (before is None or len(before) == 2)
+    except ValueError:
+        valid = False
+    if not valid:
+        return jsonify({
+            'success': False,
+            'error': 'limit must be a positive integer and cursor a next_cursor value'
+        }), 400
+    
+    try:
+        page = trading_engine.session_trades(session_id, limit, before)
+        if page is None:
+            return jsonify({
+                'success': False,
+                'error': 'Session not found'
+            }), 404
+        
+        trades, next_cursor = page
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'trades': trades,
+            'next_cursor': ':'.join(map(str, next_cursor)) if next_cursor else None
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 def generate_mock_market_data(symbol, timeframe, limit):
     """Generate mock market data for testing"""
     data = []
@@ -353,6 +812,63 @@ def get_prediction_history(model_id):
             'error': str(e)
         }), 500
 
+def profiles_unavailable():
+    """Error response when profiles are disabled or the caller may not read them"""
+    if not request_profiler.enabled:
+        return jsonify({'success': False, 'error': 'Profiling is disabled'}), 404
+    if not request_profiler.authorized(request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_PARAM)):
+        return jsonify({'success': False, 'error': 'Profiling token required'}), 403
+    return None
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """List the kept request profiles, newest first"""
+    unavailable = profiles_unavailable()
+    if unavailable:
+        return unavailable
+    try:
+        return jsonify({
+            'success': True,
+            'profiles': request_profiler.list_profiles()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/profiles/<request_id>', methods=['GET'])
+def get_profile(request_id):
+    """Get the hottest functions of a profiled request, or its raw pstats file with format=raw"""
+    unavailable = profiles_unavailable()
+    if unavailable:
+        return unavailable
+    try:
+        if request.args.get('format') == 'raw':
+            path = request_profiler.path(request_id)
+            if path is None:
+                return jsonify({'success': False, 'error': 'Profile not found'}), 404
+            return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                             as_attachment=True, download_name=f'{request_id}.prof')
+        
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in SORT_KEYS:
+            return jsonify({'success': False, 'error': f'sort must be one of {", ".join(SORT_KEYS)}'}), 400
+        limit = int(request.args.get('limit', 30))
+        report = request_profiler.report(request_id, sort, limit)
+        if report is None:
+            return jsonify({'success': False, 'error': 'Profile not found'}), 404
+        return jsonify({
+            'success': True,
+            'profile': report
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/models/<model_id>/save', methods=['POST'])
 def save_model(model_id):
     """Save a trained model to disk"""
@@ -415,6 +931,7 @@ if __name__ == '__main__':
     # Initialize default models
     print("Initializing AI Trading Bot API...")
     print(f"Available models: {len(model_manager.get_model_list())}")
+    print(f"Restored trading sessions: {trading_engine.restore()}")
     
     # Run the Flask app
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
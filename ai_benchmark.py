@@ -0,0 +1,101 @@
+"""
+AI API Load Test
+Measures predict endpoint throughput and latency against a running server
+
+Example:
+    python ai_benchmark.py --url http://localhost:5000 --train --requests 2000 --concurrency 16
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+DEFAULT_MODEL_ID = 'RF_1h_1h_random_forest'
+
+
+def mock_candles(n: int, seed: int = 0) -> List[Dict]:
+    """Random-walk hourly candles in the API's market_data format"""
+    rng = np.random.default_rng(seed)
+    close = 50000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.004, n)) * close
+    start = np.datetime64('2024-01-01T00:00')
+    return [
+        {
+            'datetime': str(start + np.timedelta64(i, 'h')),
+            'open': float(open_[i]),
+            'high': float(max(open_[i], close[i]) + spread[i]),
+            'low': float(min(open_[i], close[i]) - spread[i]),
+            'close': float(close[i]),
+            'volume': float(rng.integers(1_000_000, 10_000_000))
+        }
+        for i in range(n)
+    ]
+
+
+def train_and_save(url: str, model_id: str, candles: int = 2000):
+    """Train a model through the API and save it where ai_serve.py preloads from"""
+    session = requests.Session()
+    response = session.post(f'{url}/api/models/{model_id}/train', json={'market_data': mock_candles(candles)})
+    response.raise_for_status()
+    print(f"Trained {model_id}: {response.json().get('metrics')}")
+    session.post(f'{url}/api/models/{model_id}/save', json={}).raise_for_status()
+
+
+def run_load(url: str, model_id: str, n_requests: int, concurrency: int, candles: int) -> Dict:
+    """Fire ``n_requests`` predictions from ``concurrency`` client threads"""
+    payload = {'market_data': mock_candles(candles, seed=1)}
+    endpoint = f'{url}/api/models/{model_id}/predict'
+    sessions = [requests.Session() for _ in range(concurrency)]
+
+    def call(i: int) -> float:
+        started = time.perf_counter()
+        response = sessions[i % concurrency].post(endpoint, json=payload)
+        response.raise_for_status()
+        if 'error' in response.json():
+            raise RuntimeError(response.json()['error'])
+        return time.perf_counter() - started
+
+    # Warm up every connection (and worker) before measuring
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(concurrency)))
+
+        started = time.perf_counter()
+        latencies = np.array(list(executor.map(call, range(n_requests))))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'throughput': n_requests / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000)
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test the AI API predict endpoint")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--model-id', default=DEFAULT_MODEL_ID)
+    parser.add_argument('--train', action='store_true', help="Train and save the model first")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--candles', type=int, default=100, help="Candles sent with every request")
+    args = parser.parse_args(argv)
+
+    if args.train:
+        train_and_save(args.url, args.model_id)
+
+    result = run_load(args.url, args.model_id, args.requests, args.concurrency, args.candles)
+    print(f"{result['throughput']:.1f} req/s, p50 {result['p50_ms']:.1f} ms, "
+          f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms "
+          f"({result['requests']} requests, concurrency {result['concurrency']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Server-Side Candle Buffers
+Per-(symbol, timeframe) OHLCV history that clients extend with small delta uploads
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+
+CANDLE_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# Enough history for feature warm-up plus the longest lookback window
+DEFAULT_MAX_CANDLES = 5000
+
+
+def candles_to_arrays(candles: List[Dict]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sorted open times and OHLCV columns from API candle dicts
+
+    Each candle carries either an ISO ``datetime`` or a millisecond ``timestamp``.
+    """
+    df = pd.DataFrame(candles)
+    if 'datetime' in df:
+        times = pd.to_datetime(df['datetime'])
+    elif 'timestamp' in df:
+        times = pd.to_datetime(df['timestamp'], unit='ms')
+    else:
+        raise ValueError("Candles need a 'datetime' or 'timestamp' field")
+
+    missing = [f for f in CANDLE_FIELDS if f not in df]
+    if missing:
+        raise ValueError(f"Candles are missing fields: {', '.join(missing)}")
+
+    times = times.to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(times, kind='stable')
+    columns = {f: pd.to_numeric(df[f]).to_numpy(dtype=np.float64)[order] for f in CANDLE_FIELDS}
+    return times[order], columns
+
+
+class CandleBuffer:
+    """Append-only candle history backed by growable NumPy arrays
+
+    Uploads may overlap what is already stored: candles older than the last
+    one are ignored, a candle with the same open time replaces the last one
+    (it was still forming), and newer candles are appended. Every change bumps
+    ``version``, which keys the cache of derived values such as features.
+    """
+
+    def __init__(self, max_candles: int = DEFAULT_MAX_CANDLES):
+        self.max_candles = max_candles
+        self.size = 0
+        self.version = 0
+        self._times = np.empty(0, dtype='datetime64[ns]')
+        self._columns = {f: np.empty(0) for f in CANDLE_FIELDS}
+        self._cache: Dict[str, Tuple[int, object]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def last_time(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._times[self.size - 1]) if self.size else None
+
+    def _reserve(self, extra: int):
+        """Grow the arrays geometrically so appends are amortized O(1)"""
+        needed = self.size + extra
+        if needed <= len(self._times):
+            return
+        capacity = max(needed, 2 * len(self._times), 256)
+        times = np.empty(capacity, dtype='datetime64[ns]')
+        times[:self.size] = self._times[:self.size]
+        self._times = times
+        for f, values in self._columns.items():
+            grown = np.empty(capacity)
+            grown[:self.size] = values[:self.size]
+            self._columns[f] = grown
+
+    def _trim(self):
+        """Drop the oldest candles beyond ``max_candles``, in place"""
+        excess = self.size - self.max_candles
+        if excess <= 0:
+            return
+        self._times[:self.max_candles] = self._times[excess:self.size]
+        for values in self._columns.values():
+            values[:self.max_candles] = values[excess:self.size]
+        self.size = self.max_candles
+
+    def append(self, candles: List[Dict]) -> int:
+        """Merge uploaded candles, returning how many were appended or replaced"""
+        times, columns = candles_to_arrays(candles)
+
+        with self._lock:
+            if self.size:
+                last = self._times[self.size - 1]
+                keep = times >= last
+                times = times[keep]
+                columns = {f: v[keep] for f, v in columns.items()}
+
+            # Several uploaded rows for one open time: the last one wins
+            if len(times) > 1:
+                unique = np.r_[times[1:] != times[:-1], True]
+                times = times[unique]
+                columns = {f: v[unique] for f, v in columns.items()}
+
+            if len(times) == 0:
+                return 0
+
+            start = self.size
+            if self.size and times[0] == self._times[self.size - 1]:
+                start -= 1
+
+            self._reserve(start + len(times) - self.size)
+            end = start + len(times)
+            self._times[start:end] = times
+            for f, values in columns.items():
+                self._columns[f][start:end] = values
+            self.size = end
+            self._trim()
+
+            self.version += 1
+            return len(times)
+
+    def to_frame(self, limit: Optional[int] = None) -> pd.DataFrame:
+        """The latest ``limit`` candles (all by default) as an OHLCV frame"""
+        with self._lock:
+            start = 0 if limit is None else max(self.size - limit, 0)
+            data = {'datetime': self._times[start:self.size].copy()}
+            for f, values in self._columns.items():
+                data[f] = values[start:self.size].copy()
+        return pd.DataFrame(data)
+
+    def cached(self, key: str, compute: Callable[[pd.DataFrame], object]):
+        """Value derived from the whole buffer, recomputed only after it changed"""
+        with self._lock:
+            version = self.version
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] == version:
+                return hit[1]
+            frame = self.to_frame()
+
+        value = compute(frame)
+        with self._lock:
+            if self.version == version:
+                self._cache[key] = (version, value)
+        return value
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'version': self.version,
+                'first_timestamp': pd.Timestamp(self._times[0]).isoformat() if self.size else None,
+                'last_timestamp': self.last_time.isoformat() if self.size else None,
+                'max_candles': self.max_candles
+            }
+
+
+class CandleBufferStore:
+    """Candle buffers keyed by (symbol, timeframe)"""
+
+    def __init__(self, max_candles: int = DEFAULT_MAX_CANDLES):
+        self.max_candles = max_candles
+        self.buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, timeframe: str) -> Optional[CandleBuffer]:
+        return self.buffers.get((symbol.upper(), timeframe))
+
+    def get_or_create(self, symbol: str, timeframe: str) -> CandleBuffer:
+        key = (symbol.upper(), timeframe)
+        with self._lock:
+            if key not in self.buffers:
+                self.buffers[key] = CandleBuffer(self.max_candles)
+            return self.buffers[key]
+
+    def remove(self, symbol: str, timeframe: str) -> bool:
+        with self._lock:
+            return self.buffers.pop((symbol.upper(), timeframe), None) is not None
+
+    def list_buffers(self) -> List[Dict]:
+        return [
+            {'symbol': symbol, 'timeframe': timeframe, **buffer.state()}
+            for (symbol, timeframe), buffer in list(self.buffers.items())
+        ]
+
+
+# Global candle buffer store
+candle_store = CandleBufferStore()
@@ -0,0 +1,261 @@
+"""
+Feature Store
+Memory-mapped, append-only feature matrices per (symbol, timeframe) on disk
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ai_candle_buffer import CANDLE_FIELDS, candles_to_arrays
+from ai_features import (
+    CONTEXT_CANDLES, FEATURE_COLUMNS, compute_features, drop_incomplete, feature_spec_hash
+)
+
+DEFAULT_ROOT = os.environ.get('AI_FEATURE_STORE', 'feature_store')
+
+# Rows to allocate when a set is created; files double in size when full
+INITIAL_CAPACITY = 4096
+
+ARRAYS = {
+    'times': ('int64', ()),
+    'candles': ('float64', (len(CANDLE_FIELDS),)),
+    'features': ('float64', (len(FEATURE_COLUMNS),))
+}
+
+
+class FeatureSet:
+    """Candles and their features for one (symbol, timeframe)
+
+    ``times.npy``, ``candles.npy`` and ``features.npy`` hold one row per
+    candle, including the warm-up rows whose features are NaN. The files are
+    preallocated and grown geometrically. ``meta.json`` records how many rows
+    are valid and the EWM state needed to extend the features. It is replaced
+    atomically after new rows are flushed, so readers never see a partial
+    append. Appends hold an exclusive ``flock`` on ``.lock``, so several
+    processes can share the store.
+
+    Only closed candles should be appended: candles at or before the last
+    stored open time are ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def meta(self) -> Dict:
+        try:
+            with open(self._file('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'capacity': 0, 'state': {}}
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the set against other threads and other processes"""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file('.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_meta(self, meta: Dict):
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file('meta.json'))
+
+    @property
+    def rows(self) -> int:
+        return self.meta['rows']
+
+    def _open(self, name: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            dtype, shape = ARRAYS[name]
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.load(self._file(f'{name}.npy'), mmap_mode='r')[:rows]
+
+    def _reserve(self, meta: Dict, rows: int):
+        """Grow the array files to hold ``rows`` rows, copying what is stored"""
+        if rows <= meta['capacity']:
+            return
+        capacity = max(rows, 2 * meta['capacity'], INITIAL_CAPACITY)
+        for name, (dtype, shape) in ARRAYS.items():
+            tmp = self._file(f'{name}.npy.tmp')
+            grown = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(capacity,) + shape)
+            grown[:meta['rows']] = self._open(name, meta['rows'])
+            grown.flush()
+            del grown
+            os.replace(tmp, self._file(f'{name}.npy'))
+        meta['capacity'] = capacity
+
+    def times(self, rows: Optional[int] = None) -> np.ndarray:
+        rows = self.rows if rows is None else rows
+        return self._open('times', rows).astype('datetime64[ns]')
+
+    def features(self, rows: Optional[int] = None) -> np.ndarray:
+        """Read-only view of the feature rows, one per candle"""
+        return self._open('features', self.rows if rows is None else rows)
+
+    def to_frame(self, rows: Optional[int] = None) -> pd.DataFrame:
+        """Stored candles as an OHLCV frame"""
+        rows = self.rows if rows is None else rows
+        candles = self._open('candles', rows)
+        data = {'datetime': self.times(rows)}
+        for i, field in enumerate(CANDLE_FIELDS):
+            data[field] = candles[:, i]
+        return pd.DataFrame(data)
+
+    def training_data(self) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Candles and complete feature rows, ready for ``train``/``evaluate``
+
+        Both come from one snapshot of the set, so appends that land in
+        between do not misalign them.
+        """
+        rows = self.rows
+        return self.to_frame(rows), drop_incomplete(self.features(rows))
+
+    def append(self, candles: List[Dict]) -> int:
+        """Append API candle dicts, returning how many were new"""
+        times, columns = candles_to_arrays(candles)
+        return self.extend(times, columns)
+
+    def append_frame(self, data: pd.DataFrame) -> int:
+        """Append an OHLCV frame with a ``datetime`` column"""
+        times = pd.to_datetime(data['datetime']).to_numpy(dtype='datetime64[ns]')
+        order = np.argsort(times, kind='stable')
+        columns = {f: data[f].to_numpy(dtype=np.float64)[order] for f in CANDLE_FIELDS}
+        return self.extend(times[order], columns)
+
+    def extend(self, times: np.ndarray, columns: Dict[str, np.ndarray]) -> int:
+        """Featurize and store candles newer than the last stored one
+
+        Only the new candles are featurized: rolling windows reach into the
+        last ``CONTEXT_CANDLES`` stored candles and the EWMs continue from the
+        saved state, so the stored rows match a batch run over the full history.
+        """
+        times = times.astype('datetime64[ns]').astype(np.int64)
+        with self._exclusive():
+            meta = self.meta
+            stored = meta['rows']
+            if stored:
+                keep = times > meta['last_time']
+                times = times[keep]
+                columns = {f: v[keep] for f, v in columns.items()}
+            if len(times) > 1:
+                unique = np.r_[times[1:] != times[:-1], True]
+                times = times[unique]
+                columns = {f: v[unique] for f, v in columns.items()}
+            if len(times) == 0:
+                return 0
+
+            new = np.column_stack([columns[f] for f in CANDLE_FIELDS])
+            context = min(stored, CONTEXT_CANDLES)
+            window = np.vstack([self._open('candles', stored)[stored - context:], new])
+            state = dict(meta['state'])
+            features = compute_features(
+                window[:, CANDLE_FIELDS.index('high')], window[:, CANDLE_FIELDS.index('low')],
+                window[:, CANDLE_FIELDS.index('close')], window[:, CANDLE_FIELDS.index('volume')],
+                context=context, state=state
+            )
+
+            rows = stored + len(times)
+            self._reserve(meta, rows)
+            for name, values in (('times', times), ('candles', new), ('features', features)):
+                array = np.load(self._file(f'{name}.npy'), mmap_mode='r+')
+                array[stored:rows] = values
+                array.flush()
+                del array
+
+            meta.update({
+                'rows': rows,
+                'state': state,
+                'last_time': int(times[-1]),
+                'updated': datetime.now().isoformat()
+            })
+            self._write_meta(meta)
+            return len(times)
+
+    def state(self) -> Dict:
+        meta = self.meta
+        rows = meta['rows']
+        times = self._open('times', rows)
+        return {
+            'rows': rows,
+            'feature_rows': len(drop_incomplete(self.features(rows))) if rows else 0,
+            'first_timestamp': pd.Timestamp(times[0]).isoformat() if rows else None,
+            'last_timestamp': pd.Timestamp(times[-1]).isoformat() if rows else None,
+            'updated': meta.get('updated')
+        }
+
+
+class FeatureStore:
+    """Feature sets keyed by (symbol, timeframe) under ``root/<feature spec hash>/``
+
+    Changing the feature definitions changes the hash, so features computed
+    under an old spec are never read by mistake; such a store starts empty.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = os.path.join(root, feature_spec_hash())
+        self.sets: Dict[Tuple[str, str], FeatureSet] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, f'{symbol}_{timeframe}')
+
+    def get(self, symbol: str, timeframe: str) -> Optional[FeatureSet]:
+        """The stored set, or None if nothing was appended yet; never creates one"""
+        key = (symbol.upper(), timeframe)
+        with self._lock:
+            feature_set = self.sets.get(key)
+        if feature_set is None:
+            feature_set = FeatureSet(self._path(*key))
+        return feature_set if feature_set.rows else None
+
+    def get_or_create(self, symbol: str, timeframe: str) -> FeatureSet:
+        """The set to append to, registered on first use"""
+        key = (symbol.upper(), timeframe)
+        with self._lock:
+            if key not in self.sets:
+                self.sets[key] = FeatureSet(self._path(*key))
+            return self.sets[key]
+
+    def remove(self, symbol: str, timeframe: str) -> bool:
+        key = (symbol.upper(), timeframe)
+        with self._lock:
+            self.sets.pop(key, None)
+            path = self._path(*key)
+            if not os.path.isdir(path):
+                return False
+            shutil.rmtree(path)
+            return True
+
+    def list_sets(self) -> List[Dict]:
+        if not os.path.isdir(self.root):
+            return []
+        sets = []
+        for entry in sorted(os.listdir(self.root)):
+            symbol, _, timeframe = entry.rpartition('_')
+            feature_set = self.get(symbol, timeframe)
+            if feature_set is not None:
+                sets.append({'symbol': symbol, 'timeframe': timeframe, **feature_set.state()})
+        return sets
+
+
+# Global feature store
+feature_store = FeatureStore()
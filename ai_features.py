@@ -0,0 +1,546 @@
+"""
+Feature Kernel for AI Models
+Computes the model feature matrix with NumPy (or numba, when installed),
+writing every feature column straight into one preallocated array
+"""
+
+import hashlib
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+from scipy.signal import lfilter
+from typing import Dict, Optional, Tuple
+
+try:
+    import numba
+except ImportError:  # Optional: the NumPy kernel is used instead
+    numba = None
+
+FEATURE_COLUMNS = [
+    'returns', 'volatility', 'price_change', 'high_low_pct',
+    'price_to_sma_5', 'price_to_sma_10', 'price_to_sma_20', 'price_to_sma_50',
+    'rsi', 'macd', 'macd_signal', 'macd_histogram',
+    'volume_ratio', 'bb_position'
+]
+
+SMA_PERIODS = (5, 10, 20, 50)
+VOLATILITY_WINDOW = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLUME_WINDOW = 20
+BB_PERIOD, BB_STD = 20, 2
+
+# Both kernels write one column per SMA period, and the Bollinger middle band is one of those SMAs
+assert FEATURE_COLUMNS[4:8] == [f'price_to_sma_{period}' for period in SMA_PERIODS], \
+    "FEATURE_COLUMNS must name one price_to_sma column per SMA period, in order"
+assert BB_PERIOD in SMA_PERIODS, "BB_PERIOD must be one of SMA_PERIODS"
+
+# Candles before the first new one that every rolling window can reach back to
+# (volatility and RSI windows start one candle later, at the first change)
+CONTEXT_CANDLES = max(*SMA_PERIODS, VOLATILITY_WINDOW + 1, RSI_PERIOD + 1, VOLUME_WINDOW) - 1
+
+# Everything that determines the feature values; stored features are keyed by its hash
+FEATURE_SPEC = {
+    'columns': FEATURE_COLUMNS,
+    'sma_periods': list(SMA_PERIODS),
+    'volatility_window': VOLATILITY_WINDOW,
+    'rsi_period': RSI_PERIOD,
+    'macd': [MACD_FAST, MACD_SLOW, MACD_SIGNAL],
+    'volume_window': VOLUME_WINDOW,
+    'bollinger': [BB_PERIOD, BB_STD]
+}
+
+# Output rows per block of rolling sums; cumulative sums restart every block,
+# so their rounding error does not grow with the length of the series
+BLOCK_SIZE = 256
+
+# Candles featurized per pass of the kernel, small enough for its temporaries to stay in cache
+CHUNK_SIZE = 32768
+
+# Compile the single-pass kernel with numba when it is installed; AI_FEATURES_JIT=0 forces NumPy
+USE_JIT = numba is not None and os.environ.get('AI_FEATURES_JIT', '1') != '0'
+
+
+class RollingWindows:
+    """Trailing-window means and standard deviations of one series
+
+    Matches ``Series.rolling(window).mean()`` / ``.std()``. Rows are processed
+    in blocks that also carry the ``max_window - 1`` values before them, so
+    every window lies inside one block and its sums are differences of that
+    block's cumulative sums.
+
+    With ``center=True`` each block is taken relative to its first value,
+    which keeps the sum of squares free of cancellation for price-like
+    series, and windows of one repeated value return that value (and a
+    standard deviation of 0) exactly, as pandas does. Series containing NaN
+    fall back to pandas.
+
+    With ``squares=True`` the sums of squares that ``std`` needs are
+    accumulated in the same pass as the sums, as the imaginary part of one
+    complex cumulative sum.
+    """
+
+    def __init__(self, values: np.ndarray, max_window: int, center: bool = False, squares: bool = False):
+        self.values = values
+        self.n = len(values)
+        self.span = max_window - 1
+        self.center = center
+        self._series = pd.Series(values) if np.isnan(values).any() else None
+        if self._series is not None or self.n == 0:
+            return
+
+        blocks = -(-self.n // BLOCK_SIZE)
+        padded = np.empty(self.span + blocks * BLOCK_SIZE)
+        padded[:self.span] = values[0]
+        padded[self.span:self.span + self.n] = values
+        padded[self.span + self.n:] = values[-1]
+        # Overlapping block rows as a strided view (sliding_window_view is slow to set up per call)
+        rows = as_strided(padded, shape=(blocks, self.span + BLOCK_SIZE),
+                          strides=(BLOCK_SIZE * padded.strides[0], padded.strides[0]), writeable=False)
+
+        self.reference = rows[:, self.span:self.span + 1].copy() if center else 0.0
+        self._changes = None
+        if not squares:
+            self._sums = self._prefix(rows - self.reference)
+            self._squares = None
+            return
+
+        # Real and imaginary parts are summed independently, so both match separate float sums
+        packed = np.empty(rows.shape, dtype=np.complex128)
+        np.subtract(rows, self.reference, out=packed.real)
+        np.square(packed.real, out=packed.imag)
+        prefix = self._prefix(packed)
+        self._sums = prefix.real
+        self._squares = prefix.imag
+
+    @staticmethod
+    def _prefix(rows: np.ndarray) -> np.ndarray:
+        prefix = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=rows.dtype)
+        prefix[:, 0] = 0
+        np.cumsum(rows, axis=1, out=prefix[:, 1:])
+        return prefix
+
+    def _window_sums(self, prefix: np.ndarray, window: int) -> np.ndarray:
+        start = self.span + 1
+        return prefix[:, start:start + BLOCK_SIZE] - prefix[:, start - window:start - window + BLOCK_SIZE]
+
+    def _flatten(self, blocks: np.ndarray, window: int) -> np.ndarray:
+        out = blocks.reshape(-1)[:self.n]
+        out[:window - 1] = np.nan
+        return out
+
+    def _constant(self, window: int) -> np.ndarray:
+        """Whether each window ending at row window-1 onwards holds one repeated value"""
+        if self._changes is None:
+            self._changes = np.zeros(self.n, dtype=np.int64)
+            np.cumsum(self.values[1:] != self.values[:-1], out=self._changes[1:])
+        return self._changes[window - 1:] == self._changes[:self.n - window + 1]
+
+    def mean(self, window: int) -> np.ndarray:
+        if self._series is not None or self.n < window:
+            return pd.Series(self.values).rolling(window).mean().to_numpy(copy=True)
+
+        means = self._window_sums(self._sums, window)
+        means /= window
+        means += self.reference
+        out = self._flatten(means, window)
+        if self.center:
+            np.copyto(out[window - 1:], self.values[window - 1:], where=self._constant(window))
+        return out
+
+    def std(self, window: int) -> np.ndarray:
+        if self._series is not None or self.n < window:
+            return pd.Series(self.values).rolling(window).std().to_numpy(copy=True)
+
+        if self._squares is None:
+            raise ValueError("std needs RollingWindows(..., squares=True)")
+        sums = self._window_sums(self._sums, window)
+        variance = self._window_sums(self._squares, window)
+        sums *= sums
+        sums /= window
+        variance -= sums
+        variance /= window - 1
+        np.maximum(variance, 0.0, out=variance)
+        out = self._flatten(np.sqrt(variance, out=variance), window)
+        if self.center:
+            np.copyto(out[window - 1:], 0.0, where=self._constant(window))
+        return out
+
+
+def ewm(values: np.ndarray, span: int, carry: float = 0.0, seen: int = 0) -> Tuple[np.ndarray, float]:
+    """Adjusted exponentially weighted mean like ``Series.ewm(span=span).mean()``
+
+    The weighted sum is a first-order IIR filter run in one pass. Normalized
+    by alpha, the sum of weights is ``1 - decay ** (t + 1)``, which only
+    differs from 1 during the first few hundred rows.
+
+    To continue a series, pass the weighted sum after its first ``seen``
+    values as ``carry``. The second return value is the carry after ``values``.
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    mean, _ = lfilter([alpha], [1.0, -decay], values, zi=[decay * carry])
+    if len(mean):
+        carry = float(mean[-1])
+    warmup = _ewm_warmup(span)
+    head = min(len(mean), max(warmup - seen, 0))
+    mean[:head] /= -np.expm1(np.arange(seen + 1, seen + head + 1) * np.log(decay))
+    return mean, carry
+
+
+def _ewm_warmup(span: int) -> int:
+    """Rows after which the sum of ``ewm`` weights rounds to 1"""
+    decay = 1.0 - 2.0 / (span + 1.0)
+    return int(np.log(np.finfo(float).eps) / np.log(decay)) + 1
+
+
+EWM_WARMUPS = np.array([_ewm_warmup(span) for span in (MACD_FAST, MACD_SLOW, MACD_SIGNAL)])
+
+
+def compute_features(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                     context: int = 0, state: Optional[Dict] = None) -> np.ndarray:
+    """Feature matrix with one row per candle, NaN where indicators are warming up
+
+    The matrix is column-major so every feature is written contiguously.
+
+    To extend features computed earlier, pass the last ``context`` candles
+    already featurized ahead of the new ones (``CONTEXT_CANDLES`` covers every
+    rolling window) and the ``state`` dict of that earlier call. Rows are only
+    returned for the new candles. When ``state`` is given, it is updated in
+    place to continue from the last row.
+
+    With numba installed, float64 series go through ``_fused_features``,
+    which computes every column in one compiled pass over the candles.
+    Series it declines, and every series without numba, are handled here:
+    long series are featurized ``CHUNK_SIZE`` candles at a time,
+    each chunk extending the previous one the same way, so the temporaries
+    of a chunk stay in the CPU cache.
+    """
+    return _compute_features(high, low, close, volume, context, state)[0]
+
+
+def _compute_features(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                      context: int = 0, state: Optional[Dict] = None) -> Tuple[np.ndarray, Optional[int]]:
+    """``compute_features`` plus the row from which no row has NaN, if the kernel that ran knows it"""
+    state = {} if state is None else state
+    n = len(close)
+    out = np.empty((n - context, len(FEATURE_COLUMNS)), order='F')
+    series = (high, low, close, volume)
+    if USE_JIT and n > context and all(s.dtype == np.float64 for s in series):
+        carries = np.array([state.get('fast', 0.0), state.get('slow', 0.0), state.get('signal', 0.0)])
+        seen = state.get('seen', 0)
+        complete_from = _fused_features(*series, context, carries, seen, EWM_WARMUPS, out)
+        if complete_from >= 0:
+            state['fast'], state['slow'], state['signal'] = (float(c) for c in carries)
+            state['seen'] = seen + n - context
+            return out, complete_from
+
+    for start in range(context, n, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, n)
+        reach = context if start == context else CONTEXT_CANDLES
+        _features_chunk(high[start - reach:end], low[start - reach:end], close[start - reach:end],
+                        volume[start - reach:end], reach, state, out[start - context:end - context])
+    return out, None
+
+
+def _features_chunk(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                    context: int, state: Dict, out: np.ndarray):
+    """Write the features of the candles after the first ``context`` into ``out``"""
+    col = {name: out[:, i] for i, name in enumerate(FEATURE_COLUMNS)}
+    new = slice(context, None)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Price-based features; the first row has no previous close
+        delta = np.empty(len(close))
+        delta[0] = np.nan
+        np.subtract(close[1:], close[:-1], out=delta[1:])
+        col['price_change'][:] = delta[new]
+        returns = np.empty(len(close))
+        returns[0] = np.nan
+        np.divide(close[1:], close[:-1], out=returns[1:])
+        returns[1:] -= 1
+        col['returns'][:] = returns[new]
+        volatility = RollingWindows(returns[1:], VOLATILITY_WINDOW, squares=True).std(VOLATILITY_WINDOW)
+        col['volatility'][:] = volatility[context - 1:] if context else np.r_[np.nan, volatility]
+        np.subtract(high[new], low[new], out=col['high_low_pct'])
+        col['high_low_pct'] /= close[new]
+
+        # Moving averages; the 20-period SMA doubles as the Bollinger middle band
+        prices = RollingWindows(close, max(SMA_PERIODS), center=True, squares=True)
+        smas = {}
+        for period in SMA_PERIODS:
+            smas[period] = prices.mean(period)[new]
+            np.divide(close[new], smas[period], out=col[f'price_to_sma_{period}'])
+
+        # RSI; the first row's undefined change counts as neither a gain nor a
+        # loss. Gains minus losses over a window is the net change of the close,
+        # so only the absolute changes need a rolling mean:
+        # RSI = 100 - 100 / (1 + gain / loss) = 50 * (1 + net / moves)
+        moves = np.abs(delta)
+        moves[0] = 0.0
+        moves = RollingWindows(moves, RSI_PERIOD).mean(RSI_PERIOD)[new]
+        net = np.empty(len(close))
+        np.subtract(close[:RSI_PERIOD], close[0], out=net[:RSI_PERIOD])
+        np.subtract(close[RSI_PERIOD:], close[:-RSI_PERIOD], out=net[RSI_PERIOD:])
+        rsi = col['rsi']
+        np.divide(net[new], RSI_PERIOD, out=rsi)
+        rsi /= moves
+        rsi += 1
+        rsi *= 50
+
+        # MACD; exponential averages carry over from the previous call instead of using context
+        seen = state.get('seen', 0)
+        fast, state['fast'] = ewm(close[new], MACD_FAST, state.get('fast', 0.0), seen)
+        slow, state['slow'] = ewm(close[new], MACD_SLOW, state.get('slow', 0.0), seen)
+        macd = col['macd']
+        np.subtract(fast, slow, out=macd)
+        signal = col['macd_signal']
+        signal[:], state['signal'] = ewm(macd, MACD_SIGNAL, state.get('signal', 0.0), seen)
+        np.subtract(macd, signal, out=col['macd_histogram'])
+        state['seen'] = seen + len(close) - context
+
+        # Volume indicators
+        volume_sma = RollingWindows(volume, VOLUME_WINDOW).mean(VOLUME_WINDOW)[new]
+        np.divide(volume[new], volume_sma, out=col['volume_ratio'])
+
+        # Bollinger Bands
+        bb_middle = smas[BB_PERIOD]
+        bb_std_dev = prices.std(BB_PERIOD)[new]
+        bb_std_dev *= BB_STD
+        bb_upper = bb_middle + bb_std_dev
+        bb_lower = bb_middle - bb_std_dev
+        position = col['bb_position']
+        np.subtract(close[new], bb_lower, out=position)
+        bb_upper -= bb_lower
+        position /= bb_upper
+
+
+def _trailing_sum(values, end, window, reference, squared):
+    """Sum of ``values - reference`` (or its squares) over the ``window`` rows before ``end``"""
+    total = 0.0
+    for j in range(max(end - window, 0), end):
+        x = values[j] - reference
+        total += x * x if squared else x
+    return total
+
+
+def _fused_features(high, low, close, volume, context, carries, seen, warmups, out):
+    """Every feature column in one pass, the compiled counterpart of ``_features_chunk``
+
+    Window sums are kept as running totals, updated by the value entering
+    and the value leaving each window. Every ``BLOCK_SIZE`` rows they are
+    recomputed from scratch relative to the current close, which bounds
+    their rounding error like the blocks of ``RollingWindows``. The length
+    of the current run of equal closes (and of zero volumes) makes constant
+    windows exact. Window lengths and spans are the module constants, which
+    numba compiles in as literals.
+
+    ``carries`` holds the fast, slow and signal weighted sums and is updated
+    in place; ``warmups`` is ``EWM_WARMUPS``.
+
+    Returns the first output row from which no row has NaN. Running totals
+    never recover from NaN or infinite candles, so at the first one (or a
+    zero close) the kernel gives up and returns -1, leaving ``carries`` as
+    it was, for the caller to use the NumPy kernel.
+    """
+    nan = math.nan
+    sma_a, sma_b, sma_c, sma_d = SMA_PERIODS
+    alphas = (2.0 / (MACD_FAST + 1.0), 2.0 / (MACD_SLOW + 1.0), 2.0 / (MACD_SIGNAL + 1.0))
+    fast_decay, slow_decay, signal_decay = 1.0 - alphas[0], 1.0 - alphas[1], 1.0 - alphas[2]
+    fast_log, slow_log, signal_log = math.log(fast_decay), math.log(slow_decay), math.log(signal_decay)
+    fast, slow, signal = carries[0], carries[1], carries[2]
+
+    reference = close[0]
+    sum_a = sum_b = sum_c = sum_d = band_sum = band_squares = 0.0
+    return_sum = return_squares = move_sum = volume_sum = 0.0
+    run = quiet = 0
+    complete_from = 0
+    for i in range(len(close)):
+        price = close[i]
+        if not math.isfinite(high[i] + low[i] + price + volume[i]) or price == 0.0:
+            return -1
+        if i % BLOCK_SIZE == 0:
+            # Recompute the windows ending at the previous row around this close
+            reference = price
+            sum_a = _trailing_sum(close, i, sma_a, reference, False)
+            sum_b = _trailing_sum(close, i, sma_b, reference, False)
+            sum_c = _trailing_sum(close, i, sma_c, reference, False)
+            sum_d = _trailing_sum(close, i, sma_d, reference, False)
+            band_sum = _trailing_sum(close, i, BB_PERIOD, reference, False)
+            band_squares = _trailing_sum(close, i, BB_PERIOD, reference, True)
+            volume_sum = _trailing_sum(volume, i, VOLUME_WINDOW, 0.0, False)
+            return_sum = return_squares = move_sum = 0.0
+            for j in range(max(i - VOLATILITY_WINDOW, 1), i):
+                r = close[j] / close[j - 1] - 1.0
+                return_sum += r
+                return_squares += r * r
+            for j in range(max(i - RSI_PERIOD, 1), i):
+                move_sum += abs(close[j] - close[j - 1])
+
+        x = price - reference
+        sum_a += x
+        sum_b += x
+        sum_c += x
+        sum_d += x
+        band_sum += x
+        band_squares += x * x
+        if i >= sma_a:
+            sum_a -= close[i - sma_a] - reference
+        if i >= sma_b:
+            sum_b -= close[i - sma_b] - reference
+        if i >= sma_c:
+            sum_c -= close[i - sma_c] - reference
+        if i >= sma_d:
+            sum_d -= close[i - sma_d] - reference
+        if i >= BB_PERIOD:
+            y = close[i - BB_PERIOD] - reference
+            band_sum -= y
+            band_squares -= y * y
+        volume_sum += volume[i]
+        if i >= VOLUME_WINDOW:
+            volume_sum -= volume[i - VOLUME_WINDOW]
+        quiet = quiet + 1 if volume[i] == 0.0 else 0
+
+        # The first row has no previous close, and its move counts as 0 for RSI
+        if i >= 1:
+            delta = price - close[i - 1]
+            returns = price / close[i - 1] - 1.0
+            return_sum += returns
+            return_squares += returns * returns
+            move_sum += abs(delta)
+            run = run + 1 if delta == 0.0 else 1
+        else:
+            delta = returns = nan
+            run = 1
+        if i >= VOLATILITY_WINDOW + 1:
+            r = close[i - VOLATILITY_WINDOW] / close[i - VOLATILITY_WINDOW - 1] - 1.0
+            return_sum -= r
+            return_squares -= r * r
+        if i >= RSI_PERIOD + 1:
+            move_sum -= abs(close[i - RSI_PERIOD] - close[i - RSI_PERIOD - 1])
+
+        if i < context:
+            continue
+        row = i - context
+        t = seen + row + 1
+
+        # Windows of returns are full from row VOLATILITY_WINDOW, as the first row has none
+        if run > VOLATILITY_WINDOW:
+            volatility = 0.0
+        elif i >= VOLATILITY_WINDOW:
+            variance = (return_squares - return_sum * return_sum * (1 / VOLATILITY_WINDOW)) \
+                * (1 / (VOLATILITY_WINDOW - 1))
+            volatility = math.sqrt(max(variance, 0.0))
+        else:
+            volatility = nan
+        out[row, 0] = returns
+        out[row, 1] = volatility
+        out[row, 2] = delta
+        out[row, 3] = (high[i] - low[i]) / price
+
+        sma = price if run >= sma_a else sum_a * (1 / sma_a) + reference
+        ratio_a = price / sma if i >= sma_a - 1 else nan
+        sma = price if run >= sma_b else sum_b * (1 / sma_b) + reference
+        ratio_b = price / sma if i >= sma_b - 1 else nan
+        sma = price if run >= sma_c else sum_c * (1 / sma_c) + reference
+        ratio_c = price / sma if i >= sma_c - 1 else nan
+        sma = price if run >= sma_d else sum_d * (1 / sma_d) + reference
+        ratio_d = price / sma if i >= sma_d - 1 else nan
+        out[row, 4] = ratio_a
+        out[row, 5] = ratio_b
+        out[row, 6] = ratio_c
+        out[row, 7] = ratio_d
+
+        # RSI = 50 * (1 + net / moves), see _features_chunk
+        if i >= RSI_PERIOD - 1:
+            net = price - close[i - RSI_PERIOD] if i >= RSI_PERIOD else price - close[0]
+            moves = 0.0 if run > RSI_PERIOD else move_sum
+            rsi = (net / moves + 1) * 50
+        else:
+            rsi = nan
+        out[row, 8] = rsi
+
+        # MACD; each weighted sum is a*x + d*y like lfilter, normalized during warm-up
+        fast = alphas[0] * price + fast_decay * fast
+        slow = alphas[1] * price + slow_decay * slow
+        fast_mean = fast if t > warmups[0] else fast / -math.expm1(t * fast_log)
+        slow_mean = slow if t > warmups[1] else slow / -math.expm1(t * slow_log)
+        macd = fast_mean - slow_mean
+        signal = alphas[2] * macd + signal_decay * signal
+        signal_mean = signal if t > warmups[2] else signal / -math.expm1(t * signal_log)
+        out[row, 9] = macd
+        out[row, 10] = signal_mean
+        out[row, 11] = macd - signal_mean
+
+        if i >= VOLUME_WINDOW - 1:
+            ratio = nan if quiet >= VOLUME_WINDOW else volume[i] * VOLUME_WINDOW / volume_sum
+        else:
+            ratio = nan
+        out[row, 12] = ratio
+
+        if i >= BB_PERIOD - 1:
+            if run >= BB_PERIOD:
+                middle = price
+                deviation = 0.0
+            else:
+                middle = band_sum * (1 / BB_PERIOD) + reference
+                variance = (band_squares - band_sum * band_sum * (1 / BB_PERIOD)) * (1 / (BB_PERIOD - 1))
+                deviation = math.sqrt(max(variance, 0.0))
+            deviation *= BB_STD
+            upper = middle + deviation
+            lower = middle - deviation
+            position = (price - lower) / (upper - lower)
+        else:
+            position = nan
+        out[row, 13] = position
+
+        # NaN in any column makes the sum NaN (+inf and -inf summing to NaN merely moves the bound later)
+        if math.isnan(returns + volatility + ratio_a + ratio_b + ratio_c + ratio_d + rsi + ratio + position):
+            complete_from = row + 1
+
+    carries[0], carries[1], carries[2] = fast, slow, signal
+    return complete_from
+
+
+if numba is not None:
+    _trailing_sum = numba.njit(cache=True)(_trailing_sum)
+    _fused_features = numba.njit(cache=True, error_model='numpy')(_fused_features)
+
+
+def drop_incomplete(features: np.ndarray, complete_from: Optional[int] = None) -> np.ndarray:
+    """Rows without NaN, like ``DataFrame.dropna()``
+
+    When the undefined rows are exactly the warm-up prefix (the usual case)
+    the result is a view rather than a copy. If the rows from
+    ``complete_from`` on are known to have no NaN, only the rows before it
+    are checked.
+    """
+    checked = len(features) if complete_from is None else complete_from
+    nan_rows = np.zeros(len(features), dtype=bool)
+    for column in features[:checked].T:
+        nan_rows[:checked] |= np.isnan(column)
+
+    start = int(np.argmin(nan_rows)) if len(features) else 0
+    if nan_rows[start:].any():
+        return features[~nan_rows]
+    return features[start:]
+
+
+def prepare_features(data: pd.DataFrame) -> np.ndarray:
+    """Feature rows for every candle whose indicators are all defined"""
+    features, complete_from = _compute_features(
+        data['high'].to_numpy(dtype=np.float64),
+        data['low'].to_numpy(dtype=np.float64),
+        data['close'].to_numpy(dtype=np.float64),
+        data['volume'].to_numpy(dtype=np.float64)
+    )
+    return drop_incomplete(features, complete_from)
+
+
+def feature_spec_hash() -> str:
+    """Short stable hash of ``FEATURE_SPEC``"""
+    encoded = json.dumps(FEATURE_SPEC, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
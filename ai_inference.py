@@ -0,0 +1,213 @@
+"""
+Compiled Tree Inference for AI Models
+Flattens trained tree ensembles into contiguous arrays for low-latency prediction
+"""
+
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.multioutput import MultiOutputRegressor
+from typing import Dict, List, Tuple, Union
+
+
+def _boosting_init(estimator: GradientBoostingRegressor) -> np.ndarray:
+    """Constant raw prediction a fitted boosting model starts from, read from its public ``init_``
+
+    Regression losses use the identity link, so the raw start is what the
+    init estimator predicts. Only constant init estimators can be flattened.
+    """
+    if isinstance(estimator.init_, str) and estimator.init_ == 'zero':
+        return np.zeros(1)
+    if isinstance(estimator.init_, DummyRegressor):
+        return np.asarray(estimator.init_.constant_, dtype=np.float64).reshape(-1)
+    raise TypeError(f"Unsupported boosting init estimator: {type(estimator.init_).__name__}")
+
+
+class FlatTreeEnsemble:
+    """Tree ensemble stored as flat node arrays with a vectorized traversal.
+
+    All trees are concatenated into one set of arrays. Leaves point back to
+    themselves, so every tree can be stepped ``max_depth`` times in lock-step
+    without branching on whether a node is a leaf.
+    """
+
+    def __init__(self, kind: str, feature: np.ndarray, threshold: np.ndarray,
+                 children_left: np.ndarray, children_right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 n_features: int, scale: float = 1.0, init: np.ndarray = None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.scale = scale
+        self.init = init
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_outputs(self) -> int:
+        return self.value.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.feature, self.threshold, self.children_left,
+                  self.children_right, self.value, self.roots]
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def from_estimator(cls, estimator) -> 'FlatTreeEnsemble':
+        """Flatten a fitted RandomForestRegressor or GradientBoostingRegressor"""
+        if isinstance(estimator, RandomForestRegressor):
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            kind, scale, init = 'forest', 1.0, None
+        elif isinstance(estimator, GradientBoostingRegressor):
+            trees = [tree.tree_ for tree in estimator.estimators_[:, 0]]
+            kind, scale = 'boosting', float(estimator.learning_rate)
+            init = _boosting_init(estimator)
+        else:
+            raise TypeError(f"Unsupported estimator: {type(estimator).__name__}")
+
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        total = int(sizes.sum())
+        n_outputs = trees[0].value.shape[1]
+
+        feature = np.empty(total, dtype=np.intp)
+        threshold = np.empty(total, dtype=np.float64)
+        left = np.empty(total, dtype=np.intp)
+        right = np.empty(total, dtype=np.intp)
+        value = np.empty((total, n_outputs), dtype=np.float64)
+
+        for tree, offset, size in zip(trees, offsets, sizes):
+            nodes = slice(offset, offset + size)
+            own = np.arange(offset, offset + size)
+            is_leaf = tree.children_left == -1
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+            left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+            right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+            value[nodes] = tree.value[:, :, 0]
+
+        return cls(
+            kind=kind,
+            feature=feature,
+            threshold=threshold,
+            children_left=left,
+            children_right=right,
+            value=value,
+            roots=offsets.astype(np.intp),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=estimator.n_features_in_,
+            scale=scale,
+            init=init
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_samples = X.shape[0]
+        flat_X = X.ravel()
+        row_offsets = np.repeat(np.arange(n_samples) * self.n_features, self.n_trees)
+        nodes = np.tile(self.roots, n_samples)
+        for _ in range(self.max_depth):
+            values = flat_X.take(row_offsets + self.feature.take(nodes))
+            nodes = np.where(values <= self.threshold.take(nodes),
+                             self.children_left.take(nodes),
+                             self.children_right.take(nodes))
+        return nodes.reshape(n_samples, self.n_trees)
+
+    def tree_predictions(self, X: np.ndarray) -> np.ndarray:
+        """Raw per-tree leaf values, shape (n_trees, n_samples, n_outputs)"""
+        return self.value[self.apply(X).T]
+
+    def predict_with_dispersion(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict and return the per-member predictions used for dispersion
+
+        For forests the members are the individual trees; for boosting they are
+        the staged predictions after each boosting iteration. Both are returned
+        as arrays of shape (n_members, n_samples, n_outputs) and the running
+        sums are accumulated tree by tree so results match sklearn bit for bit.
+        """
+        per_tree = self.tree_predictions(X)
+        if self.kind == 'forest':
+            total = np.cumsum(per_tree, axis=0)[-1]
+            return total / self.n_trees, per_tree
+
+        contributions = np.empty((self.n_trees + 1,) + per_tree.shape[1:])
+        contributions[0] = self.init
+        contributions[1:] = self.scale * per_tree
+        staged = np.cumsum(contributions, axis=0)[1:]
+        return staged[-1], staged
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict in sklearn's output shape"""
+        prediction, _ = self.predict_with_dispersion(X)
+        return prediction[:, 0] if self.n_outputs == 1 else prediction
+
+    def to_dict(self) -> Dict:
+        """Export the flat arrays, e.g. for saving or shipping to another runtime"""
+        return {
+            "kind": self.kind,
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children_left": self.children_left,
+            "children_right": self.children_right,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "scale": self.scale,
+            "init": self.init
+        }
+
+
+class StackedTreeEnsembles:
+    """One single-output FlatTreeEnsemble per output, e.g. from a MultiOutputRegressor
+
+    Exposes the same prediction interface as FlatTreeEnsemble, with the
+    outputs of the stacked ensembles side by side on the last axis.
+    """
+
+    def __init__(self, ensembles: List[FlatTreeEnsemble]):
+        self.ensembles = ensembles
+
+    @property
+    def n_trees(self) -> int:
+        return self.ensembles[0].n_trees
+
+    @property
+    def n_outputs(self) -> int:
+        return sum(e.n_outputs for e in self.ensembles)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(e.nbytes for e in self.ensembles)
+
+    def predict_with_dispersion(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        results = [e.predict_with_dispersion(X) for e in self.ensembles]
+        return (np.concatenate([r[0] for r in results], axis=-1),
+                np.concatenate([r[1] for r in results], axis=-1))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        prediction, _ = self.predict_with_dispersion(X)
+        return prediction
+
+    def to_dict(self) -> Dict:
+        return {"kind": "stacked", "ensembles": [e.to_dict() for e in self.ensembles]}
+
+
+def compile_ensemble(estimator) -> Union[FlatTreeEnsemble, StackedTreeEnsembles]:
+    """Export a fitted tree ensemble to its flat-array form"""
+    if isinstance(estimator, MultiOutputRegressor):
+        return StackedTreeEnsembles([FlatTreeEnsemble.from_estimator(e) for e in estimator.estimators_])
+    return FlatTreeEnsemble.from_estimator(estimator)
@@ -6,139 +6,124 @@ Centralized AI functionality for the trading bot
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.base import clone
+import copy
+import ctypes
 import joblib
 import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import warnings
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.tree._tree import Tree
+from ai_inference import compile_ensemble
+from ai_features import prepare_features
 warnings.filterwarnings('ignore')
 
 class AIModel:
     """Base class for AI prediction models"""
     
-    def __init__(self, name: str, timeframe: str, lookback_period: int = 50):
+    def __init__(self, name: str, timeframe: str, lookback_period: int = 50,
+                 horizons: Optional[List[int]] = None):
         self.name = name
         self.timeframe = timeframe
         self.lookback_period = lookback_period
+        self.horizons = sorted({int(h) for h in (horizons or [1])})
+        if self.horizons[0] < 1:
+            raise ValueError("Horizons must be at least 1 bar ahead")
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
         self.performance_metrics = {}
+        self.compiled_model = None
+        # Set on the weightless stand-in of a model spilled to disk by the manager
+        self.spill_path = None
         
-    def prepare_features(self, data: pd.DataFrame) -> np.ndarray:
-        """Prepare features for the model"""
-        # Technical indicators
-        data = data.copy()
-        
-        # Price-based features
-        data['returns'] = data['close'].pct_change()
-        data['volatility'] = data['returns'].rolling(window=20).std()
-        data['price_change'] = data['close'].diff()
-        data['high_low_pct'] = (data['high'] - data['low']) / data['close']
-        
-        # Moving averages
-        for period in [5, 10, 20, 50]:
-            data[f'sma_{period}'] = data['close'].rolling(window=period).mean()
-            data[f'price_to_sma_{period}'] = data['close'] / data[f'sma_{period}']
-        
-        # RSI
-        delta = data['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        data['rsi'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = data['close'].ewm(span=12).mean()
-        exp2 = data['close'].ewm(span=26).mean()
-        data['macd'] = exp1 - exp2
-        data['macd_signal'] = data['macd'].ewm(span=9).mean()
-        data['macd_histogram'] = data['macd'] - data['macd_signal']
-        
-        # Volume indicators
-        data['volume_sma'] = data['volume'].rolling(window=20).mean()
-        data['volume_ratio'] = data['volume'] / data['volume_sma']
-        
-        # Bollinger Bands
-        bb_period = 20
-        bb_std = 2
-        bb_middle = data['close'].rolling(window=bb_period).mean()
-        bb_std_dev = data['close'].rolling(window=bb_period).std()
-        data['bb_upper'] = bb_middle + (bb_std_dev * bb_std)
-        data['bb_lower'] = bb_middle - (bb_std_dev * bb_std)
-        data['bb_position'] = (data['close'] - data['bb_lower']) / (data['bb_upper'] - data['bb_lower'])
-        
-        # Select features for training
-        feature_columns = [
-            'returns', 'volatility', 'price_change', 'high_low_pct',
-            'price_to_sma_5', 'price_to_sma_10', 'price_to_sma_20', 'price_to_sma_50',
-            'rsi', 'macd', 'macd_signal', 'macd_histogram',
-            'volume_ratio', 'bb_position'
-        ]
+    def compile(self):
+        """Export the fitted estimator to the flat-array inference path"""
+        self.compiled_model = compile_ensemble(self.model)
         
-        features = data[feature_columns].dropna()
-        return features.values
+    def get_config(self) -> Dict:
+        """Constructor arguments beyond name, timeframe and lookback, saved with the model"""
+        return {"horizons": self.horizons}
     
-    def create_sequences(self, features: np.ndarray, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """Create sequences for time series prediction"""
-        X, y = [], []
-        for i in range(self.lookback_period, len(features)):
-            X.append(features[i-self.lookback_period:i].flatten())
-            y.append(prices[i])
-        return np.array(X), np.array(y)
-    
-    def train(self, data: pd.DataFrame) -> Dict:
-        """Train the model"""
-        raise NotImplementedError("Subclasses must implement train method")
-    
-    def predict(self, data: pd.DataFrame) -> Dict:
-        """Make prediction"""
-        raise NotImplementedError("Subclasses must implement predict method")
-    
-    def evaluate(self, data: pd.DataFrame) -> Dict:
-        """Evaluate model performance"""
-        if not self.is_trained:
-            return {"error": "Model not trained"}
-        
-        features = self.prepare_features(data)
-        if len(features) < self.lookback_period + 10:
-            return {"error": "Insufficient data for evaluation"}
-        
-        prices = data['close'].values[-len(features):]
-        X, y = self.create_sequences(features, prices)
+    @property
+    def multi_horizon(self) -> bool:
+        return len(self.horizons) > 1
+    
+    def feature_importances(self) -> np.ndarray:
+        return self.model.feature_importances_
         
-        if len(X) == 0:
-            return {"error": "No sequences created"}
+    def clone(self) -> 'AIModel':
+        """Untrained copy with the same configuration, to be fitted off to the side"""
+        fresh = copy.copy(self)
+        fresh.model = clone(self.model)
+        fresh.scaler = StandardScaler()
+        fresh.is_trained = False
+        fresh.performance_metrics = {}
+        fresh.compiled_model = None
+        fresh.spill_path = None
+        return fresh
+    
+    def memory_usage(self) -> Dict:
+        """Approximate bytes held by the estimator, the scaler and the compiled inference arrays"""
+        usage = {
+            "estimator": _nbytes(self.model),
+            "scaler": _nbytes(self.scaler),
+            "compiled": self.compiled_model.nbytes if self.compiled_model is not None else 0
+        }
+        usage["total"] = sum(usage.values())
+        return usage
         
-        X_scaled = self.scaler.transform(X)
-        predictions = self.model.predict(X_scaled)
+    def prepare_features(self, data: pd.DataFrame) -> np.ndarray:
+        """Prepare features for the model
+
+        Rows whose indicators are still warming up are dropped; see
+        ``ai_features.FEATURE_COLUMNS`` for the column order.
+        """
+        return prepare_features(data)
+    
+    def create_sequences(self, features: np.ndarray, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Create sequences for time series prediction
+
+        Each row of X is a flattened ``lookback_period`` window of features. With
+        one horizon y holds the price ``h`` bars after the window; with several,
+        y has one column per horizon, so every horizon shares the same X.
+        """
+        lookback = self.lookback_period
+        n = len(features) - lookback - self.horizons[-1] + 1
+        if n <= 0:
+            return np.array([]), np.array([])
         
-        mse = mean_squared_error(y, predictions)
-        r2 = r2_score(y, predictions)
+        X = self.windows(features, n)
         
-        return {
-            "mse": mse,
-            "rmse": np.sqrt(mse),
-            "r2": r2,
-            "predictions": predictions.tolist(),
-            "actual": y.tolist()
-        }
-
-class RandomForestModel(AIModel):
-    """Random Forest based prediction model"""
+        targets = [prices[lookback - 1 + h:lookback - 1 + h + n] for h in self.horizons]
+        y = np.column_stack(targets) if self.multi_horizon else targets[0]
+        return X, y
     
-    def __init__(self, name: str, timeframe: str, lookback_period: int = 50, n_estimators: int = 100):
-        super().__init__(name, timeframe, lookback_period)
-        self.n_estimators = n_estimators
-        self.model = RandomForestRegressor(n_estimators=n_estimators, random_state=42)
+    def windows(self, features: np.ndarray, n: Optional[int] = None) -> np.ndarray:
+        """The first ``n`` (default: all) flattened ``lookback_period`` windows of features"""
+        windows = sliding_window_view(features, self.lookback_period, axis=0)[:n]
+        return windows.transpose(0, 2, 1).reshape(len(windows), -1)
     
-    def train(self, data: pd.DataFrame) -> Dict:
-        """Train the Random Forest model"""
+    def train(self, data: pd.DataFrame, features: Optional[np.ndarray] = None) -> Dict:
+        """Train the model, optionally on features already prepared from ``data``
+
+        Fits on the first 80% of the sequences and scores on the rest. This
+        fits the instance in place, so published models are retrained through
+        ``AIModelManager.train_model``, which fits a clone and swaps it in.
+        """
         try:
-            features = self.prepare_features(data)
+            if features is None:
+                features = self.prepare_features(data)
             if len(features) < self.lookback_period + 10:
                 return {"success": False, "error": "Insufficient data for training"}
             
@@ -158,19 +143,17 @@ class RandomForestModel(AIModel):
             X_val_scaled = self.scaler.transform(X_val)
             
             # Train model
-            self.model.fit(X_train_scaled, y_train)
+            self.fit_scaled(X_train_scaled, y_train)
+            self.compile()
             self.is_trained = True
             
             # Evaluate
-            train_pred = self.model.predict(X_train_scaled)
-            val_pred = self.model.predict(X_val_scaled)
-            
-            train_r2 = r2_score(y_train, train_pred)
-            val_r2 = r2_score(y_val, val_pred)
+            train_pred = self.predict_batch(X_train_scaled)
+            val_pred = self.predict_batch(X_val_scaled)
             
             self.performance_metrics = {
-                "train_r2": train_r2,
-                "val_r2": val_r2,
+                "train_r2": r2_score(y_train, train_pred),
+                "val_r2": r2_score(y_val, val_pred),
                 "train_rmse": np.sqrt(mean_squared_error(y_train, train_pred)),
                 "val_rmse": np.sqrt(mean_squared_error(y_val, val_pred))
             }
@@ -178,19 +161,32 @@ class RandomForestModel(AIModel):
             return {
                 "success": True,
                 "metrics": self.performance_metrics,
-                "feature_importance": self.model.feature_importances_.tolist()
+                "feature_importance": self.feature_importances().tolist()
             }
         
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def predict(self, data: pd.DataFrame) -> Dict:
-        """Make prediction with Random Forest"""
+    def fit_scaled(self, X_scaled: np.ndarray, y: np.ndarray):
+        """Fit the estimator on scaled input rows"""
+        self.model.fit(X_scaled, y)
+    
+    def predict_scaled(self, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Prediction and confidence per horizon for one scaled input row"""
+        raise NotImplementedError("Subclasses must implement predict_scaled method")
+    
+    def predict_batch(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Predictions for many scaled input rows"""
+        return self.model.predict(X_scaled)
+    
+    def predict(self, data: pd.DataFrame, features: Optional[np.ndarray] = None) -> Dict:
+        """Make prediction, optionally from features already prepared from ``data``"""
         if not self.is_trained:
             return {"error": "Model not trained"}
         
         try:
-            features = self.prepare_features(data)
+            if features is None:
+                features = self.prepare_features(data)
             if len(features) < self.lookback_period:
                 return {"error": "Insufficient data for prediction"}
             
@@ -198,130 +194,618 @@ class RandomForestModel(AIModel):
             last_sequence = features[-self.lookback_period:].flatten().reshape(1, -1)
             last_sequence_scaled = self.scaler.transform(last_sequence)
             
-            # Make prediction
-            prediction = self.model.predict(last_sequence_scaled)[0]
+            predictions, confidences = self.predict_scaled(last_sequence_scaled)
             current_price = data['close'].iloc[-1]
             
-            # Calculate prediction confidence (using prediction variance from trees)
-            predictions_from_trees = np.array([tree.predict(last_sequence_scaled)[0] for tree in self.model.estimators_])
-            confidence = 1.0 - (np.std(predictions_from_trees) / np.mean(predictions_from_trees))
-            
-            return {
-                "prediction": prediction,
-                "current_price": current_price,
-                "price_change": prediction - current_price,
-                "price_change_pct": ((prediction - current_price) / current_price) * 100,
-                "confidence": confidence,
-                "signal": "BUY" if prediction > current_price else "SELL",
-                "strength": abs((prediction - current_price) / current_price) * 100
+            forecasts = {
+                horizon: self._forecast(prediction, confidence, current_price)
+                for horizon, prediction, confidence in zip(self.horizons, predictions, confidences)
             }
+            
+            # The shortest horizon stays at the top level for single-horizon clients
+            result = dict(forecasts[self.horizons[0]])
+            if self.multi_horizon:
+                result["horizons"] = forecasts
+            return result
         
         except Exception as e:
             return {"error": str(e)}
-
-class GradientBoostingModel(AIModel):
-    """Gradient Boosting based prediction model"""
     
-    def __init__(self, name: str, timeframe: str, lookback_period: int = 50, n_estimators: int = 100):
-        super().__init__(name, timeframe, lookback_period)
-        self.n_estimators = n_estimators
-        self.model = GradientBoostingRegressor(n_estimators=n_estimators, random_state=42)
+    @staticmethod
+    def _forecast(prediction: float, confidence: float, current_price: float) -> Dict:
+        return {
+            "prediction": prediction,
+            "current_price": current_price,
+            "price_change": prediction - current_price,
+            "price_change_pct": ((prediction - current_price) / current_price) * 100,
+            "confidence": confidence,
+            "signal": "BUY" if prediction > current_price else "SELL",
+            "strength": abs((prediction - current_price) / current_price) * 100
+        }
     
-    def train(self, data: pd.DataFrame) -> Dict:
-        """Train the Gradient Boosting model"""
-        try:
+    def evaluate(self, data: pd.DataFrame, features: Optional[np.ndarray] = None) -> Dict:
+        """Evaluate model performance, optionally on features already prepared from ``data``"""
+        if not self.is_trained:
+            return {"error": "Model not trained"}
+        
+        if features is None:
             features = self.prepare_features(data)
-            if len(features) < self.lookback_period + 10:
-                return {"success": False, "error": "Insufficient data for training"}
-            
+        if len(features) < self.lookback_period + 10:
+            return {"error": "Insufficient data for evaluation"}
+        
+        prices = data['close'].values[-len(features):]
+        X, y = self.create_sequences(features, prices)
+        
+        if len(X) == 0:
+            return {"error": "No sequences created"}
+        
+        X_scaled = self.scaler.transform(X)
+        predictions = self.predict_batch(X_scaled)
+        
+        mse = mean_squared_error(y, predictions)
+        r2 = r2_score(y, predictions)
+        
+        result = {
+            "mse": mse,
+            "rmse": np.sqrt(mse),
+            "r2": r2,
+            "predictions": predictions,
+            "actual": y
+        }
+        if self.multi_horizon:
+            result["horizons"] = {}
+            for k, horizon in enumerate(self.horizons):
+                horizon_mse = mean_squared_error(y[:, k], predictions[:, k])
+                result["horizons"][horizon] = {
+                    "mse": horizon_mse,
+                    "rmse": np.sqrt(horizon_mse),
+                    "r2": r2_score(y[:, k], predictions[:, k])
+                }
+        return result
+
+    def cross_validate(self, data: pd.DataFrame, features: Optional[np.ndarray] = None,
+                       n_splits: int = 5, purge: Optional[int] = None, embargo: int = 0,
+                       max_workers: Optional[int] = None) -> Dict:
+        """Walk-forward evaluation of this configuration on purged folds
+
+        The sequences are cut into ``n_splits + 1`` consecutive blocks and
+        each fold tests one block after training an untrained copy on every
+        row before it. ``purge`` rows (default: the longest horizon) are
+        dropped ahead of the test block, so no training target falls inside
+        it, and ``embargo`` more rows widen that gap. Folds are fitted in
+        parallel processes that share one sequence matrix. The model itself
+        is left untouched.
+        """
+        try:
+            if features is None:
+                features = self.prepare_features(data)
             prices = data['close'].values[-len(features):]
             X, y = self.create_sequences(features, prices)
             
-            if len(X) == 0:
-                return {"success": False, "error": "No sequences created"}
-            
-            # Split data
-            split_idx = int(0.8 * len(X))
-            X_train, X_val = X[:split_idx], X[split_idx:]
-            y_train, y_val = y[:split_idx], y[split_idx:]
-            
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_val_scaled = self.scaler.transform(X_val)
-            
-            # Train model
-            self.model.fit(X_train_scaled, y_train)
-            self.is_trained = True
+            purge = self.horizons[-1] if purge is None else int(purge)
+            if purge < 0 or embargo < 0:
+                return {"success": False, "error": "Purge and embargo cannot be negative"}
+            test_size = len(X) // (n_splits + 1)
+            if n_splits < 2 or test_size < 10 or test_size - purge - embargo < 10:
+                return {"success": False, "error": "Insufficient data for cross-validation"}
             
-            # Evaluate
-            train_pred = self.model.predict(X_train_scaled)
-            val_pred = self.model.predict(X_val_scaled)
+            folds = []
+            for k in range(n_splits):
+                test_start = len(X) - (n_splits - k) * test_size
+                test_end = test_start + test_size if k < n_splits - 1 else len(X)
+                folds.append((k, test_start - purge - embargo, test_start, test_end))
             
-            train_r2 = r2_score(y_train, train_pred)
-            val_r2 = r2_score(y_val, val_pred)
+            started = datetime.now()
+            results = self._map_folds(_cv_fold, folds, X, y, max_workers)
             
-            self.performance_metrics = {
-                "train_r2": train_r2,
-                "val_r2": val_r2,
-                "train_rmse": np.sqrt(mean_squared_error(y_train, train_pred)),
-                "val_rmse": np.sqrt(mean_squared_error(y_val, val_pred))
-            }
+            # Row i of X ends at candle i + lookback - 1 of the feature rows
+            times = data['datetime'].values[-len(features):] if 'datetime' in data else None
+            for result, (k, train_end, test_start, test_end) in zip(results, folds):
+                if times is not None:
+                    result["start"] = pd.Timestamp(times[test_start + self.lookback_period - 1]).isoformat()
+                    result["end"] = pd.Timestamp(times[test_end + self.lookback_period - 2]).isoformat()
             
+            # Pooled out-of-sample score over every test row
+            actual = np.concatenate([r.pop("actual") for r in results])
+            predicted = np.concatenate([r.pop("predictions") for r in results])
+            mse = mean_squared_error(actual, predicted)
             return {
                 "success": True,
-                "metrics": self.performance_metrics,
-                "feature_importance": self.model.feature_importances_.tolist()
+                "n_splits": n_splits,
+                "purge": purge,
+                "embargo": embargo,
+                "folds": results,
+                "aggregate": {
+                    "rmse_mean": float(np.mean([r["rmse"] for r in results])),
+                    "rmse_std": float(np.std([r["rmse"] for r in results])),
+                    "r2_mean": float(np.mean([r["r2"] for r in results])),
+                    "r2_std": float(np.std([r["r2"] for r in results])),
+                    "oos_mse": mse,
+                    "oos_rmse": float(np.sqrt(mse)),
+                    "oos_r2": r2_score(actual, predicted)
+                },
+                "elapsed_seconds": (datetime.now() - started).total_seconds()
             }
         
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def predict(self, data: pd.DataFrame) -> Dict:
-        """Make prediction with Gradient Boosting"""
-        if not self.is_trained:
-            return {"error": "Model not trained"}
-        
-        try:
+    def predict_walk_forward(self, data: pd.DataFrame, features: Optional[np.ndarray] = None,
+                             retrain_every: Optional[int] = 500, train_window: Optional[int] = None,
+                             min_train: int = 500, max_workers: Optional[int] = None) -> np.ndarray:
+        """Out-of-sample forecasts for every candle of ``data``, refitting as history grows
+
+        Row t holds the forecast per horizon made at the close of candle t,
+        NaN until the first fit. Every ``retrain_every`` candles (or only once,
+        if None) an untrained copy is fitted on the windows whose targets are
+        known by then (the last ``train_window`` of them, or all), and
+        predicts the following block in one batch. Blocks are fitted in parallel processes that
+        share one window matrix; the model itself is left untouched.
+        """
+        if features is None:
             features = self.prepare_features(data)
-            if len(features) < self.lookback_period:
-                return {"error": "Insufficient data for prediction"}
-            
-            # Use last sequence for prediction
-            last_sequence = features[-self.lookback_period:].flatten().reshape(1, -1)
-            last_sequence_scaled = self.scaler.transform(last_sequence)
-            
-            # Make prediction
-            prediction = self.model.predict(last_sequence_scaled)[0]
-            current_price = data['close'].iloc[-1]
-            
-            # Calculate confidence based on staged prediction variance
-            staged_predictions = list(self.model.staged_predict(last_sequence_scaled))
-            recent_predictions = staged_predictions[-10:]  # Last 10 stages
-            confidence = 1.0 - (np.std(recent_predictions) / np.mean(recent_predictions))
-            
-            return {
-                "prediction": prediction,
-                "current_price": current_price,
-                "price_change": prediction - current_price,
-                "price_change_pct": ((prediction - current_price) / current_price) * 100,
-                "confidence": confidence,
-                "signal": "BUY" if prediction > current_price else "SELL",
-                "strength": abs((prediction - current_price) / current_price) * 100
+        prices = data['close'].values[-len(features):]
+        X = self.windows(features)
+        _, y = self.create_sequences(features, prices)
+        
+        # A window's target is known once its horizon has passed, at the next block's first candle
+        lag = self.horizons[-1] - 1
+        first = min_train + lag
+        if len(X) <= first:
+            raise ValueError("Insufficient data for walk-forward predictions")
+        
+        step = retrain_every or len(X)
+        blocks = []
+        for start in range(first, len(X), step):
+            train_end = start - lag
+            train_start = max(train_end - train_window, 0) if train_window else 0
+            blocks.append((train_start, train_end, start, min(start + step, len(X))))
+        predictions = self._map_folds(_walk_forward_block, blocks, X, y, max_workers)
+        
+        out = np.full((len(data), len(self.horizons)), np.nan)
+        offset = len(data) - len(features) + self.lookback_period - 1
+        for (_, _, start, end), block in zip(blocks, predictions):
+            out[offset + start:offset + end] = block.reshape(end - start, -1)
+        return out
+    
+    def _map_folds(self, func, tasks: List[Tuple], X: np.ndarray, y: np.ndarray,
+                   max_workers: Optional[int] = None) -> List:
+        """Run ``func`` over fold tasks, in a process pool sharing an untrained copy, X and y"""
+        fresh = self.clone()
+        workers = min(len(tasks), os.cpu_count() or 1) if max_workers is None else max_workers
+        if workers <= 1:
+            _init_cv_worker(fresh, X, y)
+            return [func(task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_cv_worker,
+                                 initargs=(fresh, X, y)) as executor:
+            return list(executor.map(func, tasks))
+
+def _nbytes(obj, seen: Optional[set] = None) -> int:
+    """Bytes of the arrays and fitted trees reachable from an estimator or scaler"""
+    seen = set() if seen is None else seen
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return obj.nbytes + sum(_nbytes(item, seen) for item in obj.flat)
+        return obj.nbytes
+    if isinstance(obj, Tree):
+        state = obj.__getstate__()
+        return state['nodes'].nbytes + state['values'].nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(item, seen) for item in obj)
+    if isinstance(obj, dict):
+        return sum(_nbytes(item, seen) for item in obj.values())
+    if hasattr(obj, '__dict__'):
+        return _nbytes(vars(obj), seen)
+    return 0
+
+def _release_memory():
+    """Hand freed heap pages back to the OS, where glibc would otherwise keep them"""
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _process_running(pid: int) -> bool:
+    """Whether a process with this id exists; assumed so where it cannot be checked"""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# Per-process state for cross-validation folds, set once by the pool initializer
+_cv_shared: Dict = {}
+
+def _init_cv_worker(model: AIModel, X: np.ndarray, y: np.ndarray):
+    _cv_shared.clear()
+    _cv_shared.update(model=model, X=X, y=y)
+
+def _fit_fold(train_start: int, train_end: int) -> AIModel:
+    """Fresh copy of the shared model fitted on rows ``train_start:train_end``"""
+    model = _cv_shared['model'].clone()
+    X, y = _cv_shared['X'], _cv_shared['y']
+    model.fit_scaled(model.scaler.fit_transform(X[train_start:train_end]), y[train_start:train_end])
+    return model
+
+def _cv_fold(fold: Tuple[int, int, int, int]) -> Dict:
+    """Fit a fresh copy on one fold's training rows and score its test block"""
+    k, train_end, test_start, test_end = fold
+    model = _fit_fold(0, train_end)
+    predictions = model.predict_batch(model.scaler.transform(_cv_shared['X'][test_start:test_end]))
+    actual = _cv_shared['y'][test_start:test_end]
+    
+    mse = mean_squared_error(actual, predictions)
+    result = {
+        "fold": k,
+        "train_rows": train_end,
+        "test_rows": test_end - test_start,
+        "mse": mse,
+        "rmse": float(np.sqrt(mse)),
+        "r2": r2_score(actual, predictions),
+        "predictions": predictions,
+        "actual": actual
+    }
+    if model.multi_horizon:
+        result["horizons"] = {}
+        for i, horizon in enumerate(model.horizons):
+            horizon_mse = mean_squared_error(actual[:, i], predictions[:, i])
+            result["horizons"][horizon] = {
+                "mse": horizon_mse,
+                "rmse": float(np.sqrt(horizon_mse)),
+                "r2": r2_score(actual[:, i], predictions[:, i])
             }
+    return result
+
+def _walk_forward_block(block: Tuple[int, int, int, int]) -> np.ndarray:
+    """Fit a fresh copy on one block's training rows and predict the block"""
+    train_start, train_end, start, end = block
+    model = _fit_fold(train_start, train_end)
+    return model.predict_batch(model.scaler.transform(_cv_shared['X'][start:end]))
+
+class RandomForestModel(AIModel):
+    """Random Forest based prediction model"""
+    
+    def __init__(self, name: str, timeframe: str, lookback_period: int = 50, n_estimators: int = 100,
+                 horizons: Optional[List[int]] = None, model_params: Optional[Dict] = None):
+        super().__init__(name, timeframe, lookback_period, horizons)
+        self.n_estimators = n_estimators
+        self.model_params = dict(model_params or {})
+        # A forest fits all horizons at once as one multi-output model
+        self.model = RandomForestRegressor(**{"n_estimators": n_estimators, "random_state": 42, **self.model_params})
+    
+    def get_config(self) -> Dict:
+        return {**super().get_config(), "n_estimators": self.n_estimators, "model_params": self.model_params}
+    
+    def predict_scaled(self, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Random Forest prediction with the per-tree spread as confidence"""
+        prediction, tree_predictions = self.compiled_model.predict_with_dispersion(X_scaled)
         
-        except Exception as e:
-            return {"error": str(e)}
+        # Calculate prediction confidence (using prediction variance from trees)
+        confidence = np.array([
+            1.0 - (np.std(tree_predictions[:, 0, k]) / np.mean(tree_predictions[:, 0, k]))
+            for k in range(tree_predictions.shape[2])
+        ])
+        return prediction[0], confidence
+
+class GradientBoostingModel(AIModel):
+    """Gradient Boosting based prediction model"""
+    
+    def __init__(self, name: str, timeframe: str, lookback_period: int = 50, n_estimators: int = 100,
+                 horizons: Optional[List[int]] = None, model_params: Optional[Dict] = None):
+        super().__init__(name, timeframe, lookback_period, horizons)
+        self.n_estimators = n_estimators
+        self.model_params = dict(model_params or {})
+        self.model = GradientBoostingRegressor(**{"n_estimators": n_estimators, "random_state": 42, **self.model_params})
+        if self.multi_horizon:
+            # Boosting is single-output, so each horizon gets its own boosted model
+            self.model = MultiOutputRegressor(self.model)
+    
+    def get_config(self) -> Dict:
+        return {**super().get_config(), "n_estimators": self.n_estimators, "model_params": self.model_params}
+    
+    def feature_importances(self) -> np.ndarray:
+        if self.multi_horizon:
+            return np.mean([e.feature_importances_ for e in self.model.estimators_], axis=0)
+        return self.model.feature_importances_
+    
+    def predict_scaled(self, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gradient Boosting prediction with the spread of the last stages as confidence"""
+        prediction, staged_predictions = self.compiled_model.predict_with_dispersion(X_scaled)
+        
+        # Calculate confidence based on staged prediction variance
+        confidence = np.array([
+            1.0 - (np.std(staged_predictions[-10:, 0, k]) / np.mean(staged_predictions[-10:, 0, k]))  # Last 10 stages
+            for k in range(staged_predictions.shape[2])
+        ])
+        return prediction[0], confidence
+
+# Shared pool for running ensemble members concurrently; threads start on first use
+_member_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ensemble-member')
+
+def _reset_member_executor():
+    # A forked child (e.g. a cross-validation worker) inherits the pool but not its threads
+    global _member_executor
+    _member_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ensemble-member')
+
+os.register_at_fork(after_in_child=_reset_member_executor)
+
+class EnsembleModel(AIModel):
+    """Weighted blend of member models sharing one feature and scaling pass
+
+    ``model_params`` are estimator settings for the members: an entry named
+    after a member type (e.g. ``{"gradient_boosting": {"learning_rate": 0.05}}``)
+    applies to members of that type only, any other entry to every member.
+    """
+    
+    MEMBER_TYPES = {
+        'random_forest': RandomForestModel,
+        'gradient_boosting': GradientBoostingModel
+    }
+    
+    def __init__(self, name: str, timeframe: str, lookback_period: int = 50, n_estimators: int = 100,
+                 members: Optional[List[str]] = None, weights: Optional[List[float]] = None,
+                 horizons: Optional[List[int]] = None, model_params: Optional[Dict] = None):
+        self.members = []
+        super().__init__(name, timeframe, lookback_period, horizons)
+        self.n_estimators = n_estimators
+        self.model_params = dict(model_params or {})
+        self.member_types = list(members or ['random_forest', 'gradient_boosting'])
+        
+        unknown = [t for t in self.member_types if t not in self.MEMBER_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown member model types: {', '.join(unknown)}")
+        
+        weights = np.ones(len(self.member_types)) if weights is None else np.asarray(weights, dtype=float)
+        if (weights.shape != (len(self.member_types),) or not np.isfinite(weights).all()
+                or not (weights >= 0).all() or weights.sum() <= 0):
+            raise ValueError("Need one non-negative weight per member, not all zero")
+        self.weights = weights / weights.sum()
+        
+        shared = {k: v for k, v in self.model_params.items() if k not in self.MEMBER_TYPES}
+        self.members = [
+            self.MEMBER_TYPES[t](f"{name}_{t}", timeframe, lookback_period, n_estimators, self.horizons,
+                                 model_params={**shared, **self.model_params.get(t, {})})
+            for t in self.member_types
+        ]
+    
+    @property
+    def model(self) -> List:
+        """Member estimators, in member order"""
+        return [member.model for member in self.members]
+    
+    @model.setter
+    def model(self, estimators: Optional[List]):
+        if estimators is None:
+            return
+        for member, estimator in zip(self.members, estimators):
+            member.model = estimator
+    
+    def get_config(self) -> Dict:
+        return {
+            **super().get_config(),
+            "n_estimators": self.n_estimators,
+            "members": self.member_types,
+            "weights": self.weights.tolist(),
+            "model_params": self.model_params
+        }
+    
+    def clone(self) -> 'EnsembleModel':
+        return EnsembleModel(self.name, self.timeframe, self.lookback_period, **self.get_config())
+    
+    def compile(self):
+        for member in self.members:
+            member.compile()
+            member.is_trained = True
+    
+    def memory_usage(self) -> Dict:
+        usages = [member.memory_usage() for member in self.members]
+        usage = {
+            "estimator": sum(u["estimator"] for u in usages),
+            "scaler": _nbytes(self.scaler),
+            "compiled": sum(u["compiled"] for u in usages)
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+    
+    def feature_importances(self) -> np.ndarray:
+        return sum(w * m.feature_importances() for w, m in zip(self.weights, self.members))
+    
+    def train(self, data: pd.DataFrame, features: Optional[np.ndarray] = None) -> Dict:
+        """Train all members on one shared feature matrix, scaled once for every member"""
+        result = super().train(data, features)
+        if result["success"]:
+            result["weights"] = dict(zip(self.member_types, self.weights.tolist()))
+        return result
+    
+    def fit_scaled(self, X_scaled: np.ndarray, y: np.ndarray):
+        """Fit the members concurrently on the same scaled rows"""
+        list(_member_executor.map(lambda member: member.fit_scaled(X_scaled, y), self.members))
+    
+    def predict_scaled(self, X_scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Weighted blend of the members' predictions and confidences"""
+        results = list(_member_executor.map(lambda member: member.predict_scaled(X_scaled), self.members))
+        predictions = np.array([r[0] for r in results])
+        confidences = np.array([r[1] for r in results])
+        return self.weights @ predictions, self.weights @ confidences
+    
+    def predict_batch(self, X_scaled: np.ndarray) -> np.ndarray:
+        predictions = list(_member_executor.map(lambda member: member.predict_batch(X_scaled), self.members))
+        return np.tensordot(self.weights, np.stack(predictions), axes=1)
 
 class AIModelManager:
-    """Central manager for AI models"""
+    """Central manager for AI models
+
+    The registry is copy-on-write: every change builds a new dict and swaps
+    it in under a lock, so readers can take ``self.models`` without locking
+    and always see a consistent snapshot. Published models are never
+    mutated; training fits a clone and swaps it in with a new version.
+
+    With a ``memory_budget`` (bytes, or ``AI_MODEL_MEMORY_MB``), trained
+    models beyond the budget are spilled to ``spill_dir`` least recently
+    used first. A spilled model stays listed as a weightless stand-in and
+    ``get_model`` loads it back on demand, spilling others if needed. Spill
+    files only live until they are loaded back; files left behind by
+    processes that are no longer running are removed on startup.
+    """
     
-    def __init__(self):
+    def __init__(self, memory_budget: Optional[int] = None, spill_dir: Optional[str] = None):
+        if memory_budget is None and os.environ.get('AI_MODEL_MEMORY_MB'):
+            memory_budget = int(float(os.environ['AI_MODEL_MEMORY_MB']) * 2**20)
+        self.memory_budget = memory_budget or None
+        self.spill_dir = spill_dir or os.environ.get('AI_MODEL_SPILL_DIR', os.path.join('models', 'spill'))
         self.models = {}
+        self.versions = {}
         self.timeframes = ['1m', '5m', '15m', '30m', '1h', '4h', '1d']
         self.model_types = {
             'random_forest': RandomForestModel,
-            'gradient_boosting': GradientBoostingModel
+            'gradient_boosting': GradientBoostingModel,
+            'ensemble': EnsembleModel
         }
+        self._lock = threading.RLock()
+        self._training_locks = {}
+        self._last_used = {}
+        # model_id -> (version, bytes) of the last footprint measured
+        self._footprints = {}
+        if self.memory_budget:
+            self._clear_stale_spills()
+        
+    def get_model(self, model_id: str) -> Optional[AIModel]:
+        """Currently published model, or None; a spilled model is loaded back first"""
+        model = self.models.get(model_id)
+        if model is not None and self.memory_budget:
+            self._last_used[model_id] = time.monotonic()
+            if model.spill_path is not None:
+                model = self._reload(model_id)
+        return model
+    
+    def get_version(self, model_id: str) -> int:
+        """Number of times a model has been published"""
+        return self.versions.get(model_id, 0)
+    
+    def _publish(self, model_id: str, model: AIModel) -> int:
+        """Atomically replace the registry entry and bump its version"""
+        with self._lock:
+            replaced = self.models.get(model_id)
+            if replaced is not None and replaced.spill_path is not None:
+                # A retrained or reloaded-from-file model supersedes the spilled one
+                os.remove(replaced.spill_path)
+            models = dict(self.models)
+            models[model_id] = model
+            versions = dict(self.versions)
+            versions[model_id] = versions.get(model_id, 0) + 1
+            self.models = models
+            self.versions = versions
+            return versions[model_id]
+    
+    def _swap(self, model_id: str, model: AIModel):
+        """Replace a registry entry with the same version in another form (spilled or loaded)"""
+        with self._lock:
+            models = dict(self.models)
+            models[model_id] = model
+            self.models = models
+    
+    def footprint(self, model_id: str) -> int:
+        """Bytes held by a model's estimator, scaler and compiled arrays, measured once per version"""
+        model = self.models.get(model_id)
+        if model is None or model.spill_path is not None:
+            return 0
+        version = self.versions.get(model_id, 0)
+        cached = self._footprints.get(model_id)
+        if cached is None or cached[0] != version:
+            cached = (version, model.memory_usage()["total"])
+            self._footprints[model_id] = cached
+        return cached[1]
+    
+    def memory_summary(self) -> Dict:
+        """Bytes of all loaded models, against the budget"""
+        models = self.models
+        return {
+            "total_bytes": sum(self.footprint(model_id) for model_id in models),
+            "budget_bytes": self.memory_budget,
+            "loaded_models": sum(1 for m in models.values() if m.is_trained and m.spill_path is None),
+            "spilled_models": sum(1 for m in models.values() if m.spill_path is not None)
+        }
+    
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """Spill least recently used trained models until the loaded ones fit the budget"""
+        if not self.memory_budget:
+            return
+        with self._lock:
+            loaded = [model_id for model_id, model in self.models.items()
+                      if model.is_trained and model.spill_path is None]
+            total = sum(self.footprint(model_id) for model_id in loaded)
+            spilled = False
+            for model_id in sorted(loaded, key=lambda m: self._last_used.get(m, 0)):
+                if total <= self.memory_budget:
+                    break
+                if model_id != keep:
+                    total -= self.footprint(model_id)
+                    self._spill(model_id)
+                    spilled = True
+        if spilled:
+            _release_memory()
+    
+    def _clear_stale_spills(self):
+        """Remove spill files whose process is gone; they can never be loaded back"""
+        if not os.path.isdir(self.spill_dir):
+            return
+        for entry in os.scandir(self.spill_dir):
+            # "{model_id}.{pid}.v{version}.joblib", where the model id may contain dots
+            parts = entry.name.rsplit('.', 3)
+            if len(parts) != 4 or parts[3] != 'joblib' or not parts[1].isdigit():
+                continue
+            if int(parts[1]) != os.getpid() and not _process_running(int(parts[1])):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    # Another starting worker may have removed it first
+                    pass
+    
+    def _spill(self, model_id: str):
+        """Write a model's fitted state to disk and publish a weightless stand-in"""
+        model = self.models[model_id]
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Worker processes share the directory but not their models
+        name = f"{model_id}.{os.getpid()}.v{self.versions.get(model_id, 0)}.joblib"
+        path = os.path.join(self.spill_dir, name)
+        joblib.dump({"model": model.model, "scaler": model.scaler,
+                     "compiled": [m.compiled_model for m in getattr(model, "members", [model])]}, path)
+        stand_in = model.clone()
+        stand_in.is_trained = True
+        stand_in.performance_metrics = model.performance_metrics
+        stand_in.spill_path = path
+        self._swap(model_id, stand_in)
+    
+    def _reload(self, model_id: str) -> Optional[AIModel]:
+        with self._lock:
+            stand_in = self.models.get(model_id)
+            if stand_in is None or stand_in.spill_path is None:
+                return stand_in
+            state = joblib.load(stand_in.spill_path)
+            # The loaded model is the only copy from now on; spilling it again writes a new file
+            os.remove(stand_in.spill_path)
+            model = stand_in.clone()
+            model.model = state["model"]
+            model.scaler = state["scaler"]
+            for member, compiled in zip(getattr(model, "members", [model]), state["compiled"]):
+                member.compiled_model = compiled
+                member.is_trained = True
+            model.is_trained = True
+            model.performance_metrics = stand_in.performance_metrics
+            self._swap(model_id, model)
+            self._enforce_budget(keep=model_id)
+            return model
+    
+    def _training_lock(self, model_id: str) -> threading.Lock:
+        with self._lock:
+            return self._training_locks.setdefault(model_id, threading.Lock())
         
     def create_model(self, model_type: str, name: str, timeframe: str, **kwargs) -> bool:
         """Create a new AI model"""
@@ -332,39 +816,59 @@ class AIModelManager:
         model = model_class(name, timeframe, **kwargs)
         
         model_id = f"{name}_{timeframe}_{model_type}"
-        self.models[model_id] = model
+        self._publish(model_id, model)
         return True
     
-    def train_model(self, model_id: str, data: pd.DataFrame) -> Dict:
-        """Train a specific model"""
+    def train_model(self, model_id: str, data: pd.DataFrame,
+                    features: Optional[np.ndarray] = None) -> Dict:
+        """Train a copy of a model and swap it in once fitted
+
+        Predictions keep using the published model until the swap. Retrains
+        of the same model are serialized; different models train in parallel.
+        """
         if model_id not in self.models:
             return {"success": False, "error": "Model not found"}
         
-        return self.models[model_id].train(data)
+        with self._training_lock(model_id):
+            # Only the configuration is needed, so a spilled model is not loaded back
+            current = self.models.get(model_id)
+            if current is None:
+                return {"success": False, "error": "Model not found"}
+            
+            candidate = current.clone()
+            result = candidate.train(data, features)
+            if result.get("success"):
+                result["version"] = self._publish(model_id, candidate)
+                self._last_used[model_id] = time.monotonic()
+                self._enforce_budget(keep=model_id)
+            return result
     
-    def predict_with_model(self, model_id: str, data: pd.DataFrame) -> Dict:
+    def predict_with_model(self, model_id: str, data: pd.DataFrame,
+                           features: Optional[np.ndarray] = None) -> Dict:
         """Make prediction with a specific model"""
-        if model_id not in self.models:
+        model = self.get_model(model_id)
+        if model is None:
             return {"error": "Model not found"}
         
-        return self.models[model_id].predict(data)
+        return model.predict(data, features)
     
     def compare_models(self, model_ids: List[str], data: pd.DataFrame) -> Dict:
         """Compare multiple models"""
         results = {}
         
         for model_id in model_ids:
-            if model_id in self.models:
-                evaluation = self.models[model_id].evaluate(data)
-                prediction = self.models[model_id].predict(data)
+            model = self.get_model(model_id)
+            if model is not None:
+                evaluation = model.evaluate(data)
+                prediction = model.predict(data)
                 
                 results[model_id] = {
                     "evaluation": evaluation,
                     "prediction": prediction,
                     "model_info": {
-                        "name": self.models[model_id].name,
-                        "timeframe": self.models[model_id].timeframe,
-                        "is_trained": self.models[model_id].is_trained
+                        "name": model.name,
+                        "timeframe": model.timeframe,
+                        "is_trained": model.is_trained
                     }
                 }
         
@@ -373,6 +877,7 @@ class AIModelManager:
     def get_model_list(self) -> List[Dict]:
         """Get list of all models"""
         model_list = []
+        versions = self.versions
         for model_id, model in self.models.items():
             model_list.append({
                 "id": model_id,
@@ -380,24 +885,29 @@ class AIModelManager:
                 "timeframe": model.timeframe,
                 "type": type(model).__name__,
                 "is_trained": model.is_trained,
-                "performance": model.performance_metrics
+                "version": versions.get(model_id, 0),
+                "performance": model.performance_metrics,
+                "memory_bytes": self.footprint(model_id),
+                "spilled": model.spill_path is not None
             })
         return model_list
     
     def save_model(self, model_id: str, filepath: str) -> bool:
         """Save a trained model"""
-        if model_id not in self.models or not self.models[model_id].is_trained:
+        model = self.get_model(model_id)
+        if model is None or not model.is_trained:
             return False
         
         try:
             model_data = {
-                "model": self.models[model_id].model,
-                "scaler": self.models[model_id].scaler,
+                "model": model.model,
+                "scaler": model.scaler,
                 "metadata": {
-                    "name": self.models[model_id].name,
-                    "timeframe": self.models[model_id].timeframe,
-                    "lookback_period": self.models[model_id].lookback_period,
-                    "performance_metrics": self.models[model_id].performance_metrics
+                    "name": model.name,
+                    "timeframe": model.timeframe,
+                    "lookback_period": model.lookback_period,
+                    "config": model.get_config(),
+                    "performance_metrics": model.performance_metrics
                 }
             }
             joblib.dump(model_data, filepath)
@@ -412,19 +922,23 @@ class AIModelManager:
             metadata = model_data["metadata"]
             
             # Create appropriate model type based on the saved model
-            if model_id.endswith('random_forest'):
-                model = RandomForestModel(metadata["name"], metadata["timeframe"], metadata["lookback_period"])
-            elif model_id.endswith('gradient_boosting'):
-                model = GradientBoostingModel(metadata["name"], metadata["timeframe"], metadata["lookback_period"])
-            else:
+            model_type = next((t for t in self.model_types if model_id.endswith(t)), None)
+            if model_type is None:
                 return False
+            model = self.model_types[model_type](
+                metadata["name"], metadata["timeframe"], metadata["lookback_period"],
+                **metadata.get("config", {})
+            )
             
             model.model = model_data["model"]
             model.scaler = model_data["scaler"]
+            model.compile()
             model.is_trained = True
             model.performance_metrics = metadata["performance_metrics"]
             
-            self.models[model_id] = model
+            self._publish(model_id, model)
+            self._last_used[model_id] = time.monotonic()
+            self._enforce_budget(keep=model_id)
             return True
         except Exception:
             return False
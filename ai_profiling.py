@@ -0,0 +1,182 @@
+"""
+Request Profiling
+Opt-in cProfile capture of single API requests, kept in a bounded directory
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+ENABLED = os.environ.get('AI_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('AI_PROFILE_DIR', 'profiles')
+MAX_PROFILES = int(os.environ.get('AI_PROFILE_MAX', 100))
+# When set, a request is only profiled if it sends this value instead of "1"
+PROFILE_TOKEN = os.environ.get('AI_PROFILE_TOKEN', '')
+
+HEADER = 'X-Profile'
+QUERY_PARAM = 'profile'
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class RequestProfiler:
+    """Runs requests that ask for it under cProfile and keeps the last profiles on disk
+
+    A request is profiled when it sends the ``X-Profile`` header or the
+    ``profile`` query parameter, set to ``AI_PROFILE_TOKEN`` if one is
+    configured. Its profile is saved as ``<request_id>.prof`` (pstats
+    format) with a ``.json`` summary, and the response carries the id in
+    ``X-Profile-Id``. Only the newest ``max_profiles`` are kept. When
+    profiling is disabled no hooks are installed, so requests pay nothing.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, max_profiles: int = MAX_PROFILES,
+                 token: str = PROFILE_TOKEN, enabled: bool = ENABLED):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.token = token
+        self.enabled = enabled
+        self.excluded = set()
+
+    def init_app(self, app: Flask, exclude: Tuple[str, ...] = ()):
+        """Install the hooks on ``app``; ``exclude`` names endpoints that are never profiled"""
+        self.excluded = set(exclude)
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+
+    def authorized(self, value: Optional[str]) -> bool:
+        """Whether a header or query value may trigger or read profiles"""
+        if not self.enabled or not value:
+            return False
+        return value == self.token if self.token else value.lower() in ('1', 'true', 'yes')
+
+    def _start(self):
+        if request.endpoint in self.excluded:
+            return
+        if not self.authorized(request.headers.get(HEADER) or request.args.get(QUERY_PARAM)):
+            return
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this process
+            return
+        g.profile = (request_id, profiler, time.perf_counter())
+
+    def _finish(self, response: Response) -> Response:
+        capture = g.pop('profile', None)
+        if capture is None:
+            return response
+        request_id, profiler, started = capture
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        try:
+            self._save(request_id, profiler, {
+                'request_id': request_id,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'elapsed_seconds': elapsed,
+                'created': time.time()
+            })
+            response.headers['X-Profile-Id'] = request_id
+        except OSError as e:
+            print(f"Could not save profile {request_id}: {e}", file=sys.stderr)
+        return response
+
+    def _discard(self, exc: Optional[BaseException]):
+        capture = g.pop('profile', None)
+        if capture is not None:
+            capture[1].disable()
+
+    def _save(self, request_id: str, profiler: cProfile.Profile, meta: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, request_id)
+        profiler.dump_stats(path + '.prof.tmp')
+        os.replace(path + '.prof.tmp', path + '.prof')
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f)
+        self._prune()
+
+    def _prune(self):
+        profiles = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.prof')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(len(profiles) - self.max_profiles, 0)]:
+            for suffix in ('.prof', '.json'):
+                try:
+                    os.remove(entry.path[:-len('.prof')] + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def path(self, request_id: str) -> Optional[str]:
+        """The saved pstats file of a request, if it is still kept"""
+        if not _REQUEST_ID.match(request_id):
+            return None
+        path = os.path.join(self.directory, request_id + '.prof')
+        return path if os.path.exists(path) else None
+
+    def list_profiles(self) -> List[Dict]:
+        """Summaries of the kept profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda meta: meta['created'], reverse=True)
+
+    def report(self, request_id: str, sort: str = 'cumulative', limit: int = 30) -> Optional[Dict]:
+        """Summary of one profile plus its ``limit`` most expensive functions"""
+        path = self.path(request_id)
+        if path is None:
+            return None
+        try:
+            with open(path[:-len('.prof')] + '.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {'request_id': request_id}
+
+        stats = pstats.Stats(path)
+        order = {'cumulative': 3, 'tottime': 2, 'calls': 1}[sort]
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][order], reverse=True)[:limit]
+        meta['total_calls'] = stats.total_calls
+        meta['functions'] = [
+            {
+                'function': name,
+                'file': filename,
+                'line': line,
+                'calls': calls,
+                'primitive_calls': primitive,
+                'tottime': tottime,
+                'cumtime': cumtime
+            }
+            for (filename, line, name), (primitive, calls, tottime, cumtime, _) in rows
+        ]
+        return meta
+
+
+# Global request profiler
+request_profiler = RequestProfiler()
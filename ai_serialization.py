@@ -0,0 +1,144 @@
+"""
+API Response Serialization
+NumPy-aware JSON encoding, array trimming options and gzip for large responses
+"""
+
+import gzip
+import json
+import os
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead
+    orjson = None
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = int(os.environ.get('AI_API_COMPRESS_MIN_BYTES', 2048))
+# Level 1 compresses float-heavy JSON nearly as well as 5-6 in a third of the time
+COMPRESS_LEVEL = 1
+
+# Per-row arrays in evaluation results, trimmed together by ``shape_arrays``
+ARRAY_KEYS = ('predictions', 'actual')
+ARRAY_MODES = ('full', 'omit')
+
+
+def _default(obj):
+    """Encode NumPy values, then whatever Flask's own encoder supports"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return DefaultJSONProvider.default(obj)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """JSON provider that writes NumPy arrays and scalars without converting them first
+
+    With ``orjson`` installed, arrays are encoded natively by its C encoder;
+    otherwise they go through ``tolist`` and the stdlib encoder. Non-finite
+    floats become null either way, so responses are always valid JSON.
+    Dates keep Flask's own format.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self._encode(obj).decode()
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype=self.mimetype)
+
+    def _encode(self, obj) -> bytes:
+        if orjson is not None:
+            options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=options)
+        return json.dumps(_finite(obj), default=_default, sort_keys=self.sort_keys,
+                          ensure_ascii=self.ensure_ascii).encode()
+
+
+def _finite(obj):
+    """Copy of ``obj`` with NaN and infinities replaced by None, for the stdlib encoder"""
+    if isinstance(obj, (float, np.floating)) and not np.isfinite(obj):
+        return None
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == 'f' and not np.isfinite(obj).all():
+        return np.where(np.isfinite(obj), obj, None)
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def shape_arrays(result, args: Mapping) -> Dict:
+    """Trim the per-row arrays of an evaluation result (or a dict of them) as a request asks
+
+    ``arrays=omit`` drops them, ``offset``/``limit`` return one page of rows
+    and ``max_points`` keeps at most that many evenly spaced rows of the
+    page. A trimmed result gets a ``points`` entry with the total row count
+    and, if rows were skipped, the ``index`` of every row returned.
+    """
+    mode = args.get('arrays', 'full')
+    if mode not in ARRAY_MODES:
+        raise ValueError(f"arrays must be one of {', '.join(ARRAY_MODES)}")
+    offset = int(args.get('offset', 0))
+    limit = int(args['limit']) if args.get('limit') else None
+    max_points = int(args['max_points']) if args.get('max_points') else None
+    if offset < 0 or (limit is not None and limit < 1) or (max_points is not None and max_points < 2):
+        raise ValueError("offset must be >= 0, limit >= 1 and max_points >= 2")
+    if mode == 'full' and not offset and limit is None and max_points is None:
+        return result
+    return _shape(result, mode, offset, limit, max_points)
+
+
+def _shape(result, mode: str, offset: int, limit: Optional[int], max_points: Optional[int]):
+    if not isinstance(result, dict):
+        return result
+    if not any(key in result for key in ARRAY_KEYS):
+        return {key: _shape(value, mode, offset, limit, max_points) for key, value in result.items()}
+
+    shaped = dict(result)
+    total = len(result[next(key for key in ARRAY_KEYS if key in result)])
+    shaped['points'] = {'total': total}
+    if mode == 'omit':
+        for key in ARRAY_KEYS:
+            shaped.pop(key, None)
+        return shaped
+
+    stop = total if limit is None else min(offset + limit, total)
+    index = np.arange(min(offset, total), stop)
+    if max_points is not None and len(index) > max_points:
+        index = index[np.unique(np.linspace(0, len(index) - 1, max_points).round().astype(int))]
+    for key in ARRAY_KEYS:
+        if key in result:
+            shaped[key] = np.asarray(result[key])[index]
+    shaped['points'].update({'offset': offset, 'returned': len(index)})
+    if len(index) > 1 and index[-1] - index[0] + 1 != len(index):
+        shaped['points']['index'] = index
+    return shaped
+
+
+def configure_responses(app: Flask, compress: bool = os.environ.get('AI_API_COMPRESS', '1') != '0'):
+    """Install the NumPy JSON provider and, unless disabled, gzip for clients that accept it"""
+    app.json = NumpyJSONProvider(app)
+    if compress:
+        app.after_request(_compress)
+
+
+def _compress(response: Response) -> Response:
+    if (response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES or not response.mimetype.startswith(('application/json', 'text/')):
+        return response
+    response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
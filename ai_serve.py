@@ -0,0 +1,127 @@
+"""
+AI Trading Bot Production Server
+Serves ai_api with gunicorn: models are loaded once in the master process and
+shared copy-on-write with forked workers
+
+Example:
+    python ai_serve.py --workers 4 --threads 2 --models-dir models
+    kill -HUP <master pid>   # reload saved models and replace workers gracefully
+"""
+
+import argparse
+import gc
+import glob
+import os
+import sys
+from typing import Dict, List, Optional
+
+from gunicorn.app.base import BaseApplication
+
+DEFAULT_BIND = '0.0.0.0:5000'
+DEFAULT_MODELS_DIR = 'models'
+
+
+def load_saved_models(models_dir: str) -> List[str]:
+    """Load every ``<model_id>.joblib`` in ``models_dir`` into the shared model manager"""
+    from ai_models import model_manager
+
+    loaded = []
+    for path in sorted(glob.glob(os.path.join(models_dir, '*.joblib'))):
+        model_id = os.path.splitext(os.path.basename(path))[0]
+        if model_manager.load_model(model_id, path):
+            loaded.append(model_id)
+    return loaded
+
+
+def preload_models(models_dir: str) -> List[str]:
+    """Load models in the master and move them out of the garbage collector's reach
+
+    ``gc.freeze()`` puts every object allocated so far in a permanent
+    generation, so collections in the workers never write to (and thereby
+    copy) the pages holding the preloaded models.
+    """
+    loaded = load_saved_models(models_dir)
+    gc.collect()
+    gc.freeze()
+    return loaded
+
+
+def server_settings(args: argparse.Namespace) -> Dict:
+    """gunicorn settings for the parsed command line"""
+    models_dir = args.models_dir
+
+    def on_reload(arbiter):
+        # Runs in the master on SIGHUP, before the replacement workers are forked
+        gc.unfreeze()
+        loaded = preload_models(models_dir)
+        arbiter.log.info("Reloaded %d saved models from %s", len(loaded), models_dir)
+
+    def post_fork(server, worker):
+        server.log.info("Worker %s serving preloaded models", worker.pid)
+        if args.workers == 1:
+            # Only a single worker may drive the stored sessions, or their candles would be traded twice
+            from ai_trading_engine import trading_engine
+            server.log.info("Worker %s restored %d trading sessions", worker.pid, trading_engine.restore())
+
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        'preload_app': True,
+        'on_reload': on_reload,
+        'post_fork': post_fork,
+        'accesslog': '-' if args.access_log else None
+    }
+
+
+class AIServer(BaseApplication):
+    """gunicorn application that preloads ai_api and its models in the master"""
+
+    def __init__(self, settings: Dict, models_dir: str):
+        self.settings = settings
+        self.models_dir = models_dir
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.settings.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from ai_api import app
+
+        loaded = preload_models(self.models_dir)
+        print(f"Preloaded {len(loaded)} saved models from {self.models_dir}")
+        return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Run the AI API with multiple gunicorn workers")
+    parser.add_argument('--bind', default=env.get('AI_API_BIND', DEFAULT_BIND), help="Address to listen on")
+    parser.add_argument('--workers', type=int, default=int(env.get('AI_API_WORKERS', os.cpu_count() or 1)),
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument('--threads', type=int, default=int(env.get('AI_API_THREADS', 1)),
+                        help="Threads per worker; more than 1 uses the gthread worker")
+    parser.add_argument('--timeout', type=int, default=int(env.get('AI_API_TIMEOUT', 120)),
+                        help="Seconds before a busy worker is restarted, also the graceful reload timeout")
+    parser.add_argument('--max-requests', type=int, default=int(env.get('AI_API_MAX_REQUESTS', 0)),
+                        help="Recycle a worker after this many requests (0 disables)")
+    parser.add_argument('--models-dir', default=env.get('AI_MODELS_DIR', DEFAULT_MODELS_DIR),
+                        help="Directory of saved .joblib models to preload")
+    parser.add_argument('--access-log', action='store_true', help="Log every request to stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    os.makedirs(args.models_dir, exist_ok=True)
+    AIServer(server_settings(args), args.models_dir).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Trading Session Store
+Durable paper-trading sessions and trades in SQLite, written in batches by a
+background thread
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PATH = os.environ.get('AI_SESSION_DB', 'trading_sessions.db')
+
+# Longest a queued write waits before it is committed
+FLUSH_INTERVAL = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    initial_balance REAL NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    balance REAL NOT NULL,
+    direction INTEGER NOT NULL DEFAULT 0,
+    entry_price REAL NOT NULL DEFAULT 0,
+    units REAL NOT NULL DEFAULT 0,
+    entry_time INTEGER NOT NULL DEFAULT 0,
+    realized_pnl REAL NOT NULL DEFAULT 0,
+    closed_trades INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_stream ON sessions (symbol, timeframe, active);
+CREATE TABLE IF NOT EXISTS streams (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    last_time INTEGER,
+    last_price REAL,
+    PRIMARY KEY (symbol, timeframe)
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    direction INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    entry_time INTEGER NOT NULL,
+    exit_time INTEGER NOT NULL,
+    entry_price REAL NOT NULL,
+    exit_price REAL NOT NULL,
+    units REAL NOT NULL,
+    pnl REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_session_time ON trades (session_id, exit_time);
+"""
+
+STATE_COLUMNS = ('balance', 'direction', 'entry_price', 'units', 'entry_time',
+                 'realized_pnl', 'closed_trades', 'wins')
+TRADE_COLUMNS = ('session_id', 'direction', 'reason', 'entry_time', 'exit_time',
+                 'entry_price', 'exit_price', 'units', 'pnl')
+
+WRITES = {
+    'session': """INSERT INTO sessions (session_id, symbol, timeframe, settings, initial_balance,
+                  start_time, balance) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    'state': f"""UPDATE sessions SET {', '.join(f'{c} = ?' for c in STATE_COLUMNS)}
+                 WHERE session_id = ?""",
+    'stop': "UPDATE sessions SET active = 0, end_time = ? WHERE session_id = ?",
+    'trade': f"""INSERT INTO trades ({', '.join(TRADE_COLUMNS)})
+                 VALUES ({', '.join('?' * len(TRADE_COLUMNS))})""",
+    'stream': """INSERT INTO streams (symbol, timeframe, last_time, last_price) VALUES (?, ?, ?, ?)
+                 ON CONFLICT (symbol, timeframe) DO UPDATE SET
+                 last_time = excluded.last_time, last_price = excluded.last_price"""
+}
+
+
+class SessionStore:
+    """Sessions, their latest state and their closed trades in one SQLite file
+
+    The database runs in WAL mode, so readers never wait for the writer.
+    Writes are queued and a background thread commits everything queued so
+    far in one transaction (group commit), which keeps thousands of trade
+    rows per second cheap; ``flush`` waits until the queue is committed.
+    Each thread (and each forked process) opens its own connection on first
+    use.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # Writes
+
+    def _submit(self, kind: str, rows: List[Tuple]):
+        if not rows:
+            return
+        with self._lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._writer = threading.Thread(target=self._write_loop, name='session-store-writer', daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+            self._queue.put((kind, rows))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Let more writes pile up, then commit them all at once
+            time.sleep(self.flush_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            writes = [(kind, rows) for kind, rows in batch if kind != 'flush']
+            try:
+                with conn:
+                    for kind, rows in writes:
+                        conn.executemany(WRITES[kind], rows)
+            except sqlite3.Error:
+                # Commit what can be committed; a bad write must not take its batch down with it
+                for kind, rows in writes:
+                    try:
+                        with conn:
+                            conn.executemany(WRITES[kind], rows)
+                    except sqlite3.Error as e:
+                        print(f"Session store dropped {len(rows)} {kind} rows: {e}", file=sys.stderr)
+            for kind, rows in batch:
+                if kind == 'flush':
+                    rows[0].set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every write queued so far is committed"""
+        if self._writer is None or self._writer_pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', [done]))
+        return done.wait(timeout)
+
+    def add_session(self, session_id: str, symbol: str, timeframe: str, settings: Dict,
+                    initial_balance: float, start_time: str):
+        self._submit('session', [(session_id, symbol, timeframe, json.dumps(settings),
+                                  initial_balance, start_time, initial_balance)])
+
+    def update_states(self, rows: List[Tuple]):
+        """``STATE_COLUMNS`` values followed by the session id, per row"""
+        self._submit('state', rows)
+
+    def stop_session(self, session_id: str, end_time: str):
+        self._submit('stop', [(end_time, session_id)])
+
+    def add_trades(self, rows: List[Tuple]):
+        """``TRADE_COLUMNS`` values per row"""
+        self._submit('trade', rows)
+
+    def update_stream(self, symbol: str, timeframe: str, last_time: int, last_price: float):
+        self._submit('stream', [(symbol, timeframe, last_time, last_price)])
+
+    # Reads
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        """Stored session with the last price of its stream"""
+        row = self._connect().execute(
+            """SELECT s.*, st.last_time, st.last_price FROM sessions s
+               LEFT JOIN streams st ON st.symbol = s.symbol AND st.timeframe = s.timeframe
+               WHERE s.session_id = ?""", (session_id,)
+        ).fetchone()
+        return self._session(row) if row is not None else None
+
+    def load_sessions(self, active_only: bool = True) -> List[Dict]:
+        query = """SELECT s.*, st.last_time, st.last_price FROM sessions s
+                   LEFT JOIN streams st ON st.symbol = s.symbol AND st.timeframe = s.timeframe"""
+        if active_only:
+            query += " WHERE s.active = 1"
+        return [self._session(row) for row in self._connect().execute(query + " ORDER BY s.rowid")]
+
+    @staticmethod
+    def _session(row: sqlite3.Row) -> Dict:
+        session = dict(row)
+        session['settings'] = json.loads(session['settings'])
+        session['active'] = bool(session['active'])
+        return session
+
+    def trades(self, session_id: str, limit: int = 100, before: Optional[Tuple[int, int]] = None,
+               since: Optional[int] = None) -> Tuple[List[Dict], Optional[Tuple[int, int]]]:
+        """One page of a session's trades, newest first
+
+        Pages are keyed by ``(exit_time, id)`` of the last trade returned, so
+        each page is one index range scan however deep it is. Returns the
+        trades and the cursor of the next page (None on the last page).
+        """
+        query = "SELECT * FROM trades WHERE session_id = ?"
+        params: List = [session_id]
+        if before is not None:
+            query += " AND (exit_time, id) < (?, ?)"
+            params.extend(before)
+        if since is not None:
+            query += " AND exit_time >= ?"
+            params.append(since)
+        query += " ORDER BY exit_time DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = [dict(row) for row in self._connect().execute(query, params)]
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = (rows[-1]['exit_time'], rows[-1]['id'])
+        return rows, cursor
+
+
+# Global session store
+session_store = SessionStore()
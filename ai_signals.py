@@ -0,0 +1,55 @@
+"""
+AI Signal Strategy
+Turns walk-forward model forecasts into entry signals for the backtest engine
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from ai_models import AIModel
+
+
+class AISignalStrategy:
+    """Long/short entries from an AI model's out-of-sample price forecasts
+
+    Features are prepared once for the whole history and every window is
+    predicted in batches by copies of ``model`` refitted every
+    ``retrain_every`` candles on data that was already known (see
+    ``AIModel.predict_walk_forward``); ``model`` itself only supplies the
+    configuration and is never trained. The forecast made at the close of
+    candle t turns into an entry on candle t + 1, which the ``Backtester``
+    fills at that candle's open, so no signal sees a price it trades on.
+
+    The stance is long while the forecast for the first horizon is more than
+    ``threshold`` above the close, short while it is more than ``threshold``
+    below, and entries are flagged when the stance changes.
+    """
+
+    def __init__(self, model: AIModel, retrain_every: Optional[int] = 500, train_window: Optional[int] = None,
+                 min_train: int = 500, threshold: float = 0.002, max_workers: Optional[int] = None):
+        self.model = model
+        self.retrain_every = retrain_every
+        self.train_window = train_window
+        self.min_train = min_train
+        self.threshold = threshold
+        self.max_workers = max_workers
+
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Generate trading signals"""
+        df = data.copy()
+        forecasts = self.model.predict_walk_forward(
+            df, retrain_every=self.retrain_every, train_window=self.train_window,
+            min_train=self.min_train, max_workers=self.max_workers
+        )
+        df['prediction'] = forecasts[:, 0]
+
+        expected = df['prediction'] / df['close'] - 1
+        stance = np.where(expected > self.threshold, 1, np.where(expected < -self.threshold, -1, 0))
+        stance = pd.Series(stance, index=df.index)
+        previous = stance.shift(1, fill_value=0)
+
+        # Decided at the close, traded from the next candle
+        df['long_entry'] = ((stance == 1) & (previous != 1)).shift(1, fill_value=False)
+        df['short_entry'] = ((stance == -1) & (previous != -1)).shift(1, fill_value=False)
+        return df
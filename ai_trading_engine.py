@@ -0,0 +1,534 @@
+"""
+Paper Trading Engine
+Simulates many paper-trading sessions on closed candles, with the state of
+every session held in shared NumPy arrays
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ai_models import AIModelManager, model_manager
+from ai_session_store import TRADE_COLUMNS, SessionStore, session_store
+
+STRATEGIES = ('volty', 'model')
+
+DEFAULT_SETTINGS = {
+    'strategy': 'volty',
+    'atr_length': 5,
+    'atr_multiplier': 0.75,
+    'position_size': 0.1,
+    'take_profit': None,  # percent from entry, None to disable
+    'stop_loss': None,
+    'model_id': None,
+    'confidence_threshold': 0.0,
+    'auto_trade': True
+}
+
+# Slots to allocate up front; the arrays double in size when full
+INITIAL_SLOTS = 256
+
+# Candles given to a model per prediction beyond its lookback; enough for the
+# indicators (including the EWMs) to match a prediction on the full history
+MODEL_HISTORY = 500
+
+FLOAT_FIELDS = (
+    'initial_balance', 'capital', 'entry_price', 'units', 'position_size',
+    'take_profit', 'stop_loss', 'confidence_threshold', 'last_price', 'realized_pnl'
+)
+INT_FIELDS = ('direction', 'signal', 'stream', 'entry_time', 'closed_trades', 'wins')
+BOOL_FIELDS = ('active', 'auto_trade')
+
+# Closed trades of every session, one row each
+TRADE_DTYPE = np.dtype([
+    ('slot', np.int64), ('direction', np.int8), ('reason', np.int8),
+    ('entry_time', np.int64), ('exit_time', np.int64),
+    ('entry_price', np.float64), ('exit_price', np.float64), ('units', np.float64), ('pnl', np.float64)
+])
+EXIT_REASONS = ('Signal', 'Stop Loss', 'Take Profit')
+
+
+def volty_flags(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                length: int, atr_mult: float) -> Tuple[bool, bool]:
+    """Volty long and short entry on the last of the given candles
+
+    Same rule as ``VoltyStrategy.generate_signals`` in the backtester; needs
+    at least ``length + 3`` candles.
+    """
+    prev_close = close[:-1]
+    tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)))
+    # ATR of the two candles before the last one
+    atr = np.array([tr[-length - 2:-2].mean(), tr[-length - 1:-1].mean()]) * atr_mult
+    long_signal = close[-3:-1] + atr
+    short_signal = close[-3:-1] - atr
+    long_entry = high[-1] >= long_signal[1] and high[-2] < long_signal[0]
+    short_entry = low[-1] <= short_signal[1] and low[-2] > short_signal[0]
+    return bool(long_entry), bool(short_entry)
+
+
+class PaperTradingEngine:
+    """Paper-trading sessions driven by the candles of their (symbol, timeframe)
+
+    Each session owns one slot in a set of parallel arrays (balance, position
+    direction, entry price, units, risk settings, ...), so a closed candle
+    updates every session on that stream with a few vectorized operations
+    rather than a loop over session objects. Sessions sharing a signal source
+    (a Volty length and multiplier, or a model) share one signal code, and
+    each signal is computed once per candle. Closed trades go to one
+    columnar log.
+
+    On every closed candle, open positions first exit at their stop loss or
+    take profit if the candle's range reached it (the stop is assumed to be
+    hit first when both were). Sessions with ``auto_trade`` that did not
+    exit then act on the candle's signal at its close: an opposite signal
+    reverses the position, and a flat session opens one of
+    ``position_size`` times its balance. Without ``auto_trade`` signals are
+    ignored, as in the browser paper trader, and an open position only
+    exits at its stop loss or take profit.
+
+    With a ``store``, new sessions, the state of sessions that traded and
+    their closed trades are queued to it after every batch of candles, and
+    ``restore`` reloads the active sessions after a restart. The trade log
+    then only holds trades until they are handed over.
+    """
+
+    def __init__(self, manager: Optional[AIModelManager] = None, store: Optional[SessionStore] = None):
+        self.manager = manager
+        self.store = store
+        self.slots: Dict[str, int] = {}
+        self.session_ids: List[str] = []
+        self.info: List[Dict] = []
+        self.streams: Dict[Tuple[str, str], int] = {}
+        self.stream_times: List[Optional[int]] = []
+        self.signals: Dict[Tuple, int] = {}
+        self.signal_keys: List[Tuple] = []
+        self.trade_log = np.zeros(INITIAL_SLOTS, dtype=TRADE_DTYPE)
+        self.trade_count = 0
+        self._capacity = 0
+        self._lock = threading.RLock()
+        self._reserve(INITIAL_SLOTS)
+
+    def _reserve(self, slots: int):
+        """Grow every state array to at least ``slots`` sessions"""
+        if slots <= self._capacity:
+            return
+        capacity = max(slots, 2 * self._capacity)
+        for fields, dtype in ((FLOAT_FIELDS, np.float64), (INT_FIELDS, np.int64), (BOOL_FIELDS, bool)):
+            for name in fields:
+                grown = np.zeros(capacity, dtype=dtype)
+                grown[:self._capacity] = getattr(self, name)[:self._capacity] if self._capacity else 0
+                setattr(self, name, grown)
+        self._capacity = capacity
+
+    @property
+    def count(self) -> int:
+        return len(self.session_ids)
+
+    def start_session(self, session_id: str, symbol: str, timeframe: str,
+                      initial_balance: float = 10000, settings: Optional[Dict] = None,
+                      last_time: Optional[pd.Timestamp] = None) -> Dict:
+        """Add a session trading ``symbol``/``timeframe`` from the next closed candle on"""
+        settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        if settings['strategy'] not in STRATEGIES:
+            return {"success": False, "error": f"Unknown strategy: {settings['strategy']}"}
+        if settings['strategy'] == 'model' and not settings['model_id']:
+            return {"success": False, "error": "A model_id is required for the model strategy"}
+        if int(settings['atr_length']) < 1 or not 0 < float(settings['position_size']) <= 1:
+            return {"success": False, "error": "Invalid ATR length or position size"}
+
+        with self._lock:
+            if session_id in self.slots or (self.store is not None and self.store.get_session(session_id)):
+                return {"success": False, "error": "Session already exists"}
+            start_time = datetime.now().isoformat()
+            slot = self._add_slot(session_id, symbol.upper(), timeframe, initial_balance, settings,
+                                  start_time, None if last_time is None else pd.Timestamp(last_time).value)
+            if self.store is not None:
+                self.store.add_session(session_id, symbol.upper(), timeframe, settings, initial_balance, start_time)
+            return {"success": True, "session_id": session_id, "slot": slot}
+
+    def _add_slot(self, session_id: str, symbol: str, timeframe: str, initial_balance: float,
+                  settings: Dict, start_time: str, last_time: Optional[int]) -> int:
+        key = (symbol, timeframe)
+        if key not in self.streams:
+            self.streams[key] = len(self.stream_times)
+            self.stream_times.append(last_time)
+        if settings['strategy'] == 'model':
+            signal_key = ('model', settings['model_id'])
+        else:
+            signal_key = ('volty', int(settings['atr_length']), float(settings['atr_multiplier']))
+        if signal_key not in self.signals:
+            self.signals[signal_key] = len(self.signal_keys)
+            self.signal_keys.append(signal_key)
+
+        slot = self.count
+        self._reserve(slot + 1)
+        values = {
+            'initial_balance': initial_balance,
+            'capital': initial_balance,
+            'position_size': settings['position_size'],
+            'take_profit': np.nan if settings['take_profit'] is None else settings['take_profit'],
+            'stop_loss': np.nan if settings['stop_loss'] is None else settings['stop_loss'],
+            'confidence_threshold': settings['confidence_threshold'],
+            'last_price': np.nan,
+            'signal': self.signals[signal_key],
+            'stream': self.streams[key],
+            'active': True,
+            'auto_trade': settings['auto_trade']
+        }
+        for name in FLOAT_FIELDS + INT_FIELDS + BOOL_FIELDS:
+            getattr(self, name)[slot] = values.get(name, 0)
+
+        self.slots[session_id] = slot
+        self.session_ids.append(session_id)
+        self.info.append({
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'settings': settings,
+            'start_time': start_time,
+            'end_time': None
+        })
+        return slot
+
+    def restore(self) -> int:
+        """Reload the store's active sessions, positions included; returns how many"""
+        if self.store is None:
+            return 0
+        restored = 0
+        with self._lock:
+            for row in self.store.load_sessions():
+                if row['session_id'] in self.slots:
+                    continue
+                slot = self._add_slot(row['session_id'], row['symbol'], row['timeframe'], row['initial_balance'],
+                                      {**DEFAULT_SETTINGS, **row['settings']}, row['start_time'], row['last_time'])
+                self.capital[slot] = row['balance']
+                for name in ('direction', 'entry_price', 'units', 'entry_time', 'realized_pnl', 'closed_trades', 'wins'):
+                    getattr(self, name)[slot] = row[name]
+                if row['last_price'] is not None:
+                    self.last_price[slot] = row['last_price']
+                restored += 1
+        return restored
+
+    def stop_session(self, session_id: str) -> bool:
+        """Stop trading; an open position keeps its last mark"""
+        with self._lock:
+            slot = self.slots.get(session_id)
+            if slot is None:
+                return False
+            self.active[slot] = False
+            self.info[slot]['end_time'] = datetime.now().isoformat()
+            if self.store is not None:
+                self.store.stop_session(session_id, self.info[slot]['end_time'])
+            return True
+
+    def has_sessions(self, symbol: str, timeframe: str) -> bool:
+        return (symbol.upper(), timeframe) in self.streams
+
+    def process(self, symbol: str, timeframe: str, frame: pd.DataFrame, closed: bool = False) -> int:
+        """Run the sessions on ``symbol``/``timeframe`` over the new closed candles of ``frame``
+
+        ``frame`` is the candle history (e.g. a candle buffer); its last
+        candle counts as closed only when ``closed`` is set. Returns the
+        number of candles processed. The first call for a stream only marks
+        where it starts, so uploading history never trades through it.
+        """
+        with self._lock:
+            stream = self.streams.get((symbol.upper(), timeframe))
+            if stream is None or len(frame) == 0:
+                return 0
+
+            times = pd.to_datetime(frame['datetime']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            end = len(frame) if closed else len(frame) - 1
+            if end <= 0:
+                return 0
+            if self.stream_times[stream] is None:
+                self.stream_times[stream] = int(times[end - 1])
+                return 0
+
+            start = int(np.searchsorted(times[:end], self.stream_times[stream], side='right'))
+            if start >= end:
+                return 0
+            candles = {f: frame[f].to_numpy(dtype=np.float64) for f in ('open', 'high', 'low', 'close')}
+            logged = self.trade_count
+            for i in range(start, end):
+                self._step(stream, frame, candles, times, i)
+            self.stream_times[stream] = int(times[end - 1])
+            if self.store is not None:
+                self._persist(stream, logged, int(times[start]), candles['close'][end - 1])
+            return end - start
+
+    def _persist(self, stream: int, logged: int, since: int, last_price: float):
+        """Queue the trades logged since ``logged`` and the state of every session that traded"""
+        trades = self.trade_log[logged:self.trade_count]
+        opened = (self.stream[:self.count] == stream) & (self.direction[:self.count] != 0) \
+            & (self.entry_time[:self.count] >= since)
+        changed = np.union1d(trades['slot'], np.flatnonzero(opened))
+
+        columns = [self.capital, self.direction, self.entry_price, self.units, self.entry_time,
+                   self.realized_pnl, self.closed_trades, self.wins]
+        states = list(zip(*(column[changed].tolist() for column in columns), (self.session_ids[k] for k in changed)))
+        self.store.update_states(states)
+        self.store.add_trades(list(zip(
+            (self.session_ids[k] for k in trades['slot'].tolist()),
+            trades['direction'].tolist(),
+            (EXIT_REASONS[r] for r in trades['reason'].tolist()),
+            *(trades[f].tolist() for f in ('entry_time', 'exit_time', 'entry_price', 'exit_price', 'units', 'pnl'))
+        )))
+        symbol, timeframe = next(key for key, index in self.streams.items() if index == stream)
+        self.store.update_stream(symbol, timeframe, self.stream_times[stream], float(last_price))
+        self.trade_count = logged
+
+    def _step(self, stream: int, frame: pd.DataFrame, candles: Dict[str, np.ndarray],
+              times: np.ndarray, i: int):
+        """Advance every active session of one stream by closed candle ``i``"""
+        slots = np.flatnonzero(self.active[:self.count] & (self.stream[:self.count] == stream))
+        if len(slots) == 0:
+            return
+        open_, high, low, close = (candles[f][i] for f in ('open', 'high', 'low', 'close'))
+
+        # Stop loss and take profit, hit within the candle's range
+        direction = self.direction[slots]
+        entry = self.entry_price[slots]
+        with np.errstate(invalid='ignore'):
+            stop = entry * (1 - direction * self.stop_loss[slots] / 100)
+            target = entry * (1 + direction * self.take_profit[slots] / 100)
+            stopped = np.where(direction == 1, low <= stop, high >= stop) & (direction != 0)
+            taken = np.where(direction == 1, high >= target, low <= target) & (direction != 0) & ~stopped
+        # A candle opening beyond the level fills at its open
+        stop_fill = np.where(direction == 1, np.minimum(open_, stop), np.maximum(open_, stop))
+        target_fill = np.where(direction == 1, np.maximum(open_, target), np.minimum(open_, target))
+        self._close(slots[stopped], stop_fill[stopped], times[i], 'Stop Loss')
+        self._close(slots[taken], target_fill[taken], times[i], 'Take Profit')
+
+        # Signals, once per signal code; sessions without auto_trade only exit at their stop or target
+        trading = slots[~(stopped | taken)]
+        trading = trading[self.auto_trade[trading]]
+        codes = self.signal[trading]
+        long_entry = np.zeros(len(trading), dtype=bool)
+        short_entry = np.zeros(len(trading), dtype=bool)
+        for code in np.unique(codes):
+            members = codes == code
+            key = self.signal_keys[code]
+            if key[0] == 'volty':
+                flags = self._volty_signal(candles, i, *key[1:])
+            else:
+                flags = self._model_signal(frame, i, key[1], self.confidence_threshold[trading[members]])
+            long_entry[members], short_entry[members] = flags
+        short_entry &= ~long_entry
+
+        # Stop and reverse at the close
+        direction = self.direction[trading]
+        reverse = ((direction == 1) & short_entry) | ((direction == -1) & long_entry)
+        self._close(trading[reverse], np.full(reverse.sum(), close), times[i], 'Signal')
+
+        opening = (self.direction[trading] == 0) & (long_entry | short_entry)
+        opened = trading[opening]
+        self.direction[opened] = np.where(long_entry[opening], 1, -1)
+        self.entry_price[opened] = close
+        self.units[opened] = self.capital[opened] * self.position_size[opened] / close
+        self.entry_time[opened] = times[i]
+
+        self.last_price[slots] = close
+
+    @staticmethod
+    def _volty_signal(candles: Dict[str, np.ndarray], i: int, length: int, atr_mult: float) -> Tuple[bool, bool]:
+        if i < length + 2:
+            return False, False
+        window = slice(i - length - 2, i + 1)
+        return volty_flags(candles['high'][window], candles['low'][window], candles['close'][window],
+                           length, atr_mult)
+
+    def _model_signal(self, frame: pd.DataFrame, i: int, model_id: str,
+                      thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The model's signal on candle ``i`` for sessions whose confidence threshold it meets"""
+        model = self.manager.get_model(model_id) if self.manager is not None else None
+        if model is None or not model.is_trained:
+            return False, False
+        history = frame.iloc[max(i + 1 - model.lookback_period - MODEL_HISTORY, 0):i + 1]
+        prediction = model.predict(history)
+        if 'error' in prediction:
+            return False, False
+        confident = prediction['confidence'] >= thresholds
+        buy = prediction['signal'] == 'BUY'
+        return confident & buy, confident & (not buy)
+
+    def _close(self, slots: np.ndarray, prices: np.ndarray, time: int, reason: str):
+        """Realize the PnL of open positions and log the trades"""
+        if len(slots) == 0:
+            return
+        direction = self.direction[slots]
+        entry = self.entry_price[slots]
+        units = self.units[slots]
+        pnl = direction * (prices - entry) * units
+        self.capital[slots] += pnl
+        self.realized_pnl[slots] += pnl
+        self.closed_trades[slots] += 1
+        self.wins[slots] += pnl > 0
+
+        start, end = self.trade_count, self.trade_count + len(slots)
+        if end > len(self.trade_log):
+            grown = np.zeros(max(end, 2 * len(self.trade_log)), dtype=TRADE_DTYPE)
+            grown[:start] = self.trade_log[:start]
+            self.trade_log = grown
+        rows = self.trade_log[start:end]
+        rows['slot'] = slots
+        rows['direction'] = direction
+        rows['reason'] = EXIT_REASONS.index(reason)
+        rows['entry_time'] = self.entry_time[slots]
+        rows['exit_time'] = time
+        rows['entry_price'] = entry
+        rows['exit_price'] = prices
+        rows['units'] = units
+        rows['pnl'] = pnl
+        self.trade_count = end
+
+        self.direction[slots] = 0
+        self.entry_price[slots] = 0.0
+        self.units[slots] = 0.0
+
+    @staticmethod
+    def _trade(direction: int, reason: str, entry_time: int, exit_time: int, entry_price: float,
+               exit_price: float, units: float, pnl: float) -> Dict:
+        return {
+            'type': 'LONG' if direction == 1 else 'SHORT',
+            'entry_time': pd.Timestamp(entry_time).isoformat(),
+            'exit_time': pd.Timestamp(exit_time).isoformat(),
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'size': units,
+            'pnl': pnl,
+            'pnl_pct': direction * (exit_price - entry_price) / entry_price,
+            'reason': reason
+        }
+
+    def session_trades(self, session_id: str, limit: int = 100,
+                       before: Optional[Tuple[int, int]] = None) -> Optional[Tuple[List[Dict], Optional[Tuple[int, int]]]]:
+        """One page of a session's closed trades, newest first, and the cursor of the next page
+
+        Returns None if there is no such session.
+        """
+        if self.store is not None:
+            with self._lock:
+                known = session_id in self.slots
+            if not known and self.store.get_session(session_id) is None:
+                return None
+            rows, cursor = self.store.trades(session_id, limit, before)
+            return [self._trade(*(row[c] for c in TRADE_COLUMNS[1:])) for row in rows], cursor
+
+        with self._lock:
+            slot = self.slots.get(session_id)
+            if slot is None:
+                return None
+            log = self.trade_log[:self.trade_count]
+            ids = np.flatnonzero(log['slot'] == slot)
+        # The log is in exit order, so its index doubles as the trade id
+        if before is not None:
+            ids = ids[ids < before[1]]
+        page = ids[::-1][:limit]
+        cursor = None
+        if len(ids) > limit:
+            cursor = (int(log['exit_time'][page[-1]]), int(page[-1]))
+        trades = [
+            self._trade(int(row['direction']), EXIT_REASONS[row['reason']], int(row['entry_time']),
+                        int(row['exit_time']), float(row['entry_price']), float(row['exit_price']),
+                        float(row['units']), float(row['pnl']))
+            for row in log[page]
+        ]
+        return trades, cursor
+
+    def session_status(self, session_id: str) -> Optional[Dict]:
+        """Balance, open position and live PnL marked at the last closed candle
+
+        Sessions run by another process (or before a restart) are read from
+        the store, as of its last committed batch.
+        """
+        with self._lock:
+            slot = self.slots.get(session_id)
+            if slot is not None:
+                stream_time = self.stream_times[int(self.stream[slot])]
+                last_price = float(self.last_price[slot])
+                row = {
+                    **self.info[slot],
+                    'active': bool(self.active[slot]),
+                    'initial_balance': float(self.initial_balance[slot]),
+                    'balance': float(self.capital[slot]),
+                    'direction': int(self.direction[slot]),
+                    'entry_price': float(self.entry_price[slot]),
+                    'units': float(self.units[slot]),
+                    'entry_time': int(self.entry_time[slot]),
+                    'realized_pnl': float(self.realized_pnl[slot]),
+                    'closed_trades': int(self.closed_trades[slot]),
+                    'wins': int(self.wins[slot]),
+                    'last_time': stream_time,
+                    'last_price': None if np.isnan(last_price) else last_price
+                }
+        if slot is None:
+            row = self.store.get_session(session_id) if self.store is not None else None
+            if row is None:
+                return None
+
+        direction = row['direction']
+        last_price = row['last_price']
+        unrealized = 0.0
+        position = None
+        if direction:
+            entry = row['entry_price']
+            unrealized = direction * (last_price - entry) * row['units'] if last_price is not None else 0.0
+            position = {
+                'type': 'LONG' if direction == 1 else 'SHORT',
+                'entry_price': entry,
+                'entry_time': pd.Timestamp(row['entry_time']).isoformat(),
+                'size': row['units'],
+                'unrealized_pnl': unrealized
+            }
+            for name, side in (('take_profit', 1), ('stop_loss', -1)):
+                pct = row['settings'].get(name)
+                position[f'{name}_price'] = None if pct is None else entry * (1 + side * direction * pct / 100)
+
+        initial = row['initial_balance']
+        equity = row['balance'] + unrealized
+        trades = row['closed_trades']
+        return {
+            'session_id': session_id,
+            'symbol': row['symbol'],
+            'timeframe': row['timeframe'],
+            'settings': row['settings'],
+            'start_time': row['start_time'],
+            'end_time': row['end_time'],
+            'active': row['active'],
+            'initial_balance': initial,
+            'balance': row['balance'],
+            'equity': equity,
+            'realized_pnl': row['realized_pnl'],
+            'unrealized_pnl': unrealized,
+            'total_pnl': equity - initial,
+            'return_pct': (equity - initial) / initial * 100,
+            'position': position,
+            'last_price': last_price,
+            'last_candle': None if row['last_time'] is None else pd.Timestamp(row['last_time']).isoformat(),
+            'total_trades': trades,
+            'win_rate': row['wins'] / trades if trades else 0.0
+        }
+
+    def list_sessions(self) -> List[Dict]:
+        with self._lock:
+            n = self.count
+            equity = self.capital[:n] + self.direction[:n] * (self.last_price[:n] - self.entry_price[:n]) * self.units[:n]
+            equity = np.where(self.direction[:n] != 0, equity, self.capital[:n])
+            return [
+                {
+                    'session_id': session_id,
+                    'symbol': self.info[slot]['symbol'],
+                    'timeframe': self.info[slot]['timeframe'],
+                    'strategy': self.info[slot]['settings']['strategy'],
+                    'active': bool(self.active[slot]),
+                    'equity': float(equity[slot]),
+                    'total_trades': int(self.closed_trades[slot])
+                }
+                for slot, session_id in enumerate(self.session_ids)
+            ]
+
+
+# Global paper trading engine, persisting to the global session store
+trading_engine = PaperTradingEngine(model_manager, session_store)
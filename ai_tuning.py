@@ -0,0 +1,300 @@
+"""
+Hyperparameter Search for AI Models
+Time-ordered cross-validated search over estimator settings and lookback lengths
+"""
+
+import itertools
+import multiprocessing
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ai_models import AIModelManager, GradientBoostingModel, RandomForestModel
+
+MODEL_TYPES = {
+    'random_forest': RandomForestModel,
+    'gradient_boosting': GradientBoostingModel
+}
+
+# Default grids; ``n_estimators`` is a model argument, the rest go to the estimator
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 8, 16],
+        'min_samples_leaf': [1, 5]
+    },
+    'gradient_boosting': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [2, 3, 5],
+        'learning_rate': [0.05, 0.1]
+    }
+}
+
+DEFAULT_LOOKBACKS = (20, 50, 100)
+SCORING = ('rmse', 'r2')
+
+# Candidates sampled from the grid unless a search asks for another budget (None: the whole grid)
+DEFAULT_MAX_CANDIDATES = 12
+
+# Finished jobs kept for their results
+MAX_FINISHED_JOBS = 20
+
+
+def candidate_grid(model_type: str, params: Optional[Dict[str, Sequence]] = None,
+                   lookbacks: Sequence[int] = DEFAULT_LOOKBACKS,
+                   max_candidates: Optional[int] = None, seed: int = 0) -> List[Dict]:
+    """Model configurations to try, as ``create_model`` keyword arguments
+
+    The full grid of ``params`` x ``lookbacks``, or a random sample of
+    ``max_candidates`` of it.
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Unknown model type: {model_type}")
+    params = SEARCH_SPACES[model_type] if params is None else params
+    names = sorted(params)
+
+    candidates = []
+    for lookback in lookbacks:
+        for values in itertools.product(*(params[name] for name in names)):
+            settings = dict(zip(names, values))
+            candidate = {'lookback_period': int(lookback), 'model_params': settings}
+            if 'n_estimators' in settings:
+                candidate['n_estimators'] = int(settings.pop('n_estimators'))
+            candidates.append(candidate)
+
+    if max_candidates is not None and max_candidates < len(candidates):
+        rng = np.random.default_rng(seed)
+        picked = sorted(rng.choice(len(candidates), size=max_candidates, replace=False))
+        candidates = [candidates[i] for i in picked]
+    return candidates
+
+
+_shared: Dict = {}
+
+
+def _init_worker(features: np.ndarray, prices: np.ndarray, settings: Dict):
+    _shared.clear()
+    _shared['features'] = features
+    _shared['prices'] = prices
+    _shared['settings'] = settings
+    _shared['sequences'] = {}
+
+
+def _build(candidate: Dict):
+    settings = _shared['settings']
+    return MODEL_TYPES[settings['model_type']](
+        'tuning', settings['timeframe'], horizons=settings['horizons'], **candidate
+    )
+
+
+def _sequences(model) -> Tuple[np.ndarray, np.ndarray]:
+    """Sequences for one lookback length, memoized per process
+
+    Every lookback is cut to the same target rows, so all candidates are
+    validated on the same prices.
+    """
+    lookback = model.lookback_period
+    if lookback not in _shared['sequences']:
+        X, y = model.create_sequences(_shared['features'], _shared['prices'])
+        rows = _shared['settings']['rows']
+        _shared['sequences'][lookback] = (X[-rows:], y[-rows:])
+    return _shared['sequences'][lookback]
+
+
+def _score_fold(task: Tuple[int, Dict, np.ndarray, np.ndarray]) -> Dict:
+    """Fit one candidate on one fold's train rows and score its validation rows"""
+    index, candidate, train_idx, val_idx = task
+    model = _build(candidate)
+    X, y = _sequences(model)
+
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    estimator = clone(model.model)
+    estimator.fit(scaler.fit_transform(X[train_idx]), y[train_idx])
+    predictions = estimator.predict(scaler.transform(X[val_idx]))
+    return {
+        'index': index,
+        'rmse': float(np.sqrt(mean_squared_error(y[val_idx], predictions))),
+        'r2': float(r2_score(y[val_idx], predictions)),
+        'fit_seconds': time.perf_counter() - started
+    }
+
+
+def search(data: pd.DataFrame, model_type: str = 'random_forest', timeframe: str = '1h',
+           params: Optional[Dict[str, Sequence]] = None, lookbacks: Sequence[int] = DEFAULT_LOOKBACKS,
+           n_splits: int = 5, horizons: Optional[List[int]] = None, scoring: str = 'rmse',
+           max_candidates: Optional[int] = DEFAULT_MAX_CANDIDATES, features: Optional[np.ndarray] = None,
+           max_workers: Optional[int] = None) -> Dict:
+    """Cross-validate candidates with expanding time-ordered splits
+
+    At most ``max_candidates`` configurations of the grid are tried, sampled
+    at random; pass None to try the whole grid. Features are prepared once
+    (or taken from ``features``) and shared with the worker processes, which
+    build each lookback's sequences once and fit (candidate, fold) pairs in
+    parallel. Returns the leaderboard, best first.
+    """
+    if scoring not in SCORING:
+        return {"success": False, "error": f"Unknown scoring: {scoring}"}
+    try:
+        candidates = candidate_grid(model_type, params, lookbacks, max_candidates)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    started = time.perf_counter()
+    probe = MODEL_TYPES[model_type]('tuning', timeframe, max(lookbacks), horizons=horizons)
+    if features is None:
+        features = probe.prepare_features(data)
+    prices = data['close'].to_numpy(dtype=np.float64)[-len(features):]
+
+    rows = len(features) - probe.lookback_period - probe.horizons[-1] + 1
+    if rows < 10 * (n_splits + 1):
+        return {"success": False, "error": "Insufficient data for the longest lookback and splits"}
+
+    settings = {
+        'model_type': model_type,
+        'timeframe': timeframe,
+        'horizons': probe.horizons,
+        'rows': rows
+    }
+    # A gap of the longest horizon keeps training targets out of the validation rows
+    splitter = TimeSeriesSplit(n_splits=n_splits, gap=probe.horizons[-1])
+    splits = list(splitter.split(np.arange(rows)))
+    tasks = [
+        (index, candidate, train_idx, val_idx)
+        for index, candidate in enumerate(candidates)
+        for train_idx, val_idx in splits
+    ]
+
+    if max_workers == 1:
+        _init_worker(features, prices, settings)
+        folds = [_score_fold(task) for task in tasks]
+    else:
+        # Spawned, not forked: the API server that calls this runs other threads
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(np.asarray(features), prices, settings)) as executor:
+            folds = list(executor.map(_score_fold, tasks))
+
+    leaderboard = []
+    for index, candidate in enumerate(candidates):
+        scores = [f for f in folds if f['index'] == index]
+        leaderboard.append({
+            'config': candidate,
+            'rmse': float(np.mean([f['rmse'] for f in scores])),
+            'r2': float(np.mean([f['r2'] for f in scores])),
+            'fold_rmse': [f['rmse'] for f in scores],
+            'fit_seconds': float(sum(f['fit_seconds'] for f in scores))
+        })
+    leaderboard.sort(key=lambda entry: entry['rmse'] if scoring == 'rmse' else -entry['r2'])
+    for rank, entry in enumerate(leaderboard, 1):
+        entry['rank'] = rank
+
+    return {
+        "success": True,
+        "model_type": model_type,
+        "scoring": scoring,
+        "n_splits": n_splits,
+        "validation_rows": rows,
+        "candidates": len(candidates),
+        "elapsed_seconds": time.perf_counter() - started,
+        "best": leaderboard[0],
+        "leaderboard": leaderboard
+    }
+
+
+def tune_model(manager: AIModelManager, data: pd.DataFrame, model_type: str, name: str,
+               timeframe: str, register: bool = True, features: Optional[np.ndarray] = None,
+               **search_options) -> Dict:
+    """Search ``model_type`` and optionally register the winner, trained on all of ``data``"""
+    if features is None and model_type in MODEL_TYPES:
+        features = MODEL_TYPES[model_type](name, timeframe).prepare_features(data)
+    result = search(data, model_type, timeframe, features=features, **search_options)
+    if not result.get("success") or not register:
+        return result
+
+    config = dict(result["best"]["config"])
+    if search_options.get("horizons"):
+        config["horizons"] = search_options["horizons"]
+    manager.create_model(model_type, name, timeframe, **config)
+    model_id = f"{name}_{timeframe}_{model_type}"
+    result["model_id"] = model_id
+    result["training"] = manager.train_model(model_id, data, features)
+    return result
+
+
+class TuningJobs:
+    """Searches run one at a time on a background thread, with their status kept by job id
+
+    A search can take minutes, far longer than an HTTP request should. Only
+    the newest ``MAX_FINISHED_JOBS`` finished jobs are kept.
+    """
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Dict] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tuning')
+        self._lock = threading.Lock()
+
+    def submit(self, manager: AIModelManager, data: pd.DataFrame, model_type: str, name: str,
+               timeframe: str, **options) -> Dict:
+        """Queue a ``tune_model`` run, returning its job entry"""
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'model_type': model_type,
+            'name': name,
+            'timeframe': timeframe,
+            'submitted': time.time()
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            queued = dict(job)
+        self._executor.submit(self._run, job_id, manager, data, model_type, name, timeframe, options)
+        return queued
+
+    def _run(self, job_id: str, manager: AIModelManager, data: pd.DataFrame, model_type: str,
+             name: str, timeframe: str, options: Dict):
+        self._update(job_id, status='running', started=time.time())
+        try:
+            result = tune_model(manager, data, model_type, name, timeframe, **options)
+            status = 'completed' if result.get('success') else 'failed'
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+            status = 'failed'
+        self._update(job_id, status=status, finished=time.time(), result=result)
+        self._prune()
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _prune(self):
+        with self._lock:
+            finished = sorted((job for job in self.jobs.values() if 'finished' in job),
+                              key=lambda job: job['finished'])
+            for job in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self.jobs[job['job_id']]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Jobs without their results, newest first"""
+        with self._lock:
+            jobs = [{k: v for k, v in job.items() if k != 'result'} for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['submitted'], reverse=True)
+
+
+# Global tuning job queue
+tuning_jobs = TuningJobs()
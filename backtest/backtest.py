@@ -3,24 +3,17 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import plotly.express as px
-import requests
-import datetime
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Optional, Tuple
 import warnings
+from data import CandleCache, fetch_klines, get_default_fetcher
+from downsample import DEFAULT_MAX_POINTS, aggregate_ohlc, downsample_line, slice_range
+from engine import Trade, BacktestResults, VoltyStrategy, Backtester
+from metrics import timeframe_to_seconds
+from monte_carlo import MonteCarloResults, run_monte_carlo, trade_returns
 warnings.filterwarnings('ignore')
 
-# Page configuration
-st.set_page_config(
-    page_title="Volty Strategy Backtester",
-    page_icon="📈",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
 # Custom CSS for grayscale styling
-st.markdown("""
+PAGE_CSS = """
 <style>
     .main {
         background: linear-gradient(135deg, #1a1a1a 0%, #2a2a2a 50%, #303030 100%);
@@ -66,247 +59,78 @@ st.markdown("""
         background-color: rgba(255, 255, 255, 0.1);
     }
 </style>
-""", unsafe_allow_html=True)
-
-@dataclass
-class Trade:
-    entry_time: datetime.datetime
-    exit_time: datetime.datetime
-    type: str  # 'LONG' or 'SHORT'
-    entry_price: float
-    exit_price: float
-    size: float
-    pnl: float
-    pnl_pct: float
-
-@dataclass
-class BacktestResults:
-    trades: List[Trade]
-    total_return: float
-    win_rate: float
-    profit_factor: float
-    max_drawdown: float
-    sharpe_ratio: float
-    total_trades: int
-    avg_trade: float
-    max_win: float
-    max_loss: float
-
-class VoltyStrategy:
-    def __init__(self, length: int = 5, atr_mult: float = 0.75):
-        self.length = length
-        self.atr_mult = atr_mult
-        
-    def calculate_atr(self, data: pd.DataFrame) -> pd.Series:
-        """Calculate Average True Range"""
-        high = data['high']
-        low = data['low']
-        close = data['close']
-        
-        tr1 = high - low
-        tr2 = np.abs(high - close.shift(1))
-        tr3 = np.abs(low - close.shift(1))
-        
-        tr = np.maximum(tr1, np.maximum(tr2, tr3))
-        atr = tr.rolling(window=self.length).mean()
-        
-        return atr
-    
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Generate trading signals"""
-        df = data.copy()
-        
-        # Calculate ATR
-        df['atr'] = self.calculate_atr(df)
-        df['atrs'] = df['atr'] * self.atr_mult
-        
-        # Calculate signal levels
-        df['long_signal'] = df['close'] + df['atrs']
-        df['short_signal'] = df['close'] - df['atrs']
-        
-        # Generate entry signals
-        df['long_entry'] = (df['high'] >= df['long_signal'].shift(1)) & (df['high'].shift(1) < df['long_signal'].shift(2))
-        df['short_entry'] = (df['low'] <= df['short_signal'].shift(1)) & (df['low'].shift(1) > df['short_signal'].shift(2))
-        
-        return df
+"""
 
-class Backtester:
-    def __init__(self, initial_capital: float = 10000, position_size: float = 0.1):
-        self.initial_capital = initial_capital
-        self.position_size = position_size
-        
-    def run_backtest(self, data: pd.DataFrame, strategy: VoltyStrategy) -> BacktestResults:
-        """Run the backtest"""
-        df = strategy.generate_signals(data)
-        
-        trades = []
-        position = None
-        equity_curve = [self.initial_capital]
-        current_capital = self.initial_capital
-        
-        for i in range(1, len(df)):
-            current_row = df.iloc[i]
-            
-            # Close existing position on opposite signal
-            if position is not None:
-                exit_condition = False
-                
-                if position['type'] == 'LONG' and current_row['short_entry']:
-                    exit_condition = True
-                elif position['type'] == 'SHORT' and current_row['long_entry']:
-                    exit_condition = True
-                
-                if exit_condition:
-                    # Close position
-                    exit_price = current_row['open']  # Assume exit at next candle open
-                    
-                    if position['type'] == 'LONG':
-                        pnl = (exit_price - position['entry_price']) * position['size']
-                        pnl_pct = (exit_price - position['entry_price']) / position['entry_price']
-                    else:  # SHORT
-                        pnl = (position['entry_price'] - exit_price) * position['size']
-                        pnl_pct = (position['entry_price'] - exit_price) / position['entry_price']
-                    
-                    current_capital += pnl
-                    
-                    trade = Trade(
-                        entry_time=position['entry_time'],
-                        exit_time=current_row['datetime'],
-                        type=position['type'],
-                        entry_price=position['entry_price'],
-                        exit_price=exit_price,
-                        size=position['size'],
-                        pnl=pnl,
-                        pnl_pct=pnl_pct
-                    )
-                    trades.append(trade)
-                    position = None
-            
-            # Open new position
-            if position is None:
-                entry_price = None
-                trade_type = None
-                
-                if current_row['long_entry']:
-                    entry_price = current_row['open']  # Enter at next candle open
-                    trade_type = 'LONG'
-                elif current_row['short_entry']:
-                    entry_price = current_row['open']
-                    trade_type = 'SHORT'
-                
-                if entry_price is not None:
-                    trade_size = current_capital * self.position_size / entry_price
-                    position = {
-                        'type': trade_type,
-                        'entry_price': entry_price,
-                        'entry_time': current_row['datetime'],
-                        'size': trade_size
-                    }
-            
-            # Update equity curve
-            if position is not None:
-                current_price = current_row['close']
-                if position['type'] == 'LONG':
-                    unrealized_pnl = (current_price - position['entry_price']) * position['size']
-                else:
-                    unrealized_pnl = (position['entry_price'] - current_price) * position['size']
-                equity_curve.append(current_capital + unrealized_pnl)
-            else:
-                equity_curve.append(current_capital)
-        
-        # Calculate performance metrics
-        results = self._calculate_metrics(trades, equity_curve)
-        return results
-    
-    def _calculate_metrics(self, trades: List[Trade], equity_curve: List[float]) -> BacktestResults:
-        """Calculate backtest performance metrics"""
-        if not trades:
-            return BacktestResults(
-                trades=[], total_return=0, win_rate=0, profit_factor=0,
-                max_drawdown=0, sharpe_ratio=0, total_trades=0, avg_trade=0,
-                max_win=0, max_loss=0
-            )
-        
-        # Basic metrics
-        total_return = (equity_curve[-1] - equity_curve[0]) / equity_curve[0]
-        
-        winning_trades = [t for t in trades if t.pnl > 0]
-        losing_trades = [t for t in trades if t.pnl < 0]
-        
-        win_rate = len(winning_trades) / len(trades) if trades else 0
-        
-        gross_profit = sum(t.pnl for t in winning_trades)
-        gross_loss = abs(sum(t.pnl for t in losing_trades))
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-        
-        avg_trade = sum(t.pnl for t in trades) / len(trades)
-        max_win = max((t.pnl for t in trades), default=0)
-        max_loss = min((t.pnl for t in trades), default=0)
-        
-        # Max drawdown
-        peak = equity_curve[0]
-        max_dd = 0
-        for value in equity_curve:
-            if value > peak:
-                peak = value
-            dd = (peak - value) / peak
-            if dd > max_dd:
-                max_dd = dd
-        
-        # Sharpe ratio (simplified)
-        returns = np.diff(equity_curve) / np.array(equity_curve[:-1])
-        sharpe_ratio = np.mean(returns) / np.std(returns) * np.sqrt(252) if np.std(returns) > 0 else 0
-        
-        return BacktestResults(
-            trades=trades,
-            total_return=total_return,
-            win_rate=win_rate,
-            profit_factor=profit_factor,
-            max_drawdown=max_dd,
-            sharpe_ratio=sharpe_ratio,
-            total_trades=len(trades),
-            avg_trade=avg_trade,
-            max_win=max_win,
-            max_loss=max_loss
-        )
+def configure_page():
+    """Apply page configuration and styling; must run before any other Streamlit call"""
+    st.set_page_config(
+        page_title="Volty Strategy Backtester",
+        page_icon="📈",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 def get_binance_data(symbol: str, interval: str, limit: int = 1000) -> pd.DataFrame:
-    """Fetch historical data from Binance API"""
+    """Fetch historical data from Binance API, reporting errors in the page"""
     try:
-        url = "https://api.binance.com/api/v3/klines"
-        params = {
-            'symbol': symbol,
-            'interval': interval,
-            'limit': limit
-        }
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        df = pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        
-        # Convert to proper data types
-        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col])
-        
-        df = df[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-        df = df.sort_values('datetime').reset_index(drop=True)
-        
-        return df
-        
+        return get_candle_cache().get(symbol, interval, limit)
     except Exception as e:
         st.error(f"Error fetching data: {str(e)}")
         return pd.DataFrame()
 
-def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None, trades: List[Trade] = None):
-    """Create TradingView-style candlestick chart"""
+@st.cache_resource
+def get_candle_cache() -> CandleCache:
+    """Candle cache shared by all sessions; refreshes only the newest candles"""
+    return CandleCache(fetch_klines)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_intrabar_data(symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str) -> Optional[pd.DataFrame]:
+    """1m candles covering the bars from ``start`` to ``end``, downloaded in parallel pages"""
+    try:
+        start_ms = int(start.value // 1_000_000)
+        end_ms = int((end + pd.Timedelta(seconds=timeframe_to_seconds(interval))).value // 1_000_000) - 1
+        return get_default_fetcher().fetch_range(symbol, '1m', start_ms, end_ms)
+    except Exception as e:
+        st.error(f"Error fetching 1m data, falling back to bar-open fills: {str(e)}")
+        return None
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def compute_signals(symbol: str, interval: str, limit: int, last_candle: tuple,
+                    length: int, atr_mult: float, _data: pd.DataFrame) -> pd.DataFrame:
+    """Signal frame cached by data range and strategy parameters
+
+    ``_data`` is not hashed; ``last_candle`` (open time and close of the newest
+    candle) identifies which version of the range it holds.
+    """
+    return VoltyStrategy(length=length, atr_mult=atr_mult).generate_signals(_data)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def compute_monte_carlo(returns: np.ndarray, initial_capital: float, n_paths: int, method: str,
+                        skip_probability: float, _trades: List[Trade]) -> MonteCarloResults:
+    """Monte Carlo analysis cached by the trade returns and the simulation settings
+
+    ``_trades`` is not hashed; ``returns`` (each trade's return on the capital
+    it was opened with) identifies them, so reruns of the page reuse the paths.
+    """
+    return run_monte_carlo(
+        _trades, initial_capital,
+        n_paths=n_paths, method=method,
+        skip_probability=skip_probability, equity_bands=True
+    )
+
+def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None, trades: List[Trade] = None,
+                             x_range: Optional[Tuple] = None, max_points: int = DEFAULT_MAX_POINTS):
+    """Create TradingView-style candlestick chart
+
+    Only the candles inside ``x_range`` are drawn, merged into at most
+    ``max_points`` buckets, so the figure stays the same size however long
+    the backtest is. Narrowing the range brings back full detail.
+    """
+    data = slice_range(data, x_range)
+    signals_df = slice_range(signals_df, x_range)
+    candles = aggregate_ohlc(data, max_points)
+    
     fig = make_subplots(
         rows=3, cols=1,
         shared_xaxes=True,
@@ -318,11 +142,11 @@ def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None
     # Candlestick chart
     fig.add_trace(
         go.Candlestick(
-            x=data['datetime'],
-            open=data['open'],
-            high=data['high'],
-            low=data['low'],
-            close=data['close'],
+            x=candles['datetime'],
+            open=candles['open'],
+            high=candles['high'],
+            low=candles['low'],
+            close=candles['close'],
             name='Price',
             increasing_line_color='#888888',
             decreasing_line_color='#555555',
@@ -334,87 +158,60 @@ def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None
     
     # Add signal lines if available
     if signals_df is not None and not signals_df.empty:
-        fig.add_trace(
-            go.Scatter(
-                x=signals_df['datetime'],
-                y=signals_df['long_signal'],
-                mode='lines',
-                line=dict(color='#888888', width=1, dash='dash'),
-                name='Long Signal',
-                opacity=0.7
-            ),
-            row=1, col=1
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=signals_df['datetime'],
-                y=signals_df['short_signal'],
-                mode='lines',
-                line=dict(color='#555555', width=1, dash='dash'),
-                name='Short Signal',
-                opacity=0.7
-            ),
-            row=1, col=1
-        )
-    
-    # Add trade markers
-    if trades:
-        long_entries = [t for t in trades if t.type == 'LONG']
-        short_entries = [t for t in trades if t.type == 'SHORT']
-        
-        if long_entries:
+        for column, color, name in (('long_signal', '#888888', 'Long Signal'),
+                                    ('short_signal', '#555555', 'Short Signal')):
+            x, y = downsample_line(signals_df['datetime'], signals_df[column], max_points)
             fig.add_trace(
-                go.Scatter(
-                    x=[t.entry_time for t in long_entries],
-                    y=[t.entry_price for t in long_entries],
-                    mode='markers',
-                    marker=dict(color='#888888', size=8, symbol='triangle-up'),
-                    name='Long Entry'
-                ),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=[t.exit_time for t in long_entries],
-                    y=[t.exit_price for t in long_entries],
-                    mode='markers',
-                    marker=dict(color='#888888', size=8, symbol='triangle-down'),
-                    name='Long Exit'
-                ),
-                row=1, col=1
-            )
-        
-        if short_entries:
-            fig.add_trace(
-                go.Scatter(
-                    x=[t.entry_time for t in short_entries],
-                    y=[t.entry_price for t in short_entries],
-                    mode='markers',
-                    marker=dict(color='#555555', size=8, symbol='triangle-down'),
-                    name='Short Entry'
+                go.Scattergl(
+                    x=x,
+                    y=y,
+                    mode='lines',
+                    line=dict(color=color, width=1, dash='dash'),
+                    name=name,
+                    opacity=0.7
                 ),
                 row=1, col=1
             )
+    
+    # Add trade markers
+    if trades:
+        start = data['datetime'].iloc[0] if not data.empty else None
+        end = data['datetime'].iloc[-1] if not data.empty else None
+        markers = (
+            ('LONG', 'entry', '#888888', 'triangle-up', 'Long Entry'),
+            ('LONG', 'exit', '#888888', 'triangle-down', 'Long Exit'),
+            ('SHORT', 'entry', '#555555', 'triangle-down', 'Short Entry'),
+            ('SHORT', 'exit', '#555555', 'triangle-up', 'Short Exit')
+        )
+        for trade_type, side, color, symbol, name in markers:
+            points = [
+                (getattr(t, f'{side}_time'), getattr(t, f'{side}_price'))
+                for t in trades
+                if t.type == trade_type and start is not None
+                and start <= getattr(t, f'{side}_time') <= end
+            ]
+            if not points:
+                continue
             
+            times, prices = zip(*points)
             fig.add_trace(
-                go.Scatter(
-                    x=[t.exit_time for t in short_entries],
-                    y=[t.exit_price for t in short_entries],
+                go.Scattergl(
+                    x=times,
+                    y=prices,
                     mode='markers',
-                    marker=dict(color='#555555', size=8, symbol='triangle-up'),
-                    name='Short Exit'
+                    marker=dict(color=color, size=8, symbol=symbol),
+                    name=name
                 ),
                 row=1, col=1
             )
     
     # ATR indicator
     if signals_df is not None and 'atr' in signals_df.columns:
+        x, y = downsample_line(signals_df['datetime'], signals_df['atr'], max_points)
         fig.add_trace(
-            go.Scatter(
-                x=signals_df['datetime'],
-                y=signals_df['atr'],
+            go.Scattergl(
+                x=x,
+                y=y,
                 mode='lines',
                 line=dict(color='#999999', width=2),
                 name='ATR'
@@ -423,13 +220,12 @@ def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None
         )
     
     # Volume bars
-    colors = ['#888888' if data['close'].iloc[i] >= data['open'].iloc[i] else '#555555' 
-              for i in range(len(data))]
+    colors = np.where(candles['close'].to_numpy() >= candles['open'].to_numpy(), '#888888', '#555555')
     
     fig.add_trace(
         go.Bar(
-            x=data['datetime'],
-            y=data['volume'],
+            x=candles['datetime'],
+            y=candles['volume'],
             name='Volume',
             marker_color=colors,
             opacity=0.7
@@ -460,24 +256,21 @@ def create_candlestick_chart(data: pd.DataFrame, signals_df: pd.DataFrame = None
     
     return fig
 
-def create_equity_curve(results: BacktestResults, initial_capital: float):
+def create_equity_curve(results: BacktestResults, initial_capital: float,
+                        max_points: int = DEFAULT_MAX_POINTS):
     """Create equity curve chart"""
     if not results.trades:
         return go.Figure()
     
     # Calculate equity curve from trades
-    equity = [initial_capital]
-    dates = [results.trades[0].entry_time]
-    current_equity = initial_capital
-    
-    for trade in results.trades:
-        current_equity += trade.pnl
-        equity.append(current_equity)
-        dates.append(trade.exit_time)
+    pnl = np.array([trade.pnl for trade in results.trades])
+    equity = initial_capital + np.concatenate(([0.0], np.cumsum(pnl)))
+    dates = np.array([results.trades[0].entry_time] + [trade.exit_time for trade in results.trades])
+    dates, equity = downsample_line(dates, equity, max_points)
     
     fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             x=dates,
             y=equity,
             mode='lines',
@@ -502,6 +295,40 @@ def create_equity_curve(results: BacktestResults, initial_capital: float):
     
     return fig
 
+def create_monte_carlo_chart(mc_results: MonteCarloResults):
+    """Create percentile band chart of Monte Carlo equity paths"""
+    fig = go.Figure()
+    if not mc_results.equity_bands:
+        return fig
+    
+    percentiles = sorted(mc_results.equity_bands)
+    trade_numbers = np.arange(1, mc_results.n_trades + 1)
+    colors = ['#555555', '#777777', '#aaaaaa', '#777777', '#555555']
+    
+    for i, p in enumerate(percentiles):
+        fig.add_trace(
+            go.Scatter(
+                x=trade_numbers,
+                y=mc_results.equity_bands[p],
+                mode='lines',
+                line=dict(color=colors[i % len(colors)], width=3 if p == 50 else 1),
+                name=f'P{p}'
+            )
+        )
+    
+    fig.update_layout(
+        template='plotly_dark',
+        height=400,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'),
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis=dict(title='Trade #', showgrid=True, gridwidth=1, gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(title='Equity', showgrid=True, gridwidth=1, gridcolor='rgba(255,255,255,0.1)')
+    )
+    
+    return fig
+
 # Initialize session state
 def init_session_state():
     if 'backtest_results' not in st.session_state:
@@ -512,6 +339,7 @@ def init_session_state():
         st.session_state.signals_data = pd.DataFrame()
 
 def main():
+    configure_page()
     init_session_state()
     
     # Header
@@ -536,81 +364,91 @@ def main():
         
         st.markdown("---")
         
-        # Data Settings
-        st.markdown("### 📊 Data Settings")
-        
-        symbol = st.selectbox(
-            "Symbol",
-            ["BTCUSDT", "ETHUSDT", "ADAUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"],
-            key="symbol"
-        )
-        
-        timeframe_map = {
-            "1m": "1m", "5m": "5m", "15m": "15m", "30m": "30m",
-            "1h": "1h", "4h": "4h", "1d": "1d", "1w": "1w"
-        }
-        
-        timeframe = st.selectbox(
-            "Timeframe",
-            list(timeframe_map.keys()),
-            index=4,
-            key="timeframe"
-        )
-        
-        data_points = st.slider(
-            "Data Points",
-            min_value=100,
-            max_value=1000,
-            value=500,
-            step=50,
-            help="Number of candles to fetch"
-        )
-        
-        # Strategy Parameters
-        st.markdown("### ⚙️ Strategy Parameters")
-        
-        strategy_length = st.slider(
-            "ATR Length",
-            min_value=1,
-            max_value=50,
-            value=5,
-            help="Period for ATR calculation"
-        )
-        
-        atr_mult = st.slider(
-            "ATR Multiplier",
-            min_value=0.1,
-            max_value=5.0,
-            value=0.75,
-            step=0.05,
-            help="Multiplier for ATR-based signals"
-        )
-        
-        # Backtest Settings
-        st.markdown("### 💰 Backtest Settings")
-        
-        initial_capital = st.number_input(
-            "Initial Capital ($)",
-            min_value=1000,
-            max_value=1000000,
-            value=10000,
-            step=1000
-        )
-        
-        position_size = st.slider(
-            "Position Size (%)",
-            min_value=1,
-            max_value=100,
-            value=10,
-            help="Percentage of capital per trade"
-        ) / 100
-        
-        st.markdown("---")
+        # Settings only apply on submit, so tweaking a widget does not rerun the backtest
+        with st.form("backtest_settings"):
+            # Data Settings
+            st.markdown("### 📊 Data Settings")
+            
+            symbol = st.selectbox(
+                "Symbol",
+                ["BTCUSDT", "ETHUSDT", "ADAUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"],
+                key="symbol"
+            )
+            
+            timeframe_map = {
+                "1m": "1m", "5m": "5m", "15m": "15m", "30m": "30m",
+                "1h": "1h", "4h": "4h", "1d": "1d", "1w": "1w"
+            }
+            
+            timeframe = st.selectbox(
+                "Timeframe",
+                list(timeframe_map.keys()),
+                index=4,
+                key="timeframe"
+            )
+            
+            data_points = st.slider(
+                "Data Points",
+                min_value=100,
+                max_value=20000,
+                value=500,
+                step=100,
+                help="Number of candles to fetch (more than 1000 are downloaded in parallel pages)"
+            )
+            
+            # Strategy Parameters
+            st.markdown("### ⚙️ Strategy Parameters")
+            
+            strategy_length = st.slider(
+                "ATR Length",
+                min_value=1,
+                max_value=50,
+                value=5,
+                help="Period for ATR calculation"
+            )
+            
+            atr_mult = st.slider(
+                "ATR Multiplier",
+                min_value=0.1,
+                max_value=5.0,
+                value=0.75,
+                step=0.05,
+                help="Multiplier for ATR-based signals"
+            )
+            
+            # Backtest Settings
+            st.markdown("### 💰 Backtest Settings")
+            
+            initial_capital = st.number_input(
+                "Initial Capital ($)",
+                min_value=1000,
+                max_value=1000000,
+                value=10000,
+                step=1000
+            )
+            
+            position_size = st.slider(
+                "Position Size (%)",
+                min_value=1,
+                max_value=100,
+                value=10,
+                help="Percentage of capital per trade"
+            ) / 100
+            
+            intrabar_fills = st.checkbox(
+                "Intrabar Fills (1m data)",
+                value=False,
+                help="Fill entries and exits where the breakout level was first touched in the 1m candles"
+            )
+            
+            st.markdown("---")
+            
+            # Controls
+            run_clicked = st.form_submit_button("🚀 Run Backtest", use_container_width=True)
         
-        # Controls
-        if st.button("🚀 Run Backtest", use_container_width=True):
+        if run_clicked:
             with st.spinner("Fetching data and running backtest..."):
-                # Fetch data
+                # Fetch data (served from cache, topping up only the newest candles)
                 data = get_binance_data(symbol, timeframe_map[timeframe], data_points)
                 
                 if not data.empty:
@@ -619,13 +457,32 @@ def main():
                     # Initialize strategy
                     strategy = VoltyStrategy(length=strategy_length, atr_mult=atr_mult)
                     
-                    # Generate signals
-                    signals_df = strategy.generate_signals(data)
+                    # Generate signals once and reuse them in the backtest
+                    last_candle = (data['datetime'].iloc[-1], float(data['close'].iloc[-1]))
+                    signals_df = compute_signals(
+                        symbol, timeframe_map[timeframe], data_points, last_candle,
+                        strategy_length, atr_mult, data
+                    )
                     st.session_state.signals_data = signals_df
                     
+                    # Fetch the 1m candles under the backtest range for intrabar fills
+                    intrabar_data = None
+                    if intrabar_fills and timeframe_map[timeframe] != '1m':
+                        intrabar_data = get_intrabar_data(
+                            symbol, data['datetime'].iloc[0], data['datetime'].iloc[-1],
+                            timeframe_map[timeframe]
+                        )
+                    
                     # Run backtest
-                    backtester = Backtester(initial_capital=initial_capital, position_size=position_size)
-                    results = backtester.run_backtest(data, strategy)
+                    backtester = Backtester(
+                        initial_capital=initial_capital,
+                        position_size=position_size,
+                        timeframe=timeframe_map[timeframe],
+                        fill_mode='intrabar' if intrabar_data is not None else 'open'
+                    )
+                    results = backtester.run_backtest(
+                        data, strategy, intrabar_data=intrabar_data, signals=signals_df
+                    )
                     st.session_state.backtest_results = results
                     
                     st.success("Backtest completed successfully!")
@@ -682,15 +539,41 @@ def main():
         with col4:
             st.metric("⚡ Total Trades", f"{results.total_trades}")
         
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("📐 Sortino Ratio", f"{results.sortino_ratio:.2f}")
+        with col2:
+            st.metric("🧮 Calmar Ratio", f"{results.calmar_ratio:.2f}")
+        with col3:
+            st.metric("⏳ Max DD Duration", f"{results.max_drawdown_duration} bars")
+        with col4:
+            st.metric("🕒 Exposure", f"{results.exposure:.1%}", delta=f"Turnover: {results.turnover:.1f}x")
+        
         # Charts
-        chart_tab1, chart_tab2 = st.tabs(["📊 Price Chart & Signals", "💹 Equity Curve"])
+        chart_tab1, chart_tab2, chart_tab3 = st.tabs(["📊 Price Chart & Signals", "💹 Equity Curve", "🎲 Monte Carlo"])
         
         with chart_tab1:
-            if not st.session_state.price_data.empty:
+            price_data = st.session_state.price_data
+            if not price_data.empty:
+                # Candles are aggregated to a fixed budget; narrowing the range redraws it in full detail
+                first_candle = price_data['datetime'].iloc[0].to_pydatetime()
+                last_candle = price_data['datetime'].iloc[-1].to_pydatetime()
+                visible_range = None
+                if first_candle < last_candle:
+                    visible_range = st.slider(
+                        "Visible Range",
+                        min_value=first_candle,
+                        max_value=last_candle,
+                        value=(first_candle, last_candle),
+                        format="YYYY-MM-DD HH:mm"
+                    )
+                
                 chart_fig = create_candlestick_chart(
-                    st.session_state.price_data,
+                    price_data,
                     st.session_state.signals_data,
-                    results.trades
+                    results.trades,
+                    x_range=visible_range
                 )
                 st.plotly_chart(chart_fig, use_container_width=True)
         
@@ -698,6 +581,35 @@ def main():
             equity_fig = create_equity_curve(results, initial_capital)
             st.plotly_chart(equity_fig, use_container_width=True)
         
+        with chart_tab3:
+            if results.trades:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    mc_paths = st.select_slider("Paths", options=[1000, 5000, 10000, 25000], value=10000)
+                with col2:
+                    mc_method = st.selectbox("Resampling", ["shuffle", "bootstrap"])
+                with col3:
+                    mc_skip = st.slider("Skipped Trades (%)", min_value=0, max_value=50, value=0) / 100
+                
+                mc_results = compute_monte_carlo(
+                    trade_returns(results.trades, initial_capital), initial_capital,
+                    mc_paths, mc_method, mc_skip, results.trades
+                )
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("📉 Median Return", f"{mc_results.return_percentiles[50]:.2%}")
+                with col2:
+                    st.metric("⚠️ 5th Pct Return", f"{mc_results.return_percentiles[5]:.2%}")
+                with col3:
+                    st.metric("🕳️ 95th Pct Drawdown", f"{mc_results.drawdown_percentiles[95]:.2%}")
+                with col4:
+                    st.metric("☠️ Risk of Ruin", f"{mc_results.risk_of_ruin:.2%}", delta="50% loss")
+                
+                st.plotly_chart(create_monte_carlo_chart(mc_results), use_container_width=True)
+            else:
+                st.info("Monte Carlo analysis needs at least one trade.")
+        
         # Trade History
         st.markdown("## 📋 Trade History")
         
@@ -0,0 +1,239 @@
+"""
+Volty Backtest CLI
+Runs headless backtests over candle files and writes results as JSON and CSV
+
+Example:
+    python cli.py data/BTCUSDT_1h.csv data/ETHUSDT_1h.csv --timeframe 1h --output-dir results
+    python cli.py data/BTCUSDT_1h.csv --walk-forward --lengths 3,5,8,13 --atr-mults 0.5,0.75,1,1.5
+    python cli.py data/BTCUSDT_1h.csv --ai-model gradient_boosting --retrain-every 1000
+    python cli.py data/BTCUSDT_1h.csv --strategy bollinger_bands_volume --param bb_length=30 --param bb_deviation=2.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from data import load_candles
+from engine import Backtester, results_summary, trades_to_frame
+from strategies import STRATEGIES, create_strategy
+from walk_forward import SCORES, walk_forward, windows_to_frame
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run Volty strategy backtests on candle files")
+    parser.add_argument('candles', nargs='+', help="Candle files (.csv, .json or .parquet)")
+    parser.add_argument('--strategy', choices=list(STRATEGIES), default='volty', help="Strategy to backtest")
+    parser.add_argument('--param', action='append', default=[], type=_param, metavar='NAME=VALUE',
+                        help="Strategy parameter, repeatable, e.g. bb_length=20 (volty uses --length/--atr-mult)")
+    parser.add_argument('--length', type=int, default=5, help="ATR length")
+    parser.add_argument('--atr-mult', type=float, default=0.75, help="ATR multiplier")
+    parser.add_argument('--capital', type=float, default=10000, help="Initial capital")
+    parser.add_argument('--position-size', type=float, default=0.1,
+                        help="Fraction of capital per trade (0-1)")
+    parser.add_argument('--timeframe', help="Bar interval used for annualization, e.g. 1h; inferred if omitted")
+    parser.add_argument('--intrabar', help="1m candle file for intrabar fills (single input only)")
+    parser.add_argument('--output-dir', default='backtest_results', help="Directory for result files")
+    parser.add_argument('--no-trades', action='store_true', help="Skip writing per-trade CSV files")
+
+    wf = parser.add_argument_group('walk-forward optimization')
+    wf.add_argument('--walk-forward', action='store_true',
+                    help="Optimize length/atr_mult on rolling train windows and report out-of-sample results")
+    wf.add_argument('--lengths', type=_int_list, default=[3, 5, 8, 13, 21], help="Candidate ATR lengths, e.g. 3,5,8")
+    wf.add_argument('--atr-mults', type=_float_list, default=[0.5, 0.75, 1.0, 1.5, 2.0],
+                    help="Candidate ATR multipliers, e.g. 0.5,0.75,1")
+    wf.add_argument('--train-bars', type=int, default=2000, help="Candles per train window")
+    wf.add_argument('--test-bars', type=int, default=500, help="Candles per test window")
+    wf.add_argument('--score', choices=SCORES, default='sharpe', help="Objective maximized on train windows")
+    wf.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+
+    ai = parser.add_argument_group('AI model signals')
+    ai.add_argument('--ai-model', choices=AI_MODELS,
+                    help="Trade walk-forward forecasts of this model instead of the Volty strategy")
+    ai.add_argument('--lookback', type=int, default=50, help="Candles per model input window")
+    ai.add_argument('--n-estimators', type=int, default=100, help="Trees per model")
+    ai.add_argument('--retrain-every', type=int, default=500,
+                    help="Candles between refits; 0 fits once on the first --min-train windows")
+    ai.add_argument('--train-window', type=int, help="Windows per refit (default: all known so far)")
+    ai.add_argument('--min-train', type=int, default=500, help="Windows before the first fit")
+    ai.add_argument('--threshold', type=float, default=0.002,
+                    help="Forecast return beyond which a long or short is taken")
+    return parser.parse_args(argv)
+
+
+AI_MODELS = ('random_forest', 'gradient_boosting')
+
+
+def ai_strategy(args: argparse.Namespace):
+    """AI signal strategy for the ``--ai-model`` options"""
+    # The AI modules live in the repository root, next to this directory
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ai_models import GradientBoostingModel, RandomForestModel
+    from ai_signals import AISignalStrategy
+
+    model_class = RandomForestModel if args.ai_model == 'random_forest' else GradientBoostingModel
+    model = model_class('backtest', args.timeframe or '1h', lookback_period=args.lookback,
+                        n_estimators=args.n_estimators)
+    return AISignalStrategy(model, retrain_every=args.retrain_every or None, train_window=args.train_window,
+                            min_train=args.min_train, threshold=args.threshold, max_workers=args.workers)
+
+
+def _param(value: str) -> Tuple[str, float]:
+    name, _, number = value.partition('=')
+    if not name or not number:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {value!r}")
+    number = float(number)
+    return name, int(number) if number.is_integer() else number
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',')]
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(',')]
+
+
+def run_file(path: str, args: argparse.Namespace, intrabar=None) -> Dict:
+    """Backtest one candle file and write its result files"""
+    started = time.perf_counter()
+    candles = load_candles(path)
+
+    if args.ai_model:
+        strategy = ai_strategy(args)
+        parameters = {
+            'ai_model': args.ai_model, 'lookback': args.lookback, 'n_estimators': args.n_estimators,
+            'retrain_every': args.retrain_every, 'train_window': args.train_window,
+            'min_train': args.min_train, 'threshold': args.threshold
+        }
+    elif args.strategy == 'volty':
+        parameters = {'length': args.length, 'atr_mult': args.atr_mult, **dict(args.param)}
+        strategy = create_strategy('volty', **parameters)
+    else:
+        parameters = dict(args.param)
+        strategy = create_strategy(args.strategy, **parameters)
+        parameters = {'strategy': args.strategy, **vars(strategy)}
+    backtester = Backtester(
+        initial_capital=args.capital,
+        position_size=args.position_size,
+        timeframe=args.timeframe,
+        fill_mode='intrabar' if intrabar is not None else 'open'
+    )
+    results = backtester.run_backtest(candles, strategy, intrabar_data=intrabar)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    summary = {
+        'source': path,
+        'candles': len(candles),
+        'parameters': parameters,
+        'results': results_summary(results),
+        'elapsed_seconds': round(time.perf_counter() - started, 4)
+    }
+
+    with open(os.path.join(args.output_dir, f'{name}.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+
+    if not args.no_trades:
+        trades_to_frame(results.trades).to_csv(os.path.join(args.output_dir, f'{name}_trades.csv'), index=False)
+
+    return summary
+
+
+def run_walk_forward(path: str, args: argparse.Namespace) -> Dict:
+    """Walk-forward optimize one candle file and write its result files"""
+    started = time.perf_counter()
+    candles = load_candles(path)
+
+    results = walk_forward(
+        candles,
+        lengths=args.lengths,
+        atr_mults=args.atr_mults,
+        train_bars=args.train_bars,
+        test_bars=args.test_bars,
+        score=args.score,
+        initial_capital=args.capital,
+        position_size=args.position_size,
+        timeframe=args.timeframe,
+        max_workers=args.workers
+    )
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    summary = {
+        'source': path,
+        'candles': len(candles),
+        'parameters': {
+            'lengths': args.lengths, 'atr_mults': args.atr_mults,
+            'train_bars': args.train_bars, 'test_bars': args.test_bars, 'score': args.score
+        },
+        'windows': len(results.windows),
+        'results': {k: (v if np.isfinite(v) else None) for k, v in results.metrics.items()},
+        'total_trades': len(results.trades),
+        'elapsed_seconds': round(time.perf_counter() - started, 4)
+    }
+
+    with open(os.path.join(args.output_dir, f'{name}_walk_forward.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    windows_to_frame(results).to_csv(os.path.join(args.output_dir, f'{name}_windows.csv'), index=False)
+
+    if not args.no_trades:
+        trades_to_frame(results.trades).to_csv(
+            os.path.join(args.output_dir, f'{name}_walk_forward_trades.csv'), index=False
+        )
+
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.walk_forward and args.intrabar:
+        print("--intrabar is not supported with --walk-forward", file=sys.stderr)
+        return 2
+    if args.strategy != 'volty' and (args.walk_forward or args.intrabar or args.ai_model):
+        print("--walk-forward, --intrabar and --ai-model only work with the volty strategy", file=sys.stderr)
+        return 2
+    if args.ai_model and (args.walk_forward or args.intrabar):
+        print("--ai-model cannot be combined with --walk-forward or --intrabar", file=sys.stderr)
+        return 2
+    if args.intrabar and len(args.candles) > 1:
+        print("--intrabar can only be used with a single candle file", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    intrabar = load_candles(args.intrabar) if args.intrabar else None
+
+    summaries = []
+    failed = 0
+    for path in args.candles:
+        try:
+            if args.walk_forward:
+                summary = run_walk_forward(path, args)
+            else:
+                summary = run_file(path, args, intrabar)
+        except Exception as e:
+            print(f"{path}: error: {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        results = summary['results']
+        if args.walk_forward:
+            print(f"{path}: {summary['windows']} windows, {summary['total_trades']} out-of-sample trades, "
+                  f"return {results['total_return']:.2%}, max DD {results['max_drawdown']:.2%}, "
+                  f"Sharpe {results['sharpe_ratio']:.2f}")
+            summaries.append(summary)
+            continue
+        print(f"{path}: {results['total_trades']} trades, return {results['total_return']:.2%}, "
+              f"max DD {results['max_drawdown']:.2%}, Sharpe {results['sharpe_ratio']:.2f}")
+        summaries.append(summary)
+
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w') as f:
+        json.dump(summaries, f, indent=2, default=str)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
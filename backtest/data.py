@@ -0,0 +1,303 @@
+"""
+Backtest Market Data
+Candle loading from the Binance API and from local files
+"""
+
+import os
+import random
+import threading
+import time
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Optional, Tuple
+from metrics import timeframe_to_seconds
+
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+
+# Binance serves at most 1000 klines per request
+MAX_KLINES_PER_REQUEST = 1000
+
+KLINE_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+    'taker_buy_quote', 'ignore'
+]
+
+CANDLE_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+
+
+def klines_to_frame(klines: list) -> pd.DataFrame:
+    """Convert raw Binance kline rows to a sorted OHLCV frame"""
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+
+    # Convert to proper data types
+    df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col])
+
+    df = df[CANDLE_COLUMNS]
+    df = df.sort_values('datetime').reset_index(drop=True)
+
+    return df
+
+
+class RequestWeightBudget:
+    """Thread-safe token bucket for API request weight per minute"""
+
+    def __init__(self, weight_per_minute: int):
+        self.capacity = float(weight_per_minute)
+        self.available = float(weight_per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight: int):
+        """Block until ``weight`` units are available, then consume them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+                self.updated = now
+                if self.available >= weight:
+                    self.available -= weight
+                    return
+                wait = (weight - self.available) * 60 / self.capacity
+            time.sleep(wait)
+
+    def sync(self, used_weight: int):
+        """Align with the weight the server reports as already used this minute"""
+        with self._lock:
+            self.available = min(self.available, max(self.capacity - used_weight, 0.0))
+
+
+class KlineFetcher:
+    """Paginated kline downloader with pooled connections, retries and a weight budget
+
+    A date range is split into pages of ``page_size`` candles which are
+    fetched concurrently over one ``requests.Session``. Requests wait on a
+    shared request-weight budget. 429/418/5xx responses, dropped connections
+    and timeouts are retried with exponential backoff (honouring
+    ``Retry-After``), and the pages are stitched into one sorted,
+    de-duplicated frame. ``base_url`` can point at a local stub server for
+    testing.
+    """
+
+    RETRY_STATUSES = (418, 429, 500, 502, 503, 504)
+    RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, base_url: str = BINANCE_KLINES_URL, max_workers: int = 4,
+                 weight_per_minute: int = 1200, request_weight: int = 2,
+                 page_size: int = MAX_KLINES_PER_REQUEST, max_retries: int = 5,
+                 backoff: float = 0.5, timeout: float = 10.0,
+                 session: Optional[requests.Session] = None):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.request_weight = request_weight
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.budget = RequestWeightBudget(weight_per_minute)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def get_page(self, params: Dict) -> list:
+        """One kline request, retried on rate limiting, server errors and network failures"""
+        for attempt in range(self.max_retries + 1):
+            self.budget.acquire(self.request_weight)
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except self.RETRY_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+                continue
+
+            used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+            if used_weight is not None:
+                self.budget.sync(int(used_weight))
+
+            if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                response.raise_for_status()
+                return response.json()
+
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                wait = float(retry_after)
+            else:
+                wait = self.backoff * (2 ** attempt) * (1 + random.random())
+            time.sleep(wait)
+
+    def fetch_range(self, symbol: str, interval: str, start_time: int, end_time: int) -> pd.DataFrame:
+        """All candles opened between two millisecond timestamps (inclusive)"""
+        interval_ms = timeframe_to_seconds(interval) * 1000
+        page_span = interval_ms * self.page_size
+        pages = [
+            {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': page_start,
+                'endTime': min(page_start + page_span - 1, end_time),
+                'limit': self.page_size
+            }
+            for page_start in range(int(start_time), int(end_time) + 1, page_span)
+        ]
+
+        if len(pages) == 1:
+            results = [self.get_page(pages[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self.get_page, pages))
+
+        klines = [row for page in results for row in page]
+        df = klines_to_frame(klines)
+        return df.drop_duplicates('datetime', keep='last').reset_index(drop=True)
+
+    def fetch_latest(self, symbol: str, interval: str, limit: int) -> pd.DataFrame:
+        """The most recent ``limit`` candles, including the one still forming"""
+        interval_ms = timeframe_to_seconds(interval) * 1000
+        now_ms = int(time.time() * 1000)
+        current_open = now_ms - now_ms % interval_ms
+        start_time = current_open - (limit - 1) * interval_ms
+        return self.fetch_range(symbol, interval, start_time, now_ms).iloc[-limit:].reset_index(drop=True)
+
+
+_default_fetcher: Optional[KlineFetcher] = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_default_fetcher() -> KlineFetcher:
+    """Process-wide fetcher so all callers share one connection pool and weight budget"""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = KlineFetcher()
+        return _default_fetcher
+
+
+def fetch_klines(symbol: str, interval: str, limit: int = 1000,
+                 start_time: Optional[int] = None) -> pd.DataFrame:
+    """Fetch historical data from Binance API, raising on request errors
+
+    ``start_time`` is a millisecond timestamp; without it the most recent
+    ``limit`` candles are returned. Requests for more than 1000 candles are
+    paginated and downloaded concurrently.
+    """
+    fetcher = get_default_fetcher()
+
+    if limit > MAX_KLINES_PER_REQUEST:
+        if start_time is None:
+            return fetcher.fetch_latest(symbol, interval, limit)
+        end_time = int(start_time) + limit * timeframe_to_seconds(interval) * 1000 - 1
+        return fetcher.fetch_range(symbol, interval, start_time, end_time)
+
+    params = {
+        'symbol': symbol,
+        'interval': interval,
+        'limit': limit
+    }
+    if start_time is not None:
+        params['startTime'] = int(start_time)
+
+    return klines_to_frame(fetcher.get_page(params))
+
+
+def normalize_candles(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a candle frame from any source to the backtester's column layout"""
+    if list(df.columns) == list(range(len(KLINE_COLUMNS))):
+        # Raw kline arrays as returned by the Binance API
+        return klines_to_frame(df.values.tolist())
+
+    df = df.rename(columns={c: str(c).lower() for c in df.columns})
+
+    if 'datetime' not in df.columns:
+        if 'timestamp' not in df.columns:
+            raise ValueError("Candles need a 'datetime' or 'timestamp' column")
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
+    else:
+        df['datetime'] = pd.to_datetime(df['datetime'])
+
+    missing = [c for c in CANDLE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Candles are missing columns: {', '.join(missing)}")
+
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col])
+
+    return df[CANDLE_COLUMNS].sort_values('datetime').reset_index(drop=True)
+
+
+def load_candles(path: str) -> pd.DataFrame:
+    """Load candles from a CSV, JSON or Parquet file"""
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        df = pd.read_csv(path)
+    elif extension == '.json':
+        df = pd.read_json(path)
+    elif extension == '.parquet':
+        df = pd.read_parquet(path)
+    else:
+        raise ValueError(f"Unsupported candle file format: {extension}")
+
+    return normalize_candles(df)
+
+
+class CandleCache:
+    """In-memory candle cache that tops up only the newest candles when stale
+
+    Frames are kept per (symbol, interval). A request within ``max_age``
+    seconds of the last refresh is served from memory; after that only the
+    candles from the last cached open time onward are downloaded, since the
+    last cached candle may still have been forming.
+    """
+
+    def __init__(self, fetch: Callable[..., pd.DataFrame] = fetch_klines, max_age: float = 30.0):
+        self.fetch = fetch
+        self.max_age = max_age
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._refreshed: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, interval: str, limit: int) -> pd.DataFrame:
+        """Latest ``limit`` candles for a symbol and interval"""
+        key = (symbol, interval)
+        with self._lock:
+            cached = self._frames.get(key)
+            refreshed = self._refreshed.get(key, 0.0)
+
+            if cached is None or len(cached) < limit:
+                frame = self.fetch(symbol, interval, limit)
+            elif time.time() - refreshed < self.max_age:
+                return cached.iloc[-limit:].reset_index(drop=True)
+            else:
+                frame = self._top_up(cached, symbol, interval, limit)
+
+            if frame.empty:
+                return frame
+            self._frames[key] = frame
+            self._refreshed[key] = time.time()
+            return frame.iloc[-limit:].reset_index(drop=True)
+
+    def _top_up(self, cached: pd.DataFrame, symbol: str, interval: str, limit: int) -> pd.DataFrame:
+        """Fetch candles since the last cached one and merge them in"""
+        last_open = cached['datetime'].iloc[-1]
+        missing_bars = (pd.Timestamp.now(tz='UTC').tz_localize(None) - last_open).total_seconds() / timeframe_to_seconds(interval)
+        if missing_bars >= limit:
+            return self.fetch(symbol, interval, limit)
+
+        start_ms = int(last_open.value // 1_000_000)
+        newest = self.fetch(symbol, interval, int(missing_bars) + 2, start_time=start_ms)
+        merged = pd.concat([cached[cached['datetime'] < last_open], newest], ignore_index=True)
+        return merged.iloc[-max(limit, len(cached)):].reset_index(drop=True)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._refreshed.clear()
@@ -0,0 +1,88 @@
+"""
+Chart Downsampling
+Level-of-detail reduction for candles and line series before they are sent to Plotly
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+# Default number of points per trace; enough for a full-width chart on a large screen
+DEFAULT_MAX_POINTS = 2000
+
+
+def bucket_size(n: int, max_points: int) -> int:
+    """Number of consecutive samples merged into one bucket"""
+    return max(1, -(-n // max_points))
+
+
+def aggregate_ohlc(data: pd.DataFrame, max_bars: int = DEFAULT_MAX_POINTS) -> pd.DataFrame:
+    """Merge consecutive candles into at most ``max_bars`` wider candles
+
+    Each bucket keeps the first open time and open, the highest high, the
+    lowest low, the last close and the summed volume, so the aggregated chart
+    still shows the true range of every period.
+    """
+    n = len(data)
+    size = bucket_size(n, max_bars)
+    if size == 1:
+        return data
+
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+
+    aggregated = {
+        'datetime': data['datetime'].to_numpy()[starts],
+        'open': data['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(data['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(data['low'].to_numpy(), starts),
+        'close': data['close'].to_numpy()[ends]
+    }
+    if 'volume' in data:
+        aggregated['volume'] = np.add.reduceat(data['volume'].to_numpy(), starts)
+
+    return pd.DataFrame(aggregated)
+
+
+def minmax_indices(values: np.ndarray, max_points: int = DEFAULT_MAX_POINTS) -> np.ndarray:
+    """Indices that keep the minimum and maximum of every bucket, in order
+
+    Unlike plain striding this never drops a spike: every local extreme of
+    the line survives, so its visual envelope is preserved.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    size = bucket_size(n, max(max_points // 2, 1))
+    if size == 1:
+        return np.arange(n)
+
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(n_buckets, size)
+
+    # NaN never wins; an all-NaN bucket falls back to its first sample
+    low = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1)
+    high = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1)
+    offsets = np.arange(n_buckets) * size
+
+    indices = np.unique(np.concatenate((offsets + low, offsets + high, [n - 1])))
+    return indices[indices < n]
+
+
+def downsample_line(x, y, max_points: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """Shape-preserving reduction of a line series to about ``max_points`` points"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    indices = minmax_indices(y, max_points)
+    return x[indices], y[indices]
+
+
+def slice_range(data: pd.DataFrame, x_range: Optional[Tuple] = None) -> pd.DataFrame:
+    """Rows of a frame whose datetime falls inside ``x_range`` (inclusive)"""
+    if x_range is None or data is None or data.empty:
+        return data
+    times = data['datetime'].to_numpy()
+    lo = np.searchsorted(times, pd.Timestamp(x_range[0]).to_datetime64(), side='left')
+    hi = np.searchsorted(times, pd.Timestamp(x_range[1]).to_datetime64(), side='right')
+    return data.iloc[lo:hi]
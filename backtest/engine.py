@@ -0,0 +1,312 @@
+"""
+Volty Backtest Engine
+Headless strategy, backtester and result types shared by the Streamlit app and the CLI
+"""
+
+import pandas as pd
+import numpy as np
+import datetime
+from dataclasses import asdict, dataclass, fields
+from typing import List, Dict, Optional
+from metrics import calculate_equity_metrics, infer_bar_seconds, periods_per_year
+from fills import resolve_intrabar_fills
+
+@dataclass
+class Trade:
+    entry_time: datetime.datetime
+    exit_time: datetime.datetime
+    type: str  # 'LONG' or 'SHORT'
+    entry_price: float
+    exit_price: float
+    size: float
+    pnl: float
+    pnl_pct: float
+
+@dataclass
+class BacktestResults:
+    trades: List[Trade]
+    total_return: float
+    win_rate: float
+    profit_factor: float
+    max_drawdown: float
+    sharpe_ratio: float
+    total_trades: int
+    avg_trade: float
+    max_win: float
+    max_loss: float
+    sortino_ratio: float = 0.0
+    calmar_ratio: float = 0.0
+    max_drawdown_duration: int = 0
+    exposure: float = 0.0
+    turnover: float = 0.0
+    equity_curve: Optional[np.ndarray] = None
+
+class VoltyStrategy:
+    def __init__(self, length: int = 5, atr_mult: float = 0.75):
+        self.length = length
+        self.atr_mult = atr_mult
+        
+    def calculate_atr(self, data: pd.DataFrame) -> pd.Series:
+        """Calculate Average True Range"""
+        high = data['high']
+        low = data['low']
+        close = data['close']
+        
+        tr1 = high - low
+        tr2 = np.abs(high - close.shift(1))
+        tr3 = np.abs(low - close.shift(1))
+        
+        tr = np.maximum(tr1, np.maximum(tr2, tr3))
+        atr = tr.rolling(window=self.length).mean()
+        
+        return atr
+    
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Generate trading signals"""
+        df = data.copy()
+        
+        # Calculate ATR
+        df['atr'] = self.calculate_atr(df)
+        df['atrs'] = df['atr'] * self.atr_mult
+        
+        # Calculate signal levels
+        df['long_signal'] = df['close'] + df['atrs']
+        df['short_signal'] = df['close'] - df['atrs']
+        
+        # Generate entry signals
+        df['long_entry'] = (df['high'] >= df['long_signal'].shift(1)) & (df['high'].shift(1) < df['long_signal'].shift(2))
+        df['short_entry'] = (df['low'] <= df['short_signal'].shift(1)) & (df['low'].shift(1) > df['short_signal'].shift(2))
+        
+        return df
+
+def simulate_trades(open_: np.ndarray, close: np.ndarray, long_entry: np.ndarray,
+                    short_entry: np.ndarray, initial_capital: float, position_size: float,
+                    long_fill: Optional[np.ndarray] = None, short_fill: Optional[np.ndarray] = None,
+                    close_at_end: bool = False):
+    """Stop-and-reverse simulation of entry signals over price arrays
+
+    Positions only change on bars with a signal, so the loop visits those
+    bars alone and the mark-to-market equity is filled in vectorized
+    afterwards. Fills happen at the bar open unless ``long_fill`` /
+    ``short_fill`` hold a (non-NaN) intrabar price. Returns the equity curve,
+    the position per bar (1 long, -1 short, 0 flat), the closed trades as
+    ``(entry_index, exit_index, direction, entry_price, exit_price, size,
+    pnl, pnl_pct, entry_intrabar, exit_intrabar)`` tuples and the traded
+    notional. With ``close_at_end`` a position still open after the last bar
+    is closed at its close and recorded; the equity curve already marks it
+    there, so only the trades and notional change.
+    """
+    n = len(close)
+    events = np.flatnonzero(long_entry[1:] | short_entry[1:]) + 1
+    
+    opens = open_[events].tolist()
+    longs = long_entry[events].tolist()
+    shorts = short_entry[events].tolist()
+    long_fills = long_fill[events].tolist() if long_fill is not None else [np.nan] * len(events)
+    short_fills = short_fill[events].tolist() if short_fill is not None else [np.nan] * len(events)
+    
+    # State after each event bar (row 0 is the flat starting state): capital, direction, entry price and size
+    event_capital = np.full(len(events) + 1, float(initial_capital))
+    event_direction = np.zeros(len(events) + 1, dtype=np.int64)
+    event_entry = np.zeros(len(events) + 1)
+    event_size = np.zeros(len(events) + 1)
+    
+    records = []
+    traded_notional = 0.0
+    capital = initial_capital
+    direction = 0
+    entry_i = entry_price = size = 0
+    entry_intrabar = False
+    
+    for k in range(len(events)):
+        i = events[k]
+        
+        # Close existing position on opposite signal
+        if (direction == 1 and shorts[k]) or (direction == -1 and longs[k]):
+            fill = short_fills[k] if direction == 1 else long_fills[k]
+            exit_intrabar = fill == fill
+            exit_price = fill if exit_intrabar else opens[k]
+            
+            if direction == 1:
+                pnl = (exit_price - entry_price) * size
+                pnl_pct = (exit_price - entry_price) / entry_price
+            else:
+                pnl = (entry_price - exit_price) * size
+                pnl_pct = (entry_price - exit_price) / entry_price
+            
+            capital += pnl
+            traded_notional += exit_price * size
+            records.append((entry_i, int(i), direction, entry_price, exit_price, size, pnl, pnl_pct,
+                            entry_intrabar, exit_intrabar))
+            direction = 0
+        
+        # Open new position
+        if direction == 0 and (longs[k] or shorts[k]):
+            direction = 1 if longs[k] else -1
+            fill = long_fills[k] if direction == 1 else short_fills[k]
+            entry_intrabar = fill == fill
+            entry_price = fill if entry_intrabar else opens[k]
+            entry_i = int(i)
+            size = capital * position_size / entry_price
+            traded_notional += entry_price * size
+        
+        event_capital[k + 1] = capital
+        event_direction[k + 1] = direction
+        event_entry[k + 1] = entry_price
+        event_size[k + 1] = size
+    
+    # Forward-fill the state of the last event at or before every bar
+    state = np.searchsorted(events, np.arange(n), side='right')
+    capital_at = event_capital[state]
+    direction_at = event_direction[state]
+    entry_at = event_entry[state]
+    size_at = event_size[state]
+    
+    unrealized = np.where(direction_at == 1, (close - entry_at) * size_at,
+                          np.where(direction_at == -1, (entry_at - close) * size_at, 0.0))
+    equity = np.where(direction_at != 0, capital_at + unrealized, capital_at)
+    
+    if close_at_end and direction != 0:
+        exit_price = float(close[-1])
+        pnl = float(unrealized[-1])
+        pnl_pct = (exit_price - entry_price) / entry_price * direction
+        traded_notional += exit_price * size
+        records.append((entry_i, n - 1, direction, entry_price, exit_price, size, pnl, pnl_pct,
+                        entry_intrabar, False))
+    
+    return equity, direction_at, records, traded_notional
+
+class Backtester:
+    FILL_MODES = ('open', 'intrabar')
+    
+    def __init__(self, initial_capital: float = 10000, position_size: float = 0.1,
+                 timeframe: Optional[str] = None, fill_mode: str = 'open'):
+        if fill_mode not in self.FILL_MODES:
+            raise ValueError(f"Unknown fill mode: {fill_mode}")
+        self.initial_capital = initial_capital
+        self.position_size = position_size
+        self.timeframe = timeframe
+        self.fill_mode = fill_mode
+        
+    def _periods_per_year(self, data: pd.DataFrame) -> float:
+        """Bars per year for annualization, inferred from the data if no timeframe is set"""
+        if self.timeframe is not None:
+            return periods_per_year(self.timeframe)
+        bar_seconds = infer_bar_seconds(data['datetime']) if 'datetime' in data else None
+        return periods_per_year(bar_seconds=bar_seconds) if bar_seconds else periods_per_year('1d')
+        
+    def run_backtest(self, data: pd.DataFrame, strategy: VoltyStrategy,
+                     intrabar_data: Optional[pd.DataFrame] = None,
+                     signals: Optional[pd.DataFrame] = None) -> BacktestResults:
+        """Run the backtest
+
+        With ``fill_mode='intrabar'`` and 1m candles in ``intrabar_data``, entries
+        and exits fill where the breakout level was first touched inside the
+        signal bar instead of at the bar open. ``signals`` can pass a frame
+        already produced by ``strategy.generate_signals(data)`` to skip
+        recomputing it.
+        """
+        df = signals if signals is not None else strategy.generate_signals(data)
+        if self.fill_mode == 'intrabar' and intrabar_data is not None and not intrabar_data.empty:
+            df = resolve_intrabar_fills(df, intrabar_data, self.timeframe)
+        
+        long_fill = df['long_fill_price'].to_numpy(dtype=np.float64) if 'long_fill_price' in df else None
+        short_fill = df['short_fill_price'].to_numpy(dtype=np.float64) if 'short_fill_price' in df else None
+        equity_curve, positions, records, traded_notional = simulate_trades(
+            df['open'].to_numpy(dtype=np.float64), df['close'].to_numpy(dtype=np.float64),
+            df['long_entry'].to_numpy(dtype=bool), df['short_entry'].to_numpy(dtype=bool),
+            self.initial_capital, self.position_size, long_fill, short_fill
+        )
+        
+        bar_times = df['datetime'].tolist()
+        fill_times = {
+            side: df[f'{side}_fill_time'].tolist() if f'{side}_fill_time' in df else None
+            for side in ('long', 'short')
+        }
+        
+        def fill_time(i: int, side: str, intrabar: bool):
+            return fill_times[side][i] if intrabar else bar_times[i]
+        
+        trades = []
+        for entry_i, exit_i, direction, entry_price, exit_price, size, pnl, pnl_pct, entry_intrabar, exit_intrabar in records:
+            entry_side, exit_side = ('long', 'short') if direction == 1 else ('short', 'long')
+            trades.append(Trade(
+                entry_time=fill_time(entry_i, entry_side, entry_intrabar),
+                exit_time=fill_time(exit_i, exit_side, exit_intrabar),
+                type='LONG' if direction == 1 else 'SHORT',
+                entry_price=entry_price,
+                exit_price=exit_price,
+                size=size,
+                pnl=pnl,
+                pnl_pct=pnl_pct
+            ))
+        
+        # Calculate performance metrics
+        results = self._calculate_metrics(
+            trades, equity_curve, positions, traded_notional, self._periods_per_year(df)
+        )
+        return results
+    
+    def _calculate_metrics(self, trades: List[Trade], equity_curve: List[float],
+                           positions: Optional[List[int]] = None, traded_notional: float = 0.0,
+                           periods: float = 365) -> BacktestResults:
+        """Calculate backtest performance metrics"""
+        if not trades:
+            return BacktestResults(
+                trades=[], total_return=0, win_rate=0, profit_factor=0,
+                max_drawdown=0, sharpe_ratio=0, total_trades=0, avg_trade=0,
+                max_win=0, max_loss=0
+            )
+        
+        equity = np.asarray(equity_curve, dtype=np.float64)
+        equity_metrics = calculate_equity_metrics(equity, periods, positions, traded_notional)
+        
+        winning_trades = [t for t in trades if t.pnl > 0]
+        losing_trades = [t for t in trades if t.pnl < 0]
+        
+        win_rate = len(winning_trades) / len(trades) if trades else 0
+        
+        gross_profit = sum(t.pnl for t in winning_trades)
+        gross_loss = abs(sum(t.pnl for t in losing_trades))
+        profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
+        
+        avg_trade = sum(t.pnl for t in trades) / len(trades)
+        max_win = max((t.pnl for t in trades), default=0)
+        max_loss = min((t.pnl for t in trades), default=0)
+        
+        return BacktestResults(
+            trades=trades,
+            total_return=equity_metrics['total_return'],
+            win_rate=win_rate,
+            profit_factor=profit_factor,
+            max_drawdown=equity_metrics['max_drawdown'],
+            sharpe_ratio=equity_metrics['sharpe_ratio'],
+            total_trades=len(trades),
+            avg_trade=avg_trade,
+            max_win=max_win,
+            max_loss=max_loss,
+            sortino_ratio=equity_metrics['sortino_ratio'],
+            calmar_ratio=equity_metrics['calmar_ratio'],
+            max_drawdown_duration=equity_metrics['max_drawdown_duration'],
+            exposure=equity_metrics['exposure'],
+            turnover=equity_metrics['turnover'],
+            equity_curve=equity
+        )
+
+
+def trades_to_frame(trades: List[Trade]) -> pd.DataFrame:
+    """Trade list as a DataFrame, one row per closed trade"""
+    columns = ['entry_time', 'exit_time', 'type', 'entry_price', 'exit_price', 'size', 'pnl', 'pnl_pct']
+    return pd.DataFrame([asdict(t) for t in trades], columns=columns)
+
+def results_summary(results: BacktestResults) -> Dict:
+    """JSON-serializable summary of a backtest without the trade list and equity curve"""
+    summary = {}
+    for result_field in fields(results):
+        if result_field.name in ('trades', 'equity_curve'):
+            continue
+        value = getattr(results, result_field.name)
+        value = value.item() if isinstance(value, np.generic) else value
+        # JSON has no infinity, e.g. the profit factor of a run without losses
+        summary[result_field.name] = None if isinstance(value, float) and not np.isfinite(value) else value
+    return summary
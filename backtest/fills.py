@@ -0,0 +1,99 @@
+"""
+Intrabar Fill Simulation
+Resolves higher-timeframe Volty signals against the underlying 1m candles
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+from metrics import infer_bar_seconds, timeframe_to_seconds
+
+
+def _first_touch(starts: np.ndarray, counts: np.ndarray, touched: np.ndarray) -> np.ndarray:
+    """Offset of the first True inside each segment of ``touched``, -1 if none
+
+    ``touched`` is the concatenation of all segments; ``starts``/``counts``
+    describe where each (non-empty) segment lives in it.
+    """
+    local = np.arange(len(touched)) - np.repeat(starts, counts)
+    sentinel = np.iinfo(np.int64).max
+    first = np.minimum.reduceat(np.where(touched, local, sentinel), starts)
+    return np.where(first == sentinel, -1, first)
+
+
+def _resolve_side(bar_start: np.ndarray, bar_end: np.ndarray, levels: np.ndarray,
+                  minute_times: np.ndarray, minute_open: np.ndarray,
+                  minute_extreme: np.ndarray, is_long: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Fill price and time of the first 1m candle reaching each signal level"""
+    prices = np.full(len(levels), np.nan)
+    times = np.full(len(levels), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    lo = np.searchsorted(minute_times, bar_start, side='left')
+    hi = np.searchsorted(minute_times, bar_end, side='left')
+    counts = hi - lo
+    valid = (counts > 0) & ~np.isnan(levels)
+    if not valid.any():
+        return prices, times
+
+    lo, counts, levels = lo[valid], counts[valid], levels[valid]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    minute_idx = np.repeat(lo - starts, counts) + np.arange(counts.sum())
+    segment_levels = np.repeat(levels, counts)
+
+    if is_long:
+        touched = minute_extreme[minute_idx] >= segment_levels
+    else:
+        touched = minute_extreme[minute_idx] <= segment_levels
+
+    first = _first_touch(starts, counts, touched)
+    hit = first >= 0
+    fill_idx = lo[hit] + first[hit]
+
+    # A candle that opens beyond the level fills at its open, not at the level
+    open_at_fill = minute_open[fill_idx]
+    fill_prices = np.maximum(levels[hit], open_at_fill) if is_long else np.minimum(levels[hit], open_at_fill)
+
+    target = np.flatnonzero(valid)[hit]
+    prices[target] = fill_prices
+    times[target] = minute_times[fill_idx]
+    return prices, times
+
+
+def resolve_intrabar_fills(signals: pd.DataFrame, intrabar: pd.DataFrame,
+                           timeframe: Optional[str] = None) -> pd.DataFrame:
+    """Attach intrabar fill prices and times to a signal frame
+
+    For every bar flagged with ``long_entry``/``short_entry`` the breakout level
+    of the previous bar (``long_signal``/``short_signal``) is located in the 1m
+    candles of that bar with sorted-index lookups. Bars whose level is never
+    touched in the 1m data keep NaN fills, which the backtester treats as a
+    fill at the bar open.
+    """
+    df = signals.copy()
+    bar_times = df['datetime'].values.astype('datetime64[ns]')
+
+    if timeframe is not None:
+        bar_ns = np.timedelta64(timeframe_to_seconds(timeframe), 's').astype('timedelta64[ns]')
+    else:
+        bar_ns = np.timedelta64(int(infer_bar_seconds(bar_times) * 1e9), 'ns')
+
+    minutes = intrabar.sort_values('datetime')
+    minute_times = minutes['datetime'].values.astype('datetime64[ns]')
+    minute_open = minutes['open'].to_numpy(dtype=np.float64)
+
+    bar_end = bar_times + bar_ns
+    bar_end[:-1] = np.minimum(bar_end[:-1], bar_times[1:])
+
+    for side, is_long, extreme in (('long', True, 'high'), ('short', False, 'low')):
+        flagged = df[f'{side}_entry'].to_numpy(dtype=bool)
+        levels = df[f'{side}_signal'].shift(1).to_numpy(dtype=np.float64)
+        levels = np.where(flagged, levels, np.nan)
+
+        prices, times = _resolve_side(
+            bar_times, bar_end, levels, minute_times, minute_open,
+            minutes[extreme].to_numpy(dtype=np.float64), is_long
+        )
+        df[f'{side}_fill_price'] = prices
+        df[f'{side}_fill_time'] = pd.to_datetime(times)
+
+    return df
@@ -0,0 +1,191 @@
+"""
+Backtest Performance Metrics
+Vectorized equity-curve statistics with timeframe-aware annualization
+"""
+
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+# Crypto markets trade around the clock, so a year is 365 full days
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '3m': 3 * 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '30m': 30 * 60,
+    '1h': 60 * 60,
+    '2h': 2 * 60 * 60,
+    '4h': 4 * 60 * 60,
+    '6h': 6 * 60 * 60,
+    '12h': 12 * 60 * 60,
+    '1d': 24 * 60 * 60,
+    '3d': 3 * 24 * 60 * 60,
+    '1w': 7 * 24 * 60 * 60
+}
+
+
+def timeframe_to_seconds(timeframe: str) -> int:
+    """Bar length in seconds for a Binance-style interval string"""
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    return TIMEFRAME_SECONDS[timeframe]
+
+
+def infer_bar_seconds(datetimes) -> Optional[float]:
+    """Median spacing of a datetime column in seconds"""
+    values = np.asarray(datetimes, dtype='datetime64[ns]').astype(np.int64)
+    if len(values) < 2:
+        return None
+    return float(np.median(np.diff(values))) / 1e9
+
+
+def periods_per_year(timeframe: Optional[str] = None, bar_seconds: Optional[float] = None) -> float:
+    """Number of bars in a year for a timeframe or an explicit bar length"""
+    if timeframe is not None:
+        bar_seconds = timeframe_to_seconds(timeframe)
+    if not bar_seconds:
+        raise ValueError("Either timeframe or bar_seconds is required")
+    return SECONDS_PER_YEAR / bar_seconds
+
+
+def returns_from_equity(equity: np.ndarray) -> np.ndarray:
+    """Simple per-bar returns of an equity curve"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return np.diff(equity) / equity[:-1]
+
+
+def drawdown_series(equity: np.ndarray) -> np.ndarray:
+    """Fractional drawdown from the running peak at every bar (0 at new highs)"""
+    equity = np.asarray(equity, dtype=np.float64)
+    peaks = np.maximum.accumulate(equity)
+    return (peaks - equity) / peaks
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Largest fractional drawdown of an equity curve"""
+    if len(equity) == 0:
+        return 0.0
+    return float(drawdown_series(equity).max())
+
+
+def max_drawdown_duration(equity: np.ndarray) -> int:
+    """Longest stretch, in bars, spent below a previous equity peak"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return 0
+    bars = np.arange(len(equity))
+    at_peak = equity >= np.maximum.accumulate(equity)
+    last_peak = np.maximum.accumulate(np.where(at_peak, bars, 0))
+    return int((bars - last_peak).max())
+
+
+def sharpe_ratio(returns: np.ndarray, periods: float) -> float:
+    """Annualized Sharpe ratio of per-bar returns (zero risk-free rate)"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return 0.0
+    std = returns.std()
+    return float(returns.mean() / std * np.sqrt(periods)) if std > 0 else 0.0
+
+
+def sortino_ratio(returns: np.ndarray, periods: float) -> float:
+    """Annualized Sortino ratio using downside deviation below zero"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+    return float(returns.mean() / downside * np.sqrt(periods)) if downside > 0 else 0.0
+
+
+def annualized_return(equity: np.ndarray, periods: float) -> float:
+    """Compound annual growth rate of an equity curve"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) < 2 or equity[0] <= 0 or equity[-1] <= 0:
+        return 0.0
+    years = (len(equity) - 1) / periods
+    return float((equity[-1] / equity[0]) ** (1 / years) - 1)
+
+
+def calmar_ratio(equity: np.ndarray, periods: float) -> float:
+    """Annualized return divided by maximum drawdown"""
+    max_dd = max_drawdown(equity)
+    return annualized_return(equity, periods) / max_dd if max_dd > 0 else 0.0
+
+
+def exposure(positions: np.ndarray) -> float:
+    """Fraction of bars with an open position"""
+    positions = np.asarray(positions)
+    return float(np.count_nonzero(positions) / len(positions)) if len(positions) else 0.0
+
+
+def turnover(traded_notional: float, equity: np.ndarray) -> float:
+    """Total traded notional as a multiple of average equity"""
+    mean_equity = float(np.mean(equity)) if len(equity) else 0.0
+    return traded_notional / mean_equity if mean_equity > 0 else 0.0
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over a trailing window, NaN until the window is full"""
+    out = np.full(len(values), np.nan)
+    if window <= len(values):
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        out[window - 1:] = sums[window:] - sums[:-window]
+    return out
+
+
+def _constant_windows(values: np.ndarray, window: int) -> np.ndarray:
+    """Whether each trailing window holds one repeated value (False until the window is full)"""
+    out = np.zeros(len(values), dtype=bool)
+    if window <= len(values):
+        changes = np.concatenate(([0], np.cumsum(values[1:] != values[:-1])))
+        out[window - 1:] = changes[window - 1:] == changes[:len(values) - window + 1]
+    return out
+
+
+def rolling_sharpe(returns: np.ndarray, window: int, periods: float) -> np.ndarray:
+    """Annualized Sharpe ratio over a trailing window of bars, NaN until the window is full
+
+    Windows of one repeated return have no volatility and score 0, like
+    ``sharpe_ratio``; they are detected exactly rather than from the
+    rounding noise of the cumulative sums.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    mean = _rolling_sum(returns, window) / window
+    var = _rolling_sum(returns ** 2, window) / window - mean ** 2
+    std = np.sqrt(np.maximum(var, 0.0))
+    std[_constant_windows(returns, window)] = 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods), 0.0)
+    sharpe[np.isnan(mean)] = np.nan
+    return sharpe
+
+
+def rolling_return(equity: np.ndarray, window: int) -> np.ndarray:
+    """Return over a trailing window of bars"""
+    equity = np.asarray(equity, dtype=np.float64)
+    out = np.full(len(equity), np.nan)
+    if window < len(equity):
+        out[window:] = equity[window:] / equity[:-window] - 1
+    return out
+
+
+def calculate_equity_metrics(equity: Sequence[float], periods: float,
+                             positions: Optional[Sequence[int]] = None,
+                             traded_notional: float = 0.0) -> Dict:
+    """All equity-curve statistics of a backtest"""
+    equity = np.asarray(equity, dtype=np.float64)
+    returns = returns_from_equity(equity) if len(equity) > 1 else np.empty(0)
+
+    return {
+        "total_return": float(equity[-1] / equity[0] - 1) if len(equity) else 0.0,
+        "annualized_return": annualized_return(equity, periods),
+        "max_drawdown": max_drawdown(equity),
+        "max_drawdown_duration": max_drawdown_duration(equity),
+        "sharpe_ratio": sharpe_ratio(returns, periods),
+        "sortino_ratio": sortino_ratio(returns, periods),
+        "calmar_ratio": calmar_ratio(equity, periods),
+        "exposure": exposure(positions) if positions is not None else 0.0,
+        "turnover": turnover(traded_notional, equity)
+    }
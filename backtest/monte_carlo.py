@@ -0,0 +1,109 @@
+"""
+Monte Carlo Robustness Analysis
+Resamples backtest trade sequences to estimate return and drawdown distributions
+"""
+
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+METHODS = ('shuffle', 'bootstrap')
+
+
+@dataclass
+class MonteCarloResults:
+    method: str
+    n_paths: int
+    n_trades: int
+    final_returns: np.ndarray
+    max_drawdowns: np.ndarray
+    risk_of_ruin: float
+    return_percentiles: Dict[int, float]
+    drawdown_percentiles: Dict[int, float]
+    equity_bands: Dict[int, np.ndarray] = field(default_factory=dict)
+
+
+def trade_returns(trades: Sequence, initial_capital: float) -> np.ndarray:
+    """Each trade's P&L as a fraction of the capital held when it was opened"""
+    pnl = np.array([t.pnl for t in trades], dtype=np.float64)
+    capital_before = initial_capital + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+    return pnl / capital_before
+
+
+def simulate_paths(returns: np.ndarray, n_paths: int, method: str = 'shuffle',
+                   skip_probability: float = 0.0,
+                   rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Synthetic equity multiples, shape (n_paths, n_trades), starting from 1.0
+
+    ``shuffle`` reorders the trades, ``bootstrap`` draws them with replacement,
+    and ``skip_probability`` additionally drops each trade independently, as if
+    the signal had been missed.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    rng = rng or np.random.default_rng()
+    n_trades = len(returns)
+
+    if method == 'shuffle':
+        paths = rng.permuted(np.broadcast_to(returns, (n_paths, n_trades)), axis=1)
+    else:
+        paths = returns[rng.integers(0, n_trades, size=(n_paths, n_trades))]
+
+    if skip_probability > 0:
+        paths[rng.random((n_paths, n_trades)) < skip_probability] = 0.0
+
+    paths += 1.0
+    np.cumprod(paths, axis=1, out=paths)
+    return paths
+
+
+def path_max_drawdowns(paths: np.ndarray) -> np.ndarray:
+    """Maximum fractional drawdown of every path, counting the starting capital as a peak"""
+    peaks = np.maximum.accumulate(paths, axis=1)
+    np.maximum(peaks, 1.0, out=peaks)
+    np.divide(paths, peaks, out=peaks)
+    return 1.0 - peaks.min(axis=1)
+
+
+def run_monte_carlo(trades: List, initial_capital: float, n_paths: int = 10000,
+                    method: str = 'shuffle', skip_probability: float = 0.0,
+                    ruin_threshold: float = 0.5,
+                    percentiles: Sequence[int] = DEFAULT_PERCENTILES,
+                    equity_bands: bool = False,
+                    seed: Optional[int] = None) -> MonteCarloResults:
+    """Run a Monte Carlo analysis over a backtest's trade list
+
+    Risk of ruin is the fraction of paths whose equity falls to
+    ``1 - ruin_threshold`` of the starting capital at any point.
+    """
+    returns = trade_returns(trades, initial_capital)
+    if len(returns) == 0:
+        empty = np.zeros(0)
+        zeros = {p: 0.0 for p in percentiles}
+        return MonteCarloResults(method, 0, 0, empty, empty, 0.0, zeros, dict(zeros))
+
+    paths = simulate_paths(returns, n_paths, method, skip_probability, np.random.default_rng(seed))
+
+    final_returns = paths[:, -1] - 1.0
+    max_drawdowns = path_max_drawdowns(paths)
+    risk_of_ruin = float(np.mean(paths.min(axis=1) <= 1.0 - ruin_threshold))
+
+    return_values = np.percentile(final_returns, percentiles)
+    drawdown_values = np.percentile(max_drawdowns, percentiles)
+    bands = {}
+    if equity_bands:
+        band_values = np.percentile(paths, percentiles, axis=0) * initial_capital
+        bands = {p: values for p, values in zip(percentiles, band_values)}
+
+    return MonteCarloResults(
+        method=method,
+        n_paths=n_paths,
+        n_trades=len(returns),
+        final_returns=final_returns,
+        max_drawdowns=max_drawdowns,
+        risk_of_ruin=risk_of_ruin,
+        return_percentiles={p: float(v) for p, v in zip(percentiles, return_values)},
+        drawdown_percentiles={p: float(v) for p, v in zip(percentiles, drawdown_values)},
+        equity_bands=bands
+    )
@@ -0,0 +1,15 @@
+// Replays the live BollingerBandsVolumeStrategy candle by candle, as the live bot calls it.
+// Usage: node replay_strategy.mjs <input.json>  ({prices, volumes, params} -> [[bar, type, confidence], ...])
+import fs from 'fs';
+import { BollingerBandsVolumeStrategy } from '../../live/js/trading-strategies.js';
+
+const { prices, volumes, params } = JSON.parse(fs.readFileSync(process.argv[2]));
+const strategy = new BollingerBandsVolumeStrategy();
+strategy.setParameters(params);
+
+const signals = [];
+for (let i = 1; i <= prices.length; i++) {
+  const signal = strategy.generateSignal(prices.slice(0, i), volumes.slice(0, i));
+  if (signal) signals.push([i - 1, signal.type, signal.confidence]);
+}
+console.log(JSON.stringify(signals));
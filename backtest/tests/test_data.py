@@ -0,0 +1,100 @@
+"""KlineFetcher against a local stub of the Binance klines endpoint"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from data import KlineFetcher
+
+INTERVAL_MS = 60_000
+
+
+def kline(open_ms: int) -> list:
+    price = str(100 + open_ms // INTERVAL_MS % 50)
+    return [open_ms, price, price, price, price, '1.0', open_ms + INTERVAL_MS - 1, '0', 1, '0', '0', '0']
+
+
+class StubKlines(BaseHTTPRequestHandler):
+    """Serves 1m klines for the requested range, misbehaving first as the server's script says"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            action = server.script.pop(0) if server.script else 'ok'
+
+        if action == 'drop':
+            # Close the connection without answering
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if action == 'stall':
+            server.release.wait(5)
+            return
+        if action == 'busy':
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+
+        query = {k: int(v[0]) for k, v in parse_qs(urlparse(self.path).query).items()
+                 if k in ('startTime', 'endTime', 'limit')}
+        start, end = query['startTime'], query['endTime']
+        rows = [kline(t) for t in range(start, end + 1, INTERVAL_MS)][:query['limit']]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubKlines)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.release = threading.Event()
+    server.script = []
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def fetcher(server, **kwargs) -> KlineFetcher:
+    url = f'http://127.0.0.1:{server.server_address[1]}/api/v3/klines'
+    return KlineFetcher(base_url=url, backoff=0.01, timeout=0.5, **kwargs)
+
+
+def test_fetch_range_stitches_pages(stub):
+    df = fetcher(stub, page_size=100).fetch_range('BTCUSDT', '1m', 0, 249 * INTERVAL_MS)
+    assert len(df) == 250
+    assert df['datetime'].is_monotonic_increasing and df['datetime'].is_unique
+    assert stub.requests == 3
+
+
+def test_get_page_retries_dropped_connections_timeouts_and_rate_limits(stub):
+    stub.script = ['drop', 'stall', 'busy']
+    rows = fetcher(stub).get_page({'symbol': 'BTCUSDT', 'interval': '1m', 'startTime': 0,
+                                   'endTime': 9 * INTERVAL_MS, 'limit': 10})
+    assert len(rows) == 10
+    assert stub.requests == 4
+
+
+def test_get_page_raises_once_retries_are_exhausted(stub):
+    stub.script = ['drop'] * 3
+    with pytest.raises(requests.ConnectionError):
+        fetcher(stub, max_retries=2).get_page({'symbol': 'BTCUSDT', 'interval': '1m', 'startTime': 0,
+                                                'endTime': 0, 'limit': 1})
+    assert stub.requests == 3
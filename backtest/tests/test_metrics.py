@@ -0,0 +1,50 @@
+"""Rolling metrics against pandas rolling windows"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import rolling_return, rolling_sharpe
+
+PERIODS = 365 * 24
+
+
+def pandas_sharpe(returns: np.ndarray, window: int) -> np.ndarray:
+    rolling = pd.Series(returns).rolling(window)
+    mean, std = rolling.mean(), rolling.std(ddof=0)
+    return np.where(std > 0, mean / std * np.sqrt(PERIODS), 0.0) + np.where(std.isna(), np.nan, 0.0)
+
+
+@pytest.fixture(scope='module')
+def equity() -> np.ndarray:
+    rng = np.random.default_rng(7)
+    return 1000 * np.cumprod(1 + rng.normal(0.0002, 0.01, 5000))
+
+
+@pytest.mark.parametrize('window', [1, 2, 20, 500])
+def test_rolling_sharpe_matches_pandas(equity, window):
+    returns = np.diff(equity) / equity[:-1]
+    np.testing.assert_allclose(rolling_sharpe(returns, window, PERIODS), pandas_sharpe(returns, window),
+                               rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize('window', [1, 20, 500])
+def test_rolling_return_matches_pandas(equity, window):
+    expected = pd.Series(equity).pct_change(window, fill_method=None).to_numpy()
+    np.testing.assert_allclose(rolling_return(equity, window), expected, rtol=1e-12)
+
+
+def test_window_longer_than_series():
+    returns = np.array([0.01, -0.02, 0.03])
+    assert np.isnan(rolling_sharpe(returns, 5, PERIODS)).all()
+    assert np.isnan(rolling_return(np.array([100.0, 101.0, 99.0]), 3)).all()
+    np.testing.assert_array_equal(rolling_sharpe(returns, 5, PERIODS), pandas_sharpe(returns, 5))
+
+
+def test_zero_variance_window_scores_zero():
+    # A constant return that cumulative sums do not represent exactly
+    returns = np.r_[np.full(30, 0.001), 0.05, np.full(30, 0.001)]
+    sharpe = rolling_sharpe(returns, 10, PERIODS)
+    np.testing.assert_allclose(sharpe, pandas_sharpe(returns, 10), rtol=1e-9)
+    assert (sharpe[9:30] == 0).all() and (sharpe[40:] == 0).all()
+    assert (sharpe[30:40] != 0).all()
@@ -0,0 +1,74 @@
+"""Parity of the vectorized strategies with the live JS implementations"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pandas as pd
+import pytest
+
+from engine import Backtester
+from strategies import STRATEGIES, create_strategy, strategy_grid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CANDLES = os.path.join(HERE, 'data', 'bollinger_volume_candles.csv')
+EXPECTED = os.path.join(HERE, 'data', 'bollinger_volume_expected.json')
+JS_PARAMS = {'bbLength': 'bb_length', 'bbDeviation': 'bb_deviation', 'volumeIncrease': 'volume_increase'}
+
+with open(EXPECTED) as f:
+    CASES = json.load(f)['cases']
+
+
+@pytest.fixture(scope='module')
+def candles() -> pd.DataFrame:
+    return pd.read_csv(CANDLES, parse_dates=['datetime'])
+
+
+def python_signals(candles: pd.DataFrame, js_params: dict) -> list:
+    params = {JS_PARAMS[name]: value for name, value in js_params.items()}
+    df = create_strategy('bollinger_bands_volume', **params).generate_signals(candles)
+    setups = df[df['long_setup'] | df['short_setup']]
+    return [[int(i), 'LONG' if row.long_setup else 'SHORT', int(row.confidence)] for i, row in setups.iterrows()]
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: json.dumps(case['params']))
+def test_bollinger_volume_matches_recorded_js_signals(candles, case):
+    assert python_signals(candles, case['params']) == case['signals']
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: json.dumps(case['params']))
+def test_bollinger_volume_enters_on_the_next_candle(candles, case):
+    params = {JS_PARAMS[name]: value for name, value in case['params'].items()}
+    df = create_strategy('bollinger_bands_volume', **params).generate_signals(candles)
+    longs = [bar + 1 for bar, side, _ in case['signals'] if side == 'LONG' and bar + 1 < len(df)]
+    shorts = [bar + 1 for bar, side, _ in case['signals'] if side == 'SHORT' and bar + 1 < len(df)]
+    assert list(df.index[df['long_entry']]) == longs
+    assert list(df.index[df['short_entry']]) == shorts
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="node is not installed")
+@pytest.mark.parametrize('case', CASES, ids=lambda case: json.dumps(case['params']))
+def test_bollinger_volume_matches_live_js(candles, case, tmp_path):
+    payload = tmp_path / 'input.json'
+    payload.write_text(json.dumps({
+        'prices': candles['close'].tolist(), 'volumes': candles['volume'].tolist(), 'params': case['params']
+    }))
+    output = subprocess.check_output(['node', os.path.join(HERE, 'replay_strategy.mjs'), str(payload)])
+    assert python_signals(candles, case['params']) == json.loads(output)
+
+
+def test_bollinger_volume_keeps_level_columns_free(candles):
+    df = create_strategy('bollinger_bands_volume').generate_signals(candles)
+    assert 'long_signal' not in df and 'short_signal' not in df
+
+
+def test_registry_strategies_run_in_the_backtester(candles):
+    for name in STRATEGIES:
+        results = Backtester(timeframe='1h').run_backtest(candles, create_strategy(name))
+        assert len(results.equity_curve) == len(candles)
+
+
+def test_strategy_grid_builds_every_combination():
+    grid = strategy_grid('bollinger_bands_volume', {'bb_length': [10, 20], 'bb_deviation': [1, 2, 3]})
+    assert sorted((s.bb_length, s.bb_deviation) for s in grid) == [(l, d) for l in (10, 20) for d in (1, 2, 3)]
@@ -0,0 +1,45 @@
+"""Consistency of the stitched walk-forward run"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import simulate_trades
+from walk_forward import walk_forward
+
+CANDLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'bollinger_volume_candles.csv')
+
+
+@pytest.fixture(scope='module')
+def candles() -> pd.DataFrame:
+    return pd.read_csv(CANDLES, parse_dates=['datetime'])
+
+
+def test_simulate_trades_closes_open_position_at_end():
+    open_ = np.array([10.0, 10.0, 11.0, 12.0])
+    close = np.array([10.0, 11.0, 12.0, 13.0])
+    long_entry = np.array([False, True, False, False])
+    short_entry = np.zeros(4, dtype=bool)
+
+    equity, _, records, notional = simulate_trades(open_, close, long_entry, short_entry, 100.0, 0.5)
+    assert records == []
+
+    closed, _, records, closed_notional = simulate_trades(open_, close, long_entry, short_entry, 100.0, 0.5,
+                                                          close_at_end=True)
+    np.testing.assert_array_equal(closed, equity)
+    (entry_i, exit_i, direction, entry_price, exit_price, size, pnl, _, _, _), = records
+    assert (entry_i, exit_i, direction, entry_price, exit_price) == (1, 3, 1, 10.0, 13.0)
+    assert pnl == pytest.approx(equity[-1] - 100.0)
+    assert closed_notional == pytest.approx(notional + exit_price * size)
+
+
+def test_walk_forward_trades_add_up_to_equity(candles):
+    results = walk_forward(candles, lengths=(3, 5), atr_mults=(0.5, 1.0), train_bars=100, test_bars=50,
+                           initial_capital=1000, max_workers=1)
+    assert results.windows
+    assert sum(trade.pnl for trade in results.trades) == pytest.approx(results.equity_curve[-1] - 1000)
+    assert all(trade.exit_time <= window.test_end
+               for window in results.windows for trade in results.trades
+               if window.test_start <= trade.entry_time <= window.test_end)
@@ -0,0 +1,283 @@
+"""
+Walk-Forward Optimization
+Out-of-sample validation of Volty parameters over rolling train/test windows
+"""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from engine import Trade, simulate_trades
+from metrics import (
+    calculate_equity_metrics, calmar_ratio, infer_bar_seconds,
+    periods_per_year, returns_from_equity, sharpe_ratio, sortino_ratio
+)
+
+SCORES = ('sharpe', 'sortino', 'calmar', 'total_return')
+
+
+@dataclass
+class WalkForwardWindow:
+    train_start: pd.Timestamp
+    train_end: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+    length: int
+    atr_mult: float
+    train_score: float
+    test_return: float
+    test_trades: int
+    evaluations: int
+
+
+@dataclass
+class WalkForwardResults:
+    windows: List[WalkForwardWindow]
+    trades: List[Trade]
+    datetime: np.ndarray
+    equity_curve: np.ndarray
+    metrics: Dict = field(default_factory=dict)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range per bar, NaN on the first bar like ``VoltyStrategy.calculate_atr``"""
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr_table(data: pd.DataFrame, lengths: Sequence[int]) -> Dict[int, np.ndarray]:
+    """ATR over the full history for every candidate length, computed once"""
+    tr = pd.Series(true_range(
+        data['high'].to_numpy(dtype=np.float64),
+        data['low'].to_numpy(dtype=np.float64),
+        data['close'].to_numpy(dtype=np.float64)
+    ))
+    return {int(length): tr.rolling(window=int(length)).mean().to_numpy() for length in lengths}
+
+
+def volty_entries(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                  atr: np.ndarray, atr_mult: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Long and short entry flags, identical to ``VoltyStrategy.generate_signals``"""
+    atrs = atr * atr_mult
+    long_signal = close + atrs
+    short_signal = close - atrs
+
+    long_entry = np.zeros(len(close), dtype=bool)
+    short_entry = np.zeros(len(close), dtype=bool)
+    long_entry[2:] = (high[2:] >= long_signal[1:-1]) & (high[1:-1] < long_signal[:-2])
+    short_entry[2:] = (low[2:] <= short_signal[1:-1]) & (low[1:-1] > short_signal[:-2])
+    return long_entry, short_entry
+
+
+def score_equity(equity: np.ndarray, periods: float, score: str = 'sharpe') -> float:
+    """Objective maximized on the train windows"""
+    if score == 'total_return':
+        return float(equity[-1] / equity[0] - 1)
+    if score == 'calmar':
+        return calmar_ratio(equity, periods)
+    returns = returns_from_equity(equity)
+    if score == 'sortino':
+        return sortino_ratio(returns, periods)
+    return sharpe_ratio(returns, periods)
+
+
+def rung_budgets(train_bars: int, min_bars: int, eta: int) -> List[int]:
+    """Train bars per successive-halving rung, growing by ``eta`` up to the full window"""
+    budgets = [train_bars]
+    while budgets[-1] // eta >= min_bars:
+        budgets.append(budgets[-1] // eta)
+    return budgets[::-1]
+
+
+# Per-process arrays, set once by _init_worker so windows never re-send them
+_shared: Dict = {}
+
+
+def _init_worker(arrays: Dict[str, np.ndarray], atrs: Dict[int, np.ndarray], settings: Dict):
+    _shared.clear()
+    _shared.update(arrays)
+    _shared['atrs'] = atrs
+    _shared['settings'] = settings
+    _shared['entries'] = {}
+
+
+def _entries(length: int, atr_mult: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Full-history entry flags of one configuration, memoized per process"""
+    key = (length, atr_mult)
+    if key not in _shared['entries']:
+        _shared['entries'][key] = volty_entries(
+            _shared['high'], _shared['low'], _shared['close'], _shared['atrs'][length], atr_mult
+        )
+    return _shared['entries'][key]
+
+
+def _simulate(config: Tuple[int, float], start: int, end: int, initial_capital: float,
+              close_at_end: bool = False):
+    long_entry, short_entry = _entries(*config)
+    return simulate_trades(
+        _shared['open'][start:end], _shared['close'][start:end],
+        long_entry[start:end], short_entry[start:end],
+        initial_capital, _shared['settings']['position_size'], close_at_end=close_at_end
+    )
+
+
+def _optimize_window(window: Tuple[int, int, int]) -> Dict:
+    """Successive halving over the configs on one train window, then its test run"""
+    train_start, train_end, test_end = window
+    settings = _shared['settings']
+    eta = settings['eta']
+
+    candidates = list(settings['configs'])
+    evaluations = 0
+    scores: Dict[Tuple[int, float], float] = {}
+    for budget in rung_budgets(train_end - train_start, settings['min_train_bars'], eta):
+        # Each rung scores the survivors on the most recent ``budget`` train bars
+        for config in candidates:
+            equity = _simulate(config, train_end - budget, train_end, 1.0)[0]
+            score = score_equity(equity, settings['periods'], settings['score'])
+            scores[config] = score if np.isfinite(score) else -np.inf
+            evaluations += 1
+        candidates.sort(key=lambda c: scores[c], reverse=True)
+        candidates = candidates[:max(1, -(-len(candidates) // eta))]
+
+    best = candidates[0]
+    # Windows start flat, so a position open at the end of the test is closed on its last bar
+    equity, positions, records, notional = _simulate(best, train_end, test_end, 1.0, close_at_end=True)
+    return {
+        'window': window,
+        'config': best,
+        'train_score': scores[best],
+        'evaluations': evaluations,
+        'equity': equity,
+        'positions': positions,
+        'records': records,
+        'notional': notional
+    }
+
+
+def walk_forward(data: pd.DataFrame, lengths: Sequence[int] = (3, 5, 8, 13, 21),
+                 atr_mults: Sequence[float] = (0.5, 0.75, 1.0, 1.5, 2.0),
+                 train_bars: int = 2000, test_bars: int = 500,
+                 score: str = 'sharpe', eta: int = 3, min_train_bars: Optional[int] = None,
+                 initial_capital: float = 10000, position_size: float = 0.1,
+                 timeframe: Optional[str] = None,
+                 max_workers: Optional[int] = None) -> WalkForwardResults:
+    """Walk-forward optimization of ``length``/``atr_mult``
+
+    History is cut into consecutive test windows of ``test_bars``, each
+    preceded by ``train_bars`` of training data. On every train window the
+    (length, atr_mult) grid is searched with successive halving: all configs
+    are scored on the most recent slice of the window, the best ``1/eta``
+    advance to a slice ``eta`` times longer, until the survivors are scored on
+    the whole window. The winner is traded on the following test window, and
+    the out-of-sample test equity is chained into one curve, each window
+    starting flat with the capital the previous one ended with. A position
+    still open at the end of a test window is closed at that window's last
+    close and recorded as a trade.
+
+    ATR for every length is computed once over the full history and shared
+    with the worker processes, which optimize windows in parallel.
+    """
+    if score not in SCORES:
+        raise ValueError(f"Unknown score: {score}")
+    n = len(data)
+    if n < train_bars + test_bars:
+        raise ValueError(f"Need at least {train_bars + test_bars} candles, got {n}")
+
+    if timeframe is not None:
+        periods = periods_per_year(timeframe)
+    else:
+        periods = periods_per_year(bar_seconds=infer_bar_seconds(data['datetime']))
+
+    arrays = {col: data[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close')}
+    atrs = atr_table(data, lengths)
+    settings = {
+        'configs': [(int(length), float(mult)) for length in lengths for mult in atr_mults],
+        'position_size': position_size,
+        'periods': periods,
+        'score': score,
+        'eta': eta,
+        'min_train_bars': min_train_bars or max(train_bars // 9, 2 * max(lengths) + 2)
+    }
+
+    windows = [
+        (test_start - train_bars, test_start, min(test_start + test_bars, n))
+        for test_start in range(train_bars, n - 1, test_bars)
+        if min(test_start + test_bars, n) - test_start > 1
+    ]
+
+    if max_workers == 1:
+        _init_worker(arrays, atrs, settings)
+        outcomes = [_optimize_window(w) for w in windows]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(arrays, atrs, settings)) as executor:
+            outcomes = list(executor.map(_optimize_window, windows))
+
+    return _stitch(data, outcomes, initial_capital, position_size, periods)
+
+
+def _stitch(data: pd.DataFrame, outcomes: List[Dict], initial_capital: float,
+            position_size: float, periods: float) -> WalkForwardResults:
+    """Chain the test windows' equity and trades into one out-of-sample run"""
+    times = data['datetime'].to_numpy()
+    open_times = data['datetime'].tolist()
+
+    capital = float(initial_capital)
+    equity_parts, position_parts, trades, summaries = [], [], [], []
+    traded_notional = 0.0
+    for outcome in outcomes:
+        train_start, test_start, test_end = outcome['window']
+        length, atr_mult = outcome['config']
+        window_equity = outcome['equity'] * capital
+
+        for entry_i, exit_i, direction, entry_price, exit_price, size, pnl, pnl_pct, _, _ in outcome['records']:
+            trades.append(Trade(
+                entry_time=open_times[test_start + entry_i],
+                exit_time=open_times[test_start + exit_i],
+                type='LONG' if direction == 1 else 'SHORT',
+                entry_price=entry_price,
+                exit_price=exit_price,
+                size=size * capital,
+                pnl=pnl * capital,
+                pnl_pct=pnl_pct
+            ))
+
+        summaries.append(WalkForwardWindow(
+            train_start=open_times[train_start],
+            train_end=open_times[test_start - 1],
+            test_start=open_times[test_start],
+            test_end=open_times[test_end - 1],
+            length=length,
+            atr_mult=atr_mult,
+            train_score=outcome['train_score'],
+            test_return=float(outcome['equity'][-1] - 1.0),
+            test_trades=len(outcome['records']),
+            evaluations=outcome['evaluations']
+        ))
+
+        equity_parts.append(window_equity)
+        position_parts.append(outcome['positions'])
+        traded_notional += outcome['notional'] * capital
+        capital = float(window_equity[-1])
+
+    first = outcomes[0]['window'][1] if outcomes else 0
+    last = outcomes[-1]['window'][2] if outcomes else 0
+    equity = np.concatenate(equity_parts) if equity_parts else np.array([float(initial_capital)])
+    positions = np.concatenate(position_parts) if position_parts else np.zeros(1, dtype=np.int64)
+
+    return WalkForwardResults(
+        windows=summaries,
+        trades=trades,
+        datetime=times[first:last],
+        equity_curve=equity,
+        metrics=calculate_equity_metrics(equity, periods, positions, traded_notional)
+    )
+
+
+def windows_to_frame(results: WalkForwardResults) -> pd.DataFrame:
+    """Per-window parameters and scores as a DataFrame"""
+    columns = ['train_start', 'train_end', 'test_start', 'test_end', 'length', 'atr_mult',
+               'train_score', 'test_return', 'test_trades', 'evaluations']
+    return pd.DataFrame([vars(w) for w in results.windows], columns=columns)
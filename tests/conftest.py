@@ -0,0 +1,16 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# The ai_* modules live at the repository root and import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The global stores pick their paths up at import; keep test runs out of the working tree
+_runtime_dir = tempfile.mkdtemp(prefix='ai-tests-')
+atexit.register(shutil.rmtree, _runtime_dir, ignore_errors=True)
+os.environ.setdefault('AI_SESSION_DB', os.path.join(_runtime_dir, 'trading_sessions.db'))
+os.environ.setdefault('AI_FEATURE_STORE', os.path.join(_runtime_dir, 'feature_store'))
+os.environ.setdefault('AI_PROFILE_DIR', os.path.join(_runtime_dir, 'profiles'))
+os.environ.setdefault('AI_MODEL_SPILL_DIR', os.path.join(_runtime_dir, 'spill'))
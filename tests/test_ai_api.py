@@ -0,0 +1,80 @@
+"""API endpoints and the helpers behind them"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ai_api
+from ai_candle_buffer import CandleBuffer
+
+
+def candles(n: int, start: str = '2024-01-01', seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    times = pd.date_range(start, periods=n, freq='h')
+    return [{'timestamp': int(t.value // 1_000_000), 'open': c, 'high': c * 1.01, 'low': c * 0.99,
+             'close': c, 'volume': 10.0} for t, c in zip(times, close)]
+
+
+@pytest.fixture
+def client():
+    ai_api.app.config['TESTING'] = True
+    with ai_api.app.test_client() as client:
+        yield client
+
+
+def test_buffered_market_data_pairs_frame_and_features_from_one_version(monkeypatch):
+    buffer = CandleBuffer()
+    buffer.append(candles(200))
+    monkeypatch.setattr(ai_api.candle_store, 'get', lambda symbol, timeframe: buffer)
+
+    # An upload of ten more candles lands right after the first cache lookup
+    uploads = [candles(210)[200:]]
+    lookup = buffer.cached
+
+    def racing_cached(key, compute):
+        value = lookup(key, compute)
+        if uploads:
+            buffer.append(uploads.pop())
+        return value
+
+    monkeypatch.setattr(buffer, 'cached', racing_cached)
+
+    class Model:
+        def prepare_features(self, frame):
+            return np.arange(len(frame))
+
+    df, features = ai_api.buffered_market_data({'symbol': 'BTCUSDT', 'timeframe': '1h'}, Model())
+    assert len(df) == len(features) == 200
+
+    df, features = ai_api.buffered_market_data({'symbol': 'BTCUSDT', 'timeframe': '1h'}, Model())
+    assert len(df) == len(features) == 210
+    assert df['datetime'].iloc[-1] == buffer.last_time
+
+
+@pytest.fixture
+def session_id(client):
+    session_id = f'trades_{np.random.default_rng().integers(1 << 62)}'
+    response = client.post('/api/trading/session/start',
+                           json={'session_id': session_id, 'symbol': 'BTCUSDT', 'timeframe': '1h'})
+    assert response.status_code == 200
+    return session_id
+
+
+def test_session_trades_of_a_new_session(client, session_id):
+    response = client.get(f'/api/trading/session/{session_id}/trades?limit=10')
+    assert response.status_code == 200
+    assert response.get_json()['trades'] == [] and response.get_json()['next_cursor'] is None
+
+
+def test_session_trades_of_an_unknown_session(client):
+    response = client.get('/api/trading/session/no_such_session/trades')
+    assert response.status_code == 404
+    assert response.get_json() == {'success': False, 'error': 'Session not found'}
+
+
+@pytest.mark.parametrize('query', ['cursor=abc', 'cursor=1:2:3', 'cursor=1:', 'limit=abc', 'limit=0', 'limit=-5'])
+def test_session_trades_rejects_malformed_paging(client, session_id, query):
+    response = client.get(f'/api/trading/session/{session_id}/trades?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,117 @@
+"""Candle buffer deltas and the version-keyed cache"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_candle_buffer import CandleBuffer, CandleBufferStore, candles_to_arrays
+
+
+def candles(n: int, start: int = 0, close: float = 100.0) -> list:
+    times = pd.date_range('2024-01-01', periods=start + n, freq='h')[start:]
+    return [{'timestamp': int(t.value // 1_000_000), 'open': close, 'high': close + 1, 'low': close - 1,
+             'close': close + i, 'volume': 1.0} for i, t in enumerate(times, start)]
+
+
+def test_candles_accept_iso_datetimes_and_come_back_sorted():
+    times, columns = candles_to_arrays([
+        {'datetime': '2024-01-01T02:00:00', 'open': 3, 'high': 3, 'low': 3, 'close': 3, 'volume': 3},
+        {'datetime': '2024-01-01T01:00:00', 'open': 1, 'high': 1, 'low': 1, 'close': '1', 'volume': 1}
+    ])
+    assert list(times) == list(pd.to_datetime(['2024-01-01T01:00', '2024-01-01T02:00']).to_numpy())
+    np.testing.assert_array_equal(columns['close'], [1.0, 3.0])
+
+
+@pytest.mark.parametrize('candle, message', [
+    ({'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1}, "'datetime' or 'timestamp'"),
+    ({'timestamp': 0, 'open': 1, 'high': 1, 'low': 1}, 'close, volume')
+])
+def test_malformed_candles_are_rejected(candle, message):
+    with pytest.raises(ValueError, match=message):
+        CandleBuffer().append([candle])
+
+
+def test_deltas_append_replace_and_skip():
+    buffer = CandleBuffer()
+    assert buffer.append(candles(10)) == 10
+    assert buffer.version == 1
+
+    # Re-sending the forming last candle replaces it; older candles are ignored
+    update = candles(1, start=9, close=500.0)
+    assert buffer.append(candles(3, start=5) + update) == 1
+    assert buffer.size == 10 and buffer.to_frame()['close'].iloc[-1] == 509.0
+    assert buffer.version == 2
+
+    assert buffer.append(candles(5, start=10)) == 5
+    assert buffer.size == 15 and buffer.last_time == pd.Timestamp('2024-01-01 14:00')
+    np.testing.assert_array_equal(buffer.to_frame(limit=3)['close'], [112.0, 113.0, 114.0])
+
+    # Nothing new leaves the version alone
+    assert buffer.append(candles(5)) == 0
+    assert buffer.version == 3
+
+
+def test_duplicate_rows_in_one_upload_keep_the_last():
+    rows = candles(3)
+    rows.append({**rows[-1], 'close': 42.0})
+    buffer = CandleBuffer()
+    assert buffer.append(rows) == 3
+    np.testing.assert_array_equal(buffer.to_frame()['close'], [100.0, 101.0, 42.0])
+
+
+def test_buffer_keeps_the_latest_max_candles():
+    buffer = CandleBuffer(max_candles=300)
+    for start in range(0, 1000, 70):
+        buffer.append(candles(70, start=start))
+    frame = buffer.to_frame()
+    assert buffer.size == len(frame) == 300
+    np.testing.assert_array_equal(frame['close'], np.arange(850, 1150, dtype=float))
+    assert frame['datetime'].is_monotonic_increasing
+
+
+def test_cache_is_keyed_on_the_buffer_version():
+    buffer = CandleBuffer()
+    buffer.append(candles(10))
+    calls = []
+
+    def compute(frame):
+        calls.append(len(frame))
+        return frame['close'].sum()
+
+    assert buffer.cached('total', compute) == buffer.cached('total', compute)
+    assert calls == [10]
+
+    buffer.append(candles(2, start=10))
+    assert buffer.cached('total', compute) == sum(range(100, 112))
+    buffer.cached('count', len)
+    assert calls == [10, 12]
+
+
+def test_value_computed_across_an_append_is_not_cached():
+    buffer = CandleBuffer()
+    buffer.append(candles(10))
+    appended = threading.Event()
+
+    def compute(frame):
+        if not appended.is_set():
+            buffer.append(candles(1, start=10))
+            appended.set()
+        return len(frame)
+
+    # The stale value is returned to its caller but the next call recomputes
+    assert buffer.cached('size', compute) == 10
+    assert buffer.cached('size', compute) == 11
+
+
+def test_store_keys_buffers_by_upper_case_symbol():
+    store = CandleBufferStore(max_candles=100)
+    buffer = store.get_or_create('btcusdt', '1h')
+    assert store.get_or_create('BTCUSDT', '1h') is buffer and buffer.max_candles == 100
+    assert store.get('BtcUsdt', '1h') is buffer and store.get('BTCUSDT', '4h') is None
+
+    buffer.append(candles(4))
+    [state] = store.list_buffers()
+    assert state['symbol'] == 'BTCUSDT' and state['size'] == 4 and state['version'] == 1
+    assert store.remove('btcusdt', '1h') and not store.remove('btcusdt', '1h')
@@ -0,0 +1,92 @@
+"""Append-only feature sets against a full recompute"""
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_features import compute_features
+from ai_feature_store import FeatureSet, FeatureStore
+
+
+def make_frame(n: int = 1500, seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h').astype('datetime64[ns]'),
+        'open': close, 'high': close * (1 + rng.uniform(0, 0.01, n)),
+        'low': close * (1 - rng.uniform(0, 0.01, n)), 'close': close,
+        'volume': rng.uniform(1, 100, n)
+    })
+
+
+def full_recompute(data: pd.DataFrame) -> np.ndarray:
+    return compute_features(*(data[c].to_numpy() for c in ('high', 'low', 'close', 'volume')))
+
+
+def assert_matches_recompute(feature_set: FeatureSet, data: pd.DataFrame):
+    assert feature_set.rows == len(data)
+    pd.testing.assert_frame_equal(feature_set.to_frame(), data)
+    np.testing.assert_allclose(feature_set.features(), full_recompute(data), rtol=1e-9, atol=1e-12)
+
+
+def test_incremental_append_matches_full_recompute(tmp_path):
+    data = make_frame()
+    feature_set = FeatureSet(str(tmp_path / 'BTCUSDT_1h'))
+    for start, end in ((0, 30), (30, 31), (31, 600), (600, 4100)):
+        assert feature_set.append_frame(data.iloc[start:end]) == len(data.iloc[start:end])
+    assert_matches_recompute(feature_set, data)
+
+
+def test_overlapping_and_stale_candles_are_skipped(tmp_path):
+    data = make_frame(400)
+    feature_set = FeatureSet(str(tmp_path / 'BTCUSDT_1h'))
+    assert feature_set.append_frame(data.iloc[:300]) == 300
+    assert feature_set.append_frame(data.iloc[250:300]) == 0
+    assert feature_set.append_frame(data.iloc[250:]) == 100
+    assert_matches_recompute(feature_set, data)
+
+
+def test_appends_grow_past_the_initial_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr('ai_feature_store.INITIAL_CAPACITY', 64)
+    data = make_frame(500)
+    feature_set = FeatureSet(str(tmp_path / 'BTCUSDT_1h'))
+    for start in range(0, len(data), 45):
+        feature_set.append_frame(data.iloc[start:start + 45])
+    assert feature_set.meta['capacity'] >= len(data)
+    assert_matches_recompute(feature_set, data)
+
+
+def _append_chunks(path: str, data: pd.DataFrame, chunks):
+    feature_set = FeatureSet(path)
+    for start, end in chunks:
+        feature_set.append_frame(data.iloc[start:end])
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_processes_appending_to_one_set(tmp_path):
+    data = make_frame(1200)
+    path = str(tmp_path / 'BTCUSDT_1h')
+    context = multiprocessing.get_context('fork')
+    # Each process appends growing prefixes, so every append races a peer's
+    workers = [
+        context.Process(target=_append_chunks, args=(path, data, [(0, end) for end in range(50, 1250, 50)]))
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert_matches_recompute(FeatureSet(path), data)
+
+
+def test_store_keys_sets_by_symbol_and_timeframe(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    assert store.get('btcusdt', '1h') is None
+    store.get_or_create('btcusdt', '1h').append_frame(make_frame(100))
+    assert store.get('BTCUSDT', '1h').rows == 100
+    assert [s['symbol'] for s in store.list_sets()] == ['BTCUSDT']
+    assert store.remove('BTCUSDT', '1h')
+    assert store.get('BTCUSDT', '1h') is None and store.list_sets() == []
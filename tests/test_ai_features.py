@@ -0,0 +1,89 @@
+"""Both feature kernels against the original pandas pipeline"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ai_features
+from ai_features import CONTEXT_CANDLES, compute_features, prepare_features
+
+
+def pandas_features(data: pd.DataFrame) -> np.ndarray:
+    """The pandas ``prepare_features`` the kernels replaced"""
+    data = data.copy()
+    data['returns'] = data['close'].pct_change()
+    data['volatility'] = data['returns'].rolling(window=20).std()
+    data['price_change'] = data['close'].diff()
+    data['high_low_pct'] = (data['high'] - data['low']) / data['close']
+    for period in [5, 10, 20, 50]:
+        data[f'sma_{period}'] = data['close'].rolling(window=period).mean()
+        data[f'price_to_sma_{period}'] = data['close'] / data[f'sma_{period}']
+    delta = data['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    data['rsi'] = 100 - (100 / (1 + gain / loss))
+    data['macd'] = data['close'].ewm(span=12).mean() - data['close'].ewm(span=26).mean()
+    data['macd_signal'] = data['macd'].ewm(span=9).mean()
+    data['macd_histogram'] = data['macd'] - data['macd_signal']
+    data['volume_ratio'] = data['volume'] / data['volume'].rolling(window=20).mean()
+    bb_middle = data['close'].rolling(window=20).mean()
+    bb_std_dev = data['close'].rolling(window=20).std()
+    bb_upper = bb_middle + bb_std_dev * 2
+    bb_lower = bb_middle - bb_std_dev * 2
+    data['bb_position'] = (data['close'] - bb_lower) / (bb_upper - bb_lower)
+    return data[ai_features.FEATURE_COLUMNS].dropna().values
+
+
+def make_candles(n: int = 3000, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    close[500:540] = close[500]      # flat closes: zero volatility, 0/0 RSI and band position
+    volume = rng.uniform(1, 100, n)
+    volume[1000:1030] = 0.0          # no volume: 0/0 volume ratio
+    return pd.DataFrame({
+        'open': close, 'high': close * (1 + rng.uniform(0, 0.01, n)),
+        'low': close * (1 - rng.uniform(0, 0.01, n)), 'close': close, 'volume': volume
+    })
+
+
+KERNELS = [
+    pytest.param(False, id='numpy'),
+    pytest.param(True, id='numba', marks=pytest.mark.skipif(ai_features.numba is None, reason='numba not installed'))
+]
+
+
+@pytest.fixture(params=KERNELS)
+def kernel(request, monkeypatch):
+    monkeypatch.setattr(ai_features, 'USE_JIT', request.param)
+
+
+def test_matches_pandas_pipeline(kernel):
+    data = make_candles()
+    expected = pandas_features(data)
+    features = prepare_features(data)
+    assert features.shape == expected.shape
+    np.testing.assert_array_equal(np.isinf(features), np.isinf(expected))
+    np.testing.assert_allclose(features, expected, rtol=1e-7, atol=1e-9)
+
+
+def test_incremental_matches_full_run(kernel):
+    data = make_candles()
+    columns = [data[c].to_numpy() for c in ('high', 'low', 'close', 'volume')]
+    full = compute_features(*columns)
+
+    state = {}
+    parts = [compute_features(*(c[:700] for c in columns), state=state)]
+    for start, end in ((700, 701), (701, 2000), (2000, len(data))):
+        begin = start - CONTEXT_CANDLES
+        parts.append(compute_features(*(c[begin:end] for c in columns), context=CONTEXT_CANDLES, state=state))
+    np.testing.assert_allclose(np.vstack(parts), full, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.skipif(ai_features.numba is None, reason='numba not installed')
+def test_compiled_kernel_hands_nan_candles_to_numpy(monkeypatch):
+    data = make_candles()
+    data.loc[1500, 'close'] = np.nan
+    monkeypatch.setattr(ai_features, 'USE_JIT', False)
+    expected = prepare_features(data)
+    monkeypatch.setattr(ai_features, 'USE_JIT', True)
+    np.testing.assert_array_equal(prepare_features(data), expected)
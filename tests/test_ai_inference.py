@@ -0,0 +1,77 @@
+"""Flattened tree ensembles against the sklearn estimators they were exported from"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
+
+from ai_inference import FlatTreeEnsemble, StackedTreeEnsembles, compile_ensemble
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(11)
+    X = rng.normal(size=(400, 6))
+    y = np.column_stack([X[:, 0] * 2 + np.sin(X[:, 1]), X[:, 2] - X[:, 3] ** 2]) + rng.normal(0, 0.1, (400, 2))
+    # Training rows sit exactly on split thresholds, unseen rows in between
+    return X, y, np.vstack([X[:50], rng.normal(size=(50, 6))])
+
+
+@pytest.mark.parametrize('outputs', [1, 2])
+def test_forest_matches_sklearn(data, outputs):
+    X, y, X_test = data
+    target = y[:, 0] if outputs == 1 else y
+    forest = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, target)
+    compiled = compile_ensemble(forest)
+
+    assert isinstance(compiled, FlatTreeEnsemble) and compiled.n_outputs == outputs
+    np.testing.assert_allclose(compiled.predict(X_test), forest.predict(X_test), rtol=1e-12)
+
+    # The dispersion members are the individual trees
+    prediction, members = compiled.predict_with_dispersion(X_test)
+    expected = np.stack([tree.predict(X_test).reshape(len(X_test), outputs) for tree in forest.estimators_])
+    np.testing.assert_array_equal(members, expected)
+    np.testing.assert_allclose(prediction, expected.mean(axis=0), rtol=1e-12)
+
+
+@pytest.mark.parametrize('params', [
+    {}, {'loss': 'absolute_error'}, {'loss': 'huber'}, {'loss': 'quantile', 'alpha': 0.8}, {'init': 'zero'}
+])
+def test_boosting_matches_sklearn(data, params):
+    X, y, X_test = data
+    boosting = GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0, **params).fit(X, y[:, 0])
+    compiled = compile_ensemble(boosting)
+
+    np.testing.assert_allclose(compiled.predict(X_test), boosting.predict(X_test), rtol=1e-12, atol=1e-12)
+
+    # The dispersion members are the staged predictions
+    _, staged = compiled.predict_with_dispersion(X_test)
+    expected = np.stack(list(boosting.staged_predict(X_test)))[:, :, None]
+    np.testing.assert_allclose(staged, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_multi_output_boosting_stacks_one_ensemble_per_output(data):
+    X, y, X_test = data
+    model = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=25, random_state=0)).fit(X, y)
+    compiled = compile_ensemble(model)
+
+    assert isinstance(compiled, StackedTreeEnsembles) and compiled.n_outputs == 2
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict(X_test), rtol=1e-12, atol=1e-12)
+
+    _, staged = compiled.predict_with_dispersion(X_test)
+    expected = np.stack([np.stack(list(e.staged_predict(X_test))) for e in model.estimators_], axis=-1)
+    np.testing.assert_allclose(staged, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_boosting_with_a_fitted_init_estimator_is_rejected(data):
+    X, y, _ = data
+    boosting = GradientBoostingRegressor(n_estimators=5, init=LinearRegression()).fit(X, y[:, 0])
+    with pytest.raises(TypeError, match='LinearRegression'):
+        compile_ensemble(boosting)
+
+
+def test_unsupported_estimator_is_rejected(data):
+    X, y, _ = data
+    with pytest.raises(TypeError, match='LinearRegression'):
+        FlatTreeEnsemble.from_estimator(LinearRegression().fit(X, y))
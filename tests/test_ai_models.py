@@ -0,0 +1,94 @@
+"""Model training and the manager's copy-on-write retraining"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_models import AIModelManager, EnsembleModel, GradientBoostingModel, RandomForestModel
+
+
+def make_frame(n: int = 600, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': close, 'high': close * (1 + rng.uniform(0, 0.01, n)),
+        'low': close * (1 - rng.uniform(0, 0.01, n)), 'close': close,
+        'volume': rng.uniform(1, 100, n)
+    })
+
+
+@pytest.mark.parametrize('model_class', [RandomForestModel, GradientBoostingModel, EnsembleModel])
+@pytest.mark.parametrize('horizons', [[1], [1, 4]])
+def test_train_fits_compiles_and_scores(model_class, horizons):
+    model = model_class('test', '1h', lookback_period=10, n_estimators=10, horizons=horizons)
+    data = make_frame()
+    result = model.train(data)
+
+    assert result['success'], result
+    assert model.is_trained
+    assert all(m.compiled_model is not None for m in getattr(model, 'members', [model]))
+    assert set(result['metrics']) == {'train_r2', 'val_r2', 'train_rmse', 'val_rmse'}
+    assert len(result['feature_importance']) == 10 * model.prepare_features(data).shape[1]
+    assert ('weights' in result) == (model_class is EnsembleModel)
+
+    prediction = model.predict(data)
+    assert 'error' not in prediction
+    assert set(prediction.get('horizons', {1: None})) == set(horizons)
+
+
+def test_train_rejects_short_history():
+    model = RandomForestModel('test', '1h', lookback_period=50, n_estimators=5)
+    assert model.train(make_frame(80)) == {'success': False, 'error': 'Insufficient data for training'}
+    assert not model.is_trained
+
+
+def test_predictions_during_retrains_see_whole_published_models():
+    manager = AIModelManager()
+    manager.create_model('random_forest', 'cow', '1h', lookback_period=10, n_estimators=20)
+    model_id = 'cow_1h_random_forest'
+    data = make_frame(900)
+    features = manager.get_model(model_id).prepare_features(data)
+
+    published = []
+    publish = manager._publish
+
+    def recording_publish(model_id, model):
+        published.append(model)
+        return publish(model_id, model)
+
+    manager._publish = recording_publish
+    assert manager.train_model(model_id, data[:500])['success']
+    first = manager.get_model(model_id)
+    before = first.predict(data, features)['prediction']
+
+    # Each retrain sees more history, so every published version predicts differently
+    stop = threading.Event()
+    seen, errors = [], []
+
+    def predict_until_stopped():
+        while not stop.is_set():
+            result = manager.predict_with_model(model_id, data, features)
+            (errors if 'error' in result else seen).append(result.get('prediction', result.get('error')))
+
+    readers = [threading.Thread(target=predict_until_stopped) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for end in (600, 700, 800, 900):
+            assert manager.train_model(model_id, data[:end])['success']
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+    assert errors == []
+    # Every prediction comes from one fully trained version, never a half-fitted one
+    versions = {model.predict(data, features)['prediction'] for model in published}
+    assert len(versions) == 5
+    assert set(seen) <= versions
+    # The model that was replaced is left as it was
+    assert first.predict(data, features)['prediction'] == before
+    assert manager.get_version(model_id) == 6
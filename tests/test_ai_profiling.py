@@ -0,0 +1,84 @@
+"""Opt-in per-request profiling"""
+
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from ai_profiling import RequestProfiler
+
+
+def make_app(profiler: RequestProfiler) -> Flask:
+    app = Flask(__name__)
+
+    @app.route('/work')
+    def work():
+        return jsonify(total=sum(i * i for i in range(10_000)))
+
+    @app.route('/health')
+    def health():
+        return jsonify(ok=True)
+
+    profiler.init_app(app, exclude=('health',))
+    return app
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(directory=str(tmp_path / 'profiles'), max_profiles=2, enabled=True)
+
+
+@pytest.fixture
+def client(profiler):
+    return make_app(profiler).test_client()
+
+
+def test_only_requests_that_ask_are_profiled(client, profiler):
+    assert 'X-Profile-Id' not in client.get('/work').headers
+    assert 'X-Profile-Id' not in client.get('/health?profile=1').headers
+    assert profiler.list_profiles() == []
+
+    response = client.get('/work', headers={'X-Profile': '1', 'X-Request-ID': 'req-1'})
+    assert response.status_code == 200 and response.headers['X-Profile-Id'] == 'req-1'
+    [meta] = profiler.list_profiles()
+    assert meta['path'] == '/work' and meta['status'] == 200 and meta['elapsed_seconds'] > 0
+
+
+def test_report_lists_the_most_expensive_functions(client, profiler):
+    client.get('/work?profile=yes', headers={'X-Request-ID': 'req-2'})
+    report = profiler.report('req-2', sort='cumulative', limit=5)
+    assert report['request_id'] == 'req-2' and report['total_calls'] > 0
+    assert len(report['functions']) == 5
+    cumulative = [row['cumtime'] for row in report['functions']]
+    assert cumulative == sorted(cumulative, reverse=True)
+    assert any(row['function'] == 'work' for row in profiler.report('req-2', limit=100)['functions'])
+
+
+def test_unsafe_request_ids_are_replaced(client, profiler):
+    response = client.get('/work?profile=1', headers={'X-Request-ID': '../../etc/passwd'})
+    request_id = response.headers['X-Profile-Id']
+    assert request_id != '../../etc/passwd' and len(request_id) == 32
+    assert profiler.path('../../etc/passwd') is None and profiler.report('../x') is None
+
+
+def test_only_the_newest_profiles_are_kept(client, profiler):
+    for i in range(4):
+        client.get('/work?profile=1', headers={'X-Request-ID': f'req-{i}'})
+        time.sleep(0.01)
+    assert [meta['request_id'] for meta in profiler.list_profiles()] == ['req-3', 'req-2']
+    assert profiler.path('req-0') is None and profiler.path('req-3') is not None
+
+
+def test_a_configured_token_is_required(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), token='s3cret', enabled=True)
+    client = make_app(profiler).test_client()
+    assert 'X-Profile-Id' not in client.get('/work?profile=1').headers
+    assert 'X-Profile-Id' in client.get('/work', headers={'X-Profile': 's3cret'}).headers
+
+
+def test_disabled_profiler_installs_no_hooks(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), enabled=False)
+    app = make_app(profiler)
+    assert not any(app.before_request_funcs.values()) and not any(app.after_request_funcs.values())
+    assert 'X-Profile-Id' not in app.test_client().get('/work?profile=1').headers
+    assert not profiler.authorized('1')
@@ -0,0 +1,115 @@
+"""NumPy-aware JSON responses, array trimming and gzip"""
+
+import gzip
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+from flask import Flask, jsonify
+
+import ai_serialization
+from ai_serialization import configure_responses, shape_arrays
+
+ENCODERS = [
+    pytest.param(True, id='orjson', marks=pytest.mark.skipif(ai_serialization.orjson is None,
+                                                              reason='orjson not installed')),
+    pytest.param(False, id='stdlib')
+]
+
+
+@pytest.fixture(params=ENCODERS)
+def app(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(ai_serialization, 'orjson', None)
+    app = Flask(__name__)
+    configure_responses(app, compress=True)
+    return app
+
+
+def respond(app: Flask, payload, **headers):
+    with app.test_request_context(headers=headers):
+        response = jsonify(payload)
+        return app.process_response(response)
+
+
+def test_numpy_values_encode_as_plain_json(app):
+    matrix = np.arange(6, dtype=np.int64).reshape(2, 3)
+    payload = {
+        'nan': float('nan'),
+        'inf': np.float64(-np.inf),
+        'float32_nan': np.float32('nan'),
+        'float32': np.float32(0.5),
+        'int64': np.int64(2**53 + 1),
+        'int32': np.int32(-3),
+        'bool': np.bool_(True),
+        'array': np.array([1.5, np.nan, np.inf]),
+        'float32_array': np.array([0.25, np.nan], dtype=np.float32),
+        'int_array': np.arange(3, dtype=np.int64),
+        'matrix': matrix,
+        'transposed': matrix.T,          # not C-contiguous
+        'nested': [{'value': np.float64(np.nan)}, (np.int64(1), np.nan)],
+        'date': datetime(2024, 1, 2, 3, 4, 5)
+    }
+    body = respond(app, payload).get_data()
+    assert json.loads(body, parse_constant=pytest.fail) == {
+        'nan': None,
+        'inf': None,
+        'float32_nan': None,
+        'float32': 0.5,
+        'int64': 2**53 + 1,
+        'int32': -3,
+        'bool': True,
+        'array': [1.5, None, None],
+        'float32_array': [0.25, None],
+        'int_array': [0, 1, 2],
+        'matrix': [[0, 1, 2], [3, 4, 5]],
+        'transposed': [[0, 3], [1, 4], [2, 5]],
+        'nested': [{'value': None}, [1, None]],
+        'date': 'Tue, 02 Jan 2024 03:04:05 GMT'
+    }
+
+
+def test_large_responses_are_gzipped_for_clients_that_accept_it(app):
+    payload = {'values': np.linspace(0, 1, 2000)}
+    plain = respond(app, payload)
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = respond(app, payload, **{'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+    small = respond(app, {'ok': True}, **{'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+@pytest.fixture
+def evaluation():
+    return {'rmse': 1.0, 'predictions': np.arange(100.0), 'actual': np.arange(100.0) + 1}
+
+
+def test_arrays_are_untouched_by_default(evaluation):
+    assert shape_arrays(evaluation, {}) is evaluation
+
+
+def test_arrays_can_be_omitted(evaluation):
+    shaped = shape_arrays({'a': evaluation, 'b': evaluation}, {'arrays': 'omit'})
+    assert shaped['a'] == {'rmse': 1.0, 'points': {'total': 100}} == shaped['b']
+
+
+def test_arrays_are_paged_and_thinned(evaluation):
+    page = shape_arrays(evaluation, {'offset': '90', 'limit': '20'})
+    np.testing.assert_array_equal(page['predictions'], np.arange(90.0, 100.0))
+    assert page['points'] == {'total': 100, 'offset': 90, 'returned': 10}
+
+    thinned = shape_arrays(evaluation, {'offset': '10', 'limit': '50', 'max_points': '5'})
+    np.testing.assert_array_equal(thinned['points']['index'], [10, 22, 34, 47, 59])
+    np.testing.assert_array_equal(thinned['actual'], thinned['points']['index'] + 1.0)
+
+
+@pytest.mark.parametrize('args', [{'arrays': 'some'}, {'offset': '-1'}, {'limit': '0'}, {'max_points': '1'},
+                                  {'limit': 'ten'}])
+def test_invalid_array_options_are_rejected(evaluation, args):
+    with pytest.raises(ValueError):
+        shape_arrays(evaluation, args)
@@ -0,0 +1,124 @@
+"""SQLite session store: batched writes and the restore round-trip"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_session_store import SessionStore
+from ai_trading_engine import PaperTradingEngine
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / 'sessions.db'), flush_interval=0.2)
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    """COMMIT statements run by connections opened from here on"""
+    seen = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(lambda statement: seen.append(statement) if statement == 'COMMIT' else None)
+        return conn
+
+    monkeypatch.setattr(sqlite3, 'connect', traced_connect)
+    return seen
+
+
+def trade(session_id: str, i: int) -> tuple:
+    return (session_id, 1, 'Signal', i, i + 1, 100.0, 101.0, 1.0, 1.0)
+
+
+def test_queued_writes_commit_in_one_transaction(store, commits):
+    store.add_session('s1', 'BTCUSDT', '1h', {'strategy': 'volty'}, 1000.0, '2024-01-01T00:00:00')
+    for i in range(200):
+        store.add_trades([trade('s1', i)])
+    store.update_states([(1200.0, 0, 0.0, 0.0, 0, 200.0, 200, 200, 's1')])
+    assert store.flush(5)
+
+    assert commits == ['COMMIT']
+    session = store.get_session('s1')
+    assert session['balance'] == 1200.0 and session['closed_trades'] == 200
+    assert session['settings'] == {'strategy': 'volty'} and session['active'] is True
+
+
+def test_a_failing_write_does_not_drop_its_batch(store, capsys):
+    store.add_session('s1', 'BTCUSDT', '1h', {}, 1000.0, '2024-01-01T00:00:00')
+    assert store.flush(5)
+    store.add_session('s1', 'BTCUSDT', '1h', {}, 1000.0, '2024-01-01T00:00:00')
+    store.add_trades([trade('s1', 0)])
+    assert store.flush(5)
+
+    rows, _ = store.trades('s1')
+    assert len(rows) == 1
+    assert 'dropped 1 session rows' in capsys.readouterr().err
+
+
+def test_trade_pages_are_keyed_by_exit_time_and_id(store):
+    store.add_session('s1', 'BTCUSDT', '1h', {}, 1000.0, '2024-01-01T00:00:00')
+    # Pairs of trades share an exit time, so ties are broken by id
+    store.add_trades([(*trade('s1', i)[:4], i // 2, *trade('s1', i)[5:]) for i in range(25)])
+    store.add_trades([trade('s2', 0)])
+    assert store.flush(5)
+
+    pages, cursor = [], None
+    while True:
+        rows, cursor = store.trades('s1', 10, cursor)
+        pages.append([row['entry_time'] for row in rows])
+        if cursor is None:
+            break
+    assert pages == [list(range(24, 14, -1)), list(range(14, 4, -1)), list(range(4, -1, -1))]
+    assert [row['entry_time'] for row in store.trades('s1', 100, since=10)[0]] == list(range(24, 19, -1))
+
+
+def make_frame(n: int, seed: int = 8) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': open_, 'high': np.maximum(open_, close) * 1.01,
+        'low': np.minimum(open_, close) * 0.99, 'close': close, 'volume': 1.0
+    })
+
+
+def feed(engine: PaperTradingEngine, frame: pd.DataFrame, start: int, end: int):
+    for stop in range(start + 1, end + 1):
+        engine.process('BTCUSDT', '1h', frame.iloc[:stop], closed=True)
+
+
+def test_engine_state_survives_a_restart(tmp_path):
+    frame = make_frame(900)
+    path = str(tmp_path / 'sessions.db')
+
+    engine = PaperTradingEngine(store=SessionStore(path, flush_interval=0.01))
+    engine.start_session('running', 'BTCUSDT', '1h', 10000, {'stop_loss': 3, 'position_size': 0.5})
+    engine.start_session('stopped', 'BTCUSDT', '1h', 5000)
+    feed(engine, frame, 50, 400)
+    engine.stop_session('stopped')
+    assert engine.store.flush(5)
+    before = engine.session_status('running')
+    assert before['total_trades'] > 0 and before['position'] is not None
+
+    # A new process over the same file picks up where the first left off
+    restarted = PaperTradingEngine(store=SessionStore(path))
+    assert restarted.restore() == 1
+    assert restarted.session_status('running') == before
+    assert restarted.session_trades('running', 1000) == engine.session_trades('running', 1000)
+    assert restarted.session_status('stopped')['active'] is False
+
+    # And trades on exactly as the original would have
+    reference = PaperTradingEngine()
+    reference.start_session('running', 'BTCUSDT', '1h', 10000, {'stop_loss': 3, 'position_size': 0.5})
+    feed(reference, frame, 50, 900)
+    feed(restarted, frame, 400, 900)
+    assert restarted.store.flush(5)
+    status, expected = restarted.session_status('running'), reference.session_status('running')
+    for key in ('balance', 'realized_pnl', 'total_trades', 'position', 'last_price', 'last_candle'):
+        assert status[key] == expected[key]
+    assert restarted.session_trades('running', 1000)[0] == reference.session_trades('running', 1000)[0]
@@ -0,0 +1,156 @@
+"""Paper trading engine against the backtester's VoltyStrategy"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_trading_engine import PaperTradingEngine
+
+# VoltyStrategy lives with the backtester, whose modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backtest'))
+from engine import VoltyStrategy  # noqa: E402
+
+
+def make_frame(n: int = 1500, seed: int = 4) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = close * rng.uniform(0.001, 0.02, n)
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': open_, 'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread, 'close': close, 'volume': 1.0
+    })
+
+
+def run(engine: PaperTradingEngine, frame: pd.DataFrame, start: int) -> int:
+    """Start the stream after candle ``start`` and feed the rest one closed candle at a time"""
+    engine.process('BTCUSDT', '1h', frame.iloc[:start + 1], closed=True)
+    return sum(engine.process('BTCUSDT', '1h', frame.iloc[:end], closed=True) for end in range(start + 2, len(frame) + 1))
+
+
+def trades(engine: PaperTradingEngine, session_id: str) -> list:
+    page, _ = engine.session_trades(session_id, limit=10_000)
+    return page[::-1]
+
+
+@pytest.mark.parametrize('length, atr_mult', [(5, 0.75), (3, 0.5), (10, 1.5)])
+def test_volty_signals_match_the_backtester(length, atr_mult):
+    frame = make_frame(600)
+    expected = VoltyStrategy(length, atr_mult).generate_signals(frame)
+    candles = {f: frame[f].to_numpy() for f in ('open', 'high', 'low', 'close')}
+    flags = np.array([PaperTradingEngine._volty_signal(candles, i, length, atr_mult) for i in range(len(frame))])
+    np.testing.assert_array_equal(flags[:, 0], expected['long_entry'].to_numpy())
+    np.testing.assert_array_equal(flags[:, 1], expected['short_entry'].to_numpy())
+
+
+def test_stop_and_reverse_follows_volty_signals():
+    frame = make_frame()
+    engine = PaperTradingEngine()
+    settings = {'atr_length': 5, 'atr_multiplier': 0.75, 'position_size': 0.5}
+    assert engine.start_session('sar', 'BTCUSDT', '1h', 10000, settings)['success']
+    start = 100
+    assert run(engine, frame, start) == len(frame) - start - 1
+
+    # Reference: act on every signal after the start at the candle's close, long winning ties
+    signals = VoltyStrategy(5, 0.75).generate_signals(frame)
+    capital, direction, expected = 10000.0, 0, []
+    for i in range(start + 1, len(frame)):
+        long_entry, short_entry = signals['long_entry'].iloc[i], signals['short_entry'].iloc[i]
+        side = 1 if long_entry else -1 if short_entry else 0
+        if side == 0 or side == direction:
+            continue
+        price = frame['close'].iloc[i]
+        if direction:
+            pnl = direction * (price - entry_price) * units
+            capital += pnl
+            expected.append(('LONG' if direction == 1 else 'SHORT', entry_price, price, pnl))
+        direction, entry_price, units = side, price, capital * 0.5 / price
+
+    actual = [(t['type'], t['entry_price'], t['exit_price'], t['pnl']) for t in trades(engine, 'sar')]
+    assert len(actual) == len(expected) > 10
+    for got, want in zip(actual, expected):
+        assert got[0] == want[0]
+        np.testing.assert_allclose(got[1:], want[1:], rtol=1e-12)
+    assert all(t['reason'] == 'Signal' for t in trades(engine, 'sar'))
+
+    status = engine.session_status('sar')
+    assert status['balance'] == pytest.approx(capital, rel=1e-12)
+    assert status['position']['type'] == ('LONG' if direction == 1 else 'SHORT')
+    assert status['total_trades'] == len(expected)
+
+
+def candle(time: str, open_: float, high: float, low: float, close: float) -> dict:
+    return {'datetime': pd.Timestamp(time), 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': 1.0}
+
+
+@pytest.mark.parametrize('direction, bar, reason, exit_price', [
+    (1, (100, 101, 97, 99), 'Stop Loss', 98.0),           # long stop inside the range
+    (1, (96, 97, 95, 96), 'Stop Loss', 96.0),             # gap below the stop fills at the open
+    (1, (100, 105, 99, 104), 'Take Profit', 104.0),       # long target inside the range
+    (1, (106, 107, 105, 106), 'Take Profit', 106.0),      # gap above the target fills at the open
+    (1, (100, 105, 97, 100), 'Stop Loss', 98.0),          # both reached: the stop is assumed first
+    (-1, (100, 103, 99, 101), 'Stop Loss', 102.0),
+    (-1, (100, 101, 95, 97), 'Take Profit', 96.0),
+    (1, (100, 103, 99, 101), None, None)                  # neither reached
+])
+def test_stop_loss_and_take_profit(direction, bar, reason, exit_price):
+    engine = PaperTradingEngine()
+    settings = {'stop_loss': 2, 'take_profit': 4, 'auto_trade': False}
+    slot = engine.start_session('risk', 'BTCUSDT', '1h', 10000, settings)['slot']
+    frame = pd.DataFrame([candle('2024-01-01 00:00', 100, 100, 100, 100)])
+    engine.process('BTCUSDT', '1h', frame, closed=True)
+
+    # A position held from the last candle
+    engine.direction[slot], engine.entry_price[slot], engine.units[slot] = direction, 100.0, 10.0
+    frame = pd.DataFrame([*frame.to_dict('records'), candle('2024-01-01 01:00', *bar)])
+    assert engine.process('BTCUSDT', '1h', frame, closed=True) == 1
+
+    closed = trades(engine, 'risk')
+    if reason is None:
+        assert closed == [] and engine.direction[slot] == direction
+        return
+    [trade] = closed
+    assert trade['reason'] == reason and trade['exit_price'] == exit_price
+    assert trade['pnl'] == pytest.approx(direction * (exit_price - 100) * 10)
+    assert engine.direction[slot] == 0
+    assert engine.session_status('risk')['balance'] == pytest.approx(10000 + trade['pnl'])
+
+
+def test_sessions_without_auto_trade_ignore_signals():
+    frame = make_frame(400)
+    engine = PaperTradingEngine()
+    engine.start_session('manual', 'BTCUSDT', '1h', 10000, {'auto_trade': False})
+    engine.start_session('auto', 'BTCUSDT', '1h', 10000)
+    run(engine, frame, 50)
+    assert trades(engine, 'manual') == [] and engine.session_status('manual')['position'] is None
+    assert len(trades(engine, 'auto')) > 0
+
+
+def test_history_before_the_start_is_never_traded():
+    frame = make_frame(400)
+    engine = PaperTradingEngine()
+    engine.start_session('late', 'BTCUSDT', '1h', 10000)
+    assert engine.process('BTCUSDT', '1h', frame) == 0
+    assert engine.process('BTCUSDT', '1h', frame, closed=True) == 1
+    assert engine.process('BTCUSDT', '1h', frame, closed=True) == 0
+
+
+def test_trade_pages_and_unknown_sessions():
+    frame = make_frame(800)
+    engine = PaperTradingEngine()
+    engine.start_session('paged', 'BTCUSDT', '1h', 10000)
+    run(engine, frame, 50)
+    everything = trades(engine, 'paged')[::-1]
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = engine.session_trades('paged', 7, cursor)
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert pages == everything
+    assert engine.session_trades('missing') is None
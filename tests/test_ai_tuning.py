@@ -0,0 +1,129 @@
+"""Hyperparameter search, model registration and background tuning jobs"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+
+from ai_models import AIModelManager, RandomForestModel
+from ai_tuning import TuningJobs, candidate_grid, search, tune_model
+
+GRID = {'n_estimators': [5, 10], 'max_depth': [2, None]}
+
+
+@pytest.fixture(scope='module')
+def data() -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    n = 400
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': close, 'high': close * 1.005, 'low': close * 0.995, 'close': close,
+        'volume': rng.uniform(1, 100, n)
+    })
+
+
+def test_grid_covers_every_combination():
+    candidates = candidate_grid('random_forest', GRID, lookbacks=(5, 10))
+    assert len(candidates) == 8
+    assert candidates[0] == {'lookback_period': 5, 'model_params': {'max_depth': 2}, 'n_estimators': 5}
+    assert {c['lookback_period'] for c in candidates} == {5, 10}
+    assert all('n_estimators' not in c['model_params'] for c in candidates)
+
+
+def test_sampled_grid_is_a_reproducible_subset():
+    full = candidate_grid('gradient_boosting')
+    sample = candidate_grid('gradient_boosting', max_candidates=6, seed=3)
+    assert len(sample) == 6 and all(c in full for c in sample)
+    assert sample == candidate_grid('gradient_boosting', max_candidates=6, seed=3)
+    with pytest.raises(ValueError, match='Unknown model type'):
+        candidate_grid('linear')
+
+
+def test_search_ranks_candidates_on_shared_validation_rows(data):
+    result = search(data, 'random_forest', params=GRID, lookbacks=(5, 10), n_splits=3,
+                    max_candidates=None, max_workers=1)
+    assert result['success'] and result['candidates'] == 8
+    board = result['leaderboard']
+    assert [entry['rank'] for entry in board] == list(range(1, 9))
+    assert [entry['rmse'] for entry in board] == sorted(entry['rmse'] for entry in board)
+    assert result['best'] is board[0] and all(len(entry['fold_rmse']) == 3 for entry in board)
+
+    # Rescore one candidate by hand: the last ``validation_rows`` sequences, split with a horizon gap
+    entry = next(e for e in board if e['config']['lookback_period'] == 5 and e['config']['n_estimators'] == 10
+                 and e['config']['model_params'] == {'max_depth': 2})
+    model = RandomForestModel('check', '1h', lookback_period=5, n_estimators=10, model_params={'max_depth': 2})
+    features = model.prepare_features(data)
+    X, y = model.create_sequences(features, data['close'].to_numpy()[-len(features):])
+    rows = result['validation_rows']
+    X, y = X[-rows:], y[-rows:]
+    expected = []
+    for train, val in TimeSeriesSplit(n_splits=3, gap=1).split(X):
+        scaler = StandardScaler()
+        forest = RandomForestRegressor(n_estimators=10, max_depth=2, random_state=42)
+        forest.fit(scaler.fit_transform(X[train]), y[train])
+        expected.append(np.sqrt(mean_squared_error(y[val], forest.predict(scaler.transform(X[val])))))
+    np.testing.assert_allclose(entry['fold_rmse'], expected, rtol=1e-12)
+
+
+def test_worker_processes_score_like_a_single_process(data):
+    options = dict(params={'n_estimators': [5], 'max_depth': [2, 3]}, lookbacks=(5,), n_splits=2,
+                   scoring='r2', max_candidates=None)
+    serial = search(data, 'gradient_boosting', max_workers=1, **options)
+    parallel = search(data, 'gradient_boosting', max_workers=2, **options)
+    assert [e['config'] for e in parallel['leaderboard']] == [e['config'] for e in serial['leaderboard']]
+    np.testing.assert_allclose([e['r2'] for e in parallel['leaderboard']],
+                               [e['r2'] for e in serial['leaderboard']], rtol=1e-12)
+
+
+@pytest.mark.parametrize('options, error', [
+    ({'scoring': 'mae'}, 'Unknown scoring'),
+    ({'model_type': 'linear'}, 'Unknown model type'),
+    ({'lookbacks': (300,)}, 'Insufficient data')
+])
+def test_search_rejects_bad_requests(data, options, error):
+    result = search(data, **{'params': GRID, 'max_workers': 1, **options})
+    assert not result['success'] and error in result['error']
+
+
+def test_tune_model_registers_and_trains_the_winner(data):
+    manager = AIModelManager()
+    result = tune_model(manager, data, 'random_forest', 'tuned', '1h', params=GRID, lookbacks=(5,),
+                        n_splits=2, max_workers=1)
+    assert result['model_id'] == 'tuned_1h_random_forest' and result['training']['success']
+    model = manager.get_model('tuned_1h_random_forest')
+    assert model.is_trained and model.lookback_period == 5
+    assert model.n_estimators == result['best']['config']['n_estimators']
+
+
+def wait_for(jobs: TuningJobs, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job is not None and job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise TimeoutError(job_id)
+
+
+def test_jobs_run_in_the_background_and_keep_the_newest(data):
+    jobs = TuningJobs(max_finished=2)
+    manager = AIModelManager()
+    options = dict(register=False, params={'n_estimators': [5], 'max_depth': [2]}, lookbacks=(5,),
+                   n_splits=2, max_workers=1)
+    submitted = [jobs.submit(manager, data, 'random_forest', f'job{i}', '1h', **options) for i in range(3)]
+    failed = jobs.submit(manager, data, 'linear', 'bad', '1h', **options)
+    assert all(job['status'] == 'queued' for job in submitted)
+
+    assert wait_for(jobs, failed['job_id'])['status'] == 'failed'
+    assert jobs.get(submitted[0]['job_id']) is None
+    done = jobs.get(submitted[2]['job_id'])
+    assert done['status'] == 'completed' and done['result']['best']['config']['lookback_period'] == 5
+    listed = jobs.list_jobs()
+    assert [job['job_id'] for job in listed] == [failed['job_id'], submitted[2]['job_id']]
+    assert all('result' not in job for job in listed)